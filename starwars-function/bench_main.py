@@ -0,0 +1,340 @@
+"""
+Benchmarks do caminho de requisição da Cloud Function Star Wars API Explorer.
+
+Mede sort_results, apply_pagination, a validação de parâmetros de explorar_handler e a
+serialização JSON sobre datasets sintéticos de cada tipo de recurso (100 a 100 mil registros).
+
+Uso:
+    python bench_main.py                                   # todos os cenários, tamanhos padrão
+    python bench_main.py --cenario sort --tamanhos 100 1000
+    python bench_main.py --saida atual.json --baseline baseline.json --tolerancia 0.2
+    python bench_main.py --cenario topk                    # ponto de cruzamento sort x heap
+    python bench_main.py --cenario sort --memoria          # + memória de dicts x CompactRecords e do índice
+"""
+import argparse
+import gc
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+from unittest.mock import Mock
+
+from flask import Flask, jsonify
+from werkzeug.datastructures import Headers, MultiDict
+
+import main
+
+DEFAULT_SIZES = [100, 1_000, 10_000, 100_000]
+SCENARIOS = ['sort', 'paginacao', 'validacao', 'serializacao', 'topk']
+
+# Valores no estilo da SWAPI para campos numéricos ('1,000', '3.5', 'unknown'...)
+NUMERIC_STYLES = ['{:d}', '{:,d}', '{:.1f}', 'unknown', 'n/a']
+WORDS = ['Luke', 'Leia', 'Han', 'Tatooine', 'Falcon', 'Hope', 'Endor', 'Hoth', 'Naboo', 'Jedi']
+URL_LIST_TARGETS = {
+    'films': 'films', 'species': 'species', 'vehicles': 'vehicles', 'starships': 'starships',
+    'residents': 'people', 'pilots': 'people', 'characters': 'people', 'planets': 'planets',
+}
+TEXT_FIELDS = {'name', 'title', 'model', 'manufacturer', 'climate', 'terrain', 'gender', 'hair_color',
+               'skin_color', 'eye_color', 'starship_class', 'director', 'producer', 'opening_crawl'}
+
+
+def make_numeric(rng: random.Random) -> str:
+    """Gera um valor de campo numérico no estilo da SWAPI."""
+    style = rng.choice(NUMERIC_STYLES)
+    if style in ('unknown', 'n/a'):
+        return style
+    number = rng.randint(1, 10_000_000)
+    return style.format(number / 10 if 'f' in style else number)
+
+
+def make_records(resource: str, count: int, seed: int = 42) -> List[Dict[str, Any]]:
+    """Gera 'count' registros sintéticos com todos os campos do formato do recurso na SWAPI."""
+    rng = random.Random(seed)
+    records = []
+    for i in range(1, count + 1):
+        record = {}
+        for field in main.VALID_PROJECTION_FIELDS[resource]:
+            if field in URL_LIST_TARGETS:
+                target = URL_LIST_TARGETS[field]
+                record[field] = [f"{main.SWAPI_BASE_URL}/{target}/{rng.randint(1, 90)}/"
+                                 for _ in range(rng.randint(0, 8))]
+            elif field == 'homeworld':
+                record[field] = f"{main.SWAPI_BASE_URL}/planets/{rng.randint(1, 60)}/"
+            elif field in ('created', 'edited'):
+                record[field] = f"2014-12-{rng.randint(10, 20)}T16:{rng.randint(10, 59)}:00.000000Z"
+            elif field == 'url':
+                record[field] = f"{main.SWAPI_BASE_URL}/{resource}/{i}/"
+            elif field == 'episode_id':
+                record[field] = rng.randint(1, 9)
+            elif field == 'release_date':
+                record[field] = f"{rng.randint(1977, 2019)}-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}"
+            elif field == 'birth_year':
+                record[field] = rng.choice(['19BBY', '41.9BBY', '112BBY', 'unknown'])
+            elif field in TEXT_FIELDS:
+                record[field] = f"{rng.choice(WORDS)} {rng.choice(WORDS)} {i}"
+            else:
+                record[field] = make_numeric(rng)
+        records.append(record)
+    return records
+
+
+def time_it(func: Callable[[], Any], repeat: int = 5, warmup: int = 1) -> Dict[str, float]:
+    """
+    Mede a execução de func com aquecimento prévio.
+
+    Returns:
+        Dicionário com mínimo, mediana e máximo em milissegundos
+    """
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {'min_ms': min(samples), 'mediana_ms': statistics.median(samples), 'max_ms': max(samples)}
+
+
+def make_request(args: Dict[str, str]) -> Mock:
+    """Cria uma requisição mínima para explorar_handler."""
+    request = Mock(method='GET', path='/explorar')
+    request.args = MultiDict(args)
+    request.headers = Headers()
+    return request
+
+
+def bench_sort(records_by_resource: Dict[str, List[dict]], repeat: int, warmup: int) -> Dict[str, Dict[str, float]]:
+    """sort_results para cada campo ordenável e ambas as ordens."""
+    results = {}
+    for resource, records in records_by_resource.items():
+        for field in main.VALID_SORT_FIELDS[resource]:
+            for order in ('asc', 'desc'):
+                results[f"sort/{resource}/{field}/{order}/{len(records)}"] = time_it(
+                    lambda: main.sort_results(records, field, order, resource), repeat, warmup)
+    return results
+
+
+def bench_pagination(records_by_resource: Dict[str, List[dict]], repeat: int, warmup: int) -> Dict[str, Dict[str, float]]:
+    """apply_pagination na primeira, na do meio e na última página, com limite 10 e 100."""
+    results = {}
+    for resource, records in records_by_resource.items():
+        for limit in (10, 100):
+            last_page = max(1, (len(records) + limit - 1) // limit)
+            for label, page in (('primeira', 1), ('meio', max(1, last_page // 2)), ('ultima', last_page)):
+                results[f"paginacao/{resource}/{label}/limite{limit}/{len(records)}"] = time_it(
+                    lambda: main.apply_pagination(records, str(page), str(limit)), repeat, warmup)
+    return results
+
+
+def bench_validation(repeat: int, warmup: int) -> Dict[str, Dict[str, float]]:
+    """
+    Validação de parâmetros de explorar_handler: requisições rejeitadas em cada etapa
+    (a última, caracteres inválidos no termo, passa por todas as validações anteriores).
+    """
+    cases = {
+        'sem_tipo': {},
+        'tipo_invalido': {'tipo': 'droids'},
+        'termo_longo': {'tipo': 'people', 'termo': 'a' * 101},
+        'termo_caracteres': {'tipo': 'people', 'termo': 'Luke<script>'},
+        'campos_invalidos': {'tipo': 'people', 'termo': 'Luke', 'campos': 'name,xyz'},
+    }
+    results = {}
+    app = Flask(__name__)
+    with app.app_context():
+        for label, args in cases.items():
+            request = make_request(args)
+            results[f"validacao/{label}"] = time_it(
+                lambda: main.explorar_handler(request), repeat * 20, warmup)
+    return results
+
+
+def bench_serialization(records_by_resource: Dict[str, List[dict]], repeat: int, warmup: int) -> Dict[str, Dict[str, float]]:
+    """Serialização JSON (jsonify) de uma página de 100 registros e da lista completa."""
+    results = {}
+    app = Flask(__name__)
+    with app.app_context():
+        for resource, records in records_by_resource.items():
+            page = records[:100]
+            results[f"serializacao/{resource}/pagina100/{len(records)}"] = time_it(
+                lambda: jsonify({'resultados': page}).get_data(), repeat, warmup)
+            results[f"serializacao/{resource}/completo/{len(records)}"] = time_it(
+                lambda: jsonify({'resultados': records}).get_data(), repeat, warmup)
+    return results
+
+
+def bench_topk(sizes: List[int], repeat: int, warmup: int) -> Dict[str, Dict[str, float]]:
+    """Compara ordenação completa + slice com a seleção parcial por heap para várias janelas."""
+    results = {}
+    previous_fraction = main.TOPK_MAX_FRACTION
+    main.TOPK_MAX_FRACTION = 1.0  # mede sempre o caminho de heap, independentemente do limiar
+    try:
+        for size in sizes:
+            records = make_records('planets', size)
+            for fraction in (0.001, 0.01, 0.05, 0.1, 0.15, 0.2, 0.5):
+                window = max(1, int(size * fraction))
+                results[f"topk/sort/{fraction}/{size}"] = time_it(
+                    lambda: main.sort_results(records, 'population', 'desc', 'planets')[:window], repeat, warmup)
+                results[f"topk/heap/{fraction}/{size}"] = time_it(
+                    lambda: main.sort_results_window(records, 'population', 'desc', 'planets', window), repeat, warmup)
+    finally:
+        main.TOPK_MAX_FRACTION = previous_fraction
+    return results
+
+
+def measure_memory(build: Callable[[], Any], repeat: int = 3) -> int:
+    """
+    Bytes alocados por build() que continuam vivos enquanto o objeto retornado existir (tracemalloc).
+
+    Usa o mínimo de 'repeat' medições: descarta crescimentos pontuais de estruturas globais do
+    interpretador (como a tabela de strings internadas), que não pertencem ao objeto medido.
+    """
+    samples = []
+    for _ in range(repeat):
+        gc.collect()
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            result = build()
+            gc.collect()
+            samples.append(tracemalloc.get_traced_memory()[0] - before)
+        finally:
+            tracemalloc.stop()
+        del result
+    return min(samples)
+
+
+def bench_memory(sizes: List[int]) -> Dict[str, Dict[str, float]]:
+    """
+    Memória ocupada por um recurso completo: a lista de dicts, como fetch_all_pages_swapi a retorna
+    (decodificada do JSON, sem strings compartilhadas entre registros), contra o CompactRecords;
+    e, à parte, a do SearchIndex que warm() constrói sobre ele.
+    """
+    results = {}
+    for size in sizes:
+        for resource in main.VALID_RESOURCES:
+            body = json.dumps(make_records(resource, size))
+            dicts = measure_memory(lambda: json.loads(body))
+            compact = measure_memory(lambda: main.CompactRecords.from_dicts(json.loads(body)))
+            records = main.CompactRecords.from_dicts(json.loads(body))
+            fields = main.SEARCH_FIELDS.get(resource, ('name',))
+            index = measure_memory(lambda: main.SearchIndex(records, fields))
+            results[f"memoria/{resource}/{size}"] = {
+                'dicts_bytes': dicts, 'compacto_bytes': compact, 'reducao': 1 - compact / dicts,
+                'indice_bytes': index,
+            }
+    return results
+
+
+def print_memory_table(results: Dict[str, Dict[str, float]]) -> None:
+    """Imprime o relatório de memória em formato de tabela."""
+    width = max((len(name) for name in results), default=10)
+    print(f"{'medicao':<{width}} {'dicts (KiB)':>12} {'compacto (KiB)':>15} {'reducao':>8} {'indice (KiB)':>13}")
+    for name, usage in results.items():
+        print(f"{name:<{width}} {usage['dicts_bytes'] / 1024:>12.1f} {usage['compacto_bytes'] / 1024:>15.1f} "
+              f"{usage['reducao']:>8.0%} {usage['indice_bytes'] / 1024:>13.1f}")
+
+
+def run(scenarios: List[str], sizes: List[int], repeat: int, warmup: int) -> Dict[str, Dict[str, float]]:
+    """Executa os cenários pedidos e retorna os tempos por nome de medição."""
+    results = {}
+    for size in sizes:
+        records_by_resource = {resource: make_records(resource, size) for resource in main.VALID_RESOURCES}
+        if 'sort' in scenarios:
+            results.update(bench_sort(records_by_resource, repeat, warmup))
+        if 'paginacao' in scenarios:
+            results.update(bench_pagination(records_by_resource, repeat, warmup))
+        if 'serializacao' in scenarios:
+            results.update(bench_serialization(records_by_resource, repeat, warmup))
+    if 'validacao' in scenarios:
+        results.update(bench_validation(repeat, warmup))
+    if 'topk' in scenarios:
+        results.update(bench_topk(sizes, repeat, warmup))
+    return results
+
+
+def compare(current: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+            tolerance: float) -> List[str]:
+    """
+    Compara as medianas com a baseline.
+
+    Returns:
+        Lista de descrições das regressões (mediana acima de baseline * (1 + tolerância))
+    """
+    regressions = []
+    for name, timing in sorted(current.items()):
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        limit = reference['mediana_ms'] * (1 + tolerance)
+        if timing['mediana_ms'] > limit:
+            regressions.append(
+                f"{name}: {timing['mediana_ms']:.3f} ms (baseline {reference['mediana_ms']:.3f} ms, "
+                f"+{(timing['mediana_ms'] / reference['mediana_ms'] - 1) * 100:.0f}%)"
+            )
+    return regressions
+
+
+def print_table(results: Dict[str, Dict[str, float]]) -> None:
+    """Imprime os resultados em formato de tabela."""
+    width = max((len(name) for name in results), default=10)
+    print(f"{'medicao':<{width}} {'min (ms)':>10} {'mediana (ms)':>13} {'max (ms)':>10}")
+    for name, timing in results.items():
+        print(f"{name:<{width}} {timing['min_ms']:>10.3f} {timing['mediana_ms']:>13.3f} {timing['max_ms']:>10.3f}")
+
+
+def main_cli(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks do caminho de requisição.")
+    parser.add_argument('--cenario', nargs='+', choices=SCENARIOS, default=SCENARIOS[:-1],
+                        help="Cenários a executar (padrão: todos, exceto topk)")
+    parser.add_argument('--tamanhos', nargs='+', type=int, default=DEFAULT_SIZES)
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--aquecimento', type=int, default=1)
+    parser.add_argument('--saida', help="Grava os resultados em JSON neste arquivo")
+    parser.add_argument('--baseline', help="Arquivo de resultados anterior para comparação")
+    parser.add_argument('--tolerancia', type=float, default=0.2,
+                        help="Aumento relativo da mediana tolerado antes de acusar regressão (padrão 0.2)")
+    parser.add_argument('--memoria', action='store_true',
+                        help="Inclui o relatório de memória (lista de dicts x CompactRecords e índice de busca)")
+    args = parser.parse_args(argv)
+
+    main.logger.disabled = True
+    results = run(args.cenario, args.tamanhos, args.repeticoes, args.aquecimento)
+    print_table(results)
+
+    memory = bench_memory(args.tamanhos) if args.memoria else {}
+    if memory:
+        print()
+        print_memory_table(memory)
+
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as output:
+            json.dump({
+                'meta': {
+                    'python': platform.python_version(),
+                    'plataforma': platform.platform(),
+                    'data': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                    'repeticoes': args.repeticoes,
+                },
+                'resultados': results,
+                'memoria': memory,
+            }, output, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as baseline_file:
+            baseline = json.load(baseline_file)['resultados']
+        regressions = compare(results, baseline, args.tolerancia)
+        if regressions:
+            print(f"\n{len(regressions)} regressão(ões) acima de {args.tolerancia:.0%}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print(f"\nSem regressões acima de {args.tolerancia:.0%} em relação a {args.baseline}.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main_cli())
@@ -0,0 +1,31 @@
+"""
+Gera o snapshot local do dataset da SWAPI usado pelo modo offline (SWAPI_SNAPSHOT_PATH).
+
+Uso:
+    python build_snapshot.py swapi-snapshot.json.gz
+"""
+import argparse
+import sys
+
+from main import build_snapshot, VALID_RESOURCES
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Baixa os recursos da SWAPI para um snapshot local.")
+    parser.add_argument('destino', help="Caminho do arquivo de snapshot (.json.gz)")
+    parser.add_argument('--recursos', nargs='+', default=VALID_RESOURCES, choices=VALID_RESOURCES,
+                        help="Tipos de recurso incluídos no snapshot")
+    args = parser.parse_args()
+
+    try:
+        header = build_snapshot(args.destino, args.recursos)
+    except RuntimeError as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        return 1
+
+    print(f"Snapshot gravado em {args.destino} (sha256={header['sha256']}): {header['recursos']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
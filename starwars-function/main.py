@@ -1,10 +1,31 @@
+import time
+_IMPORT_STARTED = time.perf_counter()  # início do cold start (antes das dependências pesadas)
+
 import functions_framework
 import requests
-from flask import jsonify, Request
-import time
+from requests.adapters import HTTPAdapter
+from flask import jsonify, Request, Response, current_app
+from werkzeug.datastructures import MultiDict, Headers
+import os
 import re
+import sys
+import json
+import random
+import base64
+import gzip
+import zlib
+import hashlib
 import logging
-from typing import Optional, Dict, Any, Tuple
+import threading
+import heapq
+import contextvars
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from typing import Optional, Dict, Any, Tuple, List, Callable, Sequence, Iterable, Iterator
 
 # Configuração do logger estruturado
 logging.basicConfig(
@@ -14,210 +35,2476 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# URL base da API do Star Wars
-SWAPI_BASE_URL = "https://swapi.dev/api"
+# URL base da API do Star Wars (sobrescrevível para apontar para um servidor local, ex.: swapi_standin.py)
+SWAPI_BASE_URL = os.environ.get('SWAPI_BASE_URL', "https://swapi.dev/api").rstrip('/')
+
+# Tipos de recurso suportados pelo endpoint /explorar
+VALID_RESOURCES = ['people', 'planets', 'starships', 'films']
+
+# Validação do parâmetro 'termo' do /explorar (regex compilada uma vez, no carregamento do módulo):
+# apenas letras, números, espaços e os caracteres - _ . (proteção básica contra injection)
+MAX_SEARCH_LENGTH = 100
+SEARCH_TERM_PATTERN = re.compile(r'^[a-zA-Z0-9\s\-_\.]+$')
 
 # Configurações de retry
 MAX_RETRIES = 3
 RETRY_DELAY = 1  # segundos
 RETRY_BACKOFF = 2  # multiplicador exponencial
+RETRY_MAX_DELAY = float(os.environ.get('SWAPI_RETRY_MAX_DELAY', '4'))  # teto do backoff (segundos)
 
-def fetch_from_swapi(resource: str, params: Optional[Dict[str, str]] = None) -> Optional[Dict[str, Any]]:
+# Circuit breaker da SWAPI: falhas consecutivas para abrir e tempo (s) aberto antes da tentativa de teste
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get('SWAPI_BREAKER_THRESHOLD', '5'))
+BREAKER_RESET_TIMEOUT = float(os.environ.get('SWAPI_BREAKER_RESET', '30'))
+
+# Orçamento global de retries: cada requisição deposita RETRY_BUDGET_RATIO de crédito
+# (até RETRY_BUDGET_MAX) e cada retry consome 1, limitando os retries a ~20% do tráfego
+RETRY_BUDGET_RATIO = float(os.environ.get('SWAPI_RETRY_BUDGET_RATIO', '0.2'))
+RETRY_BUDGET_MAX = float(os.environ.get('SWAPI_RETRY_BUDGET_MAX', '10'))
+
+# Timeout (s) de cada chamada HTTP à SWAPI; encurtado para o tempo restante do prazo da requisição
+UPSTREAM_TIMEOUT = float(os.environ.get('SWAPI_TIMEOUT', '10'))
+
+# Prazo total (s) de uma requisição, do início de starwars_handler até a resposta. O cliente pode pedir
+# um prazo menor pelo header X-Deadline-Ms (nunca maior que REQUEST_DEADLINE)
+REQUEST_DEADLINE = float(os.environ.get('REQUEST_DEADLINE', '25'))
+DEADLINE_HEADER = 'X-Deadline-Ms'
+
+# Configurações do pool de conexões HTTP com a SWAPI
+# POOL_CONNECTIONS: quantidade de hosts distintos mantidos em cache pelo pool
+# POOL_MAXSIZE: conexões keep-alive mantidas por host
+# POOL_BLOCK: se True, aguarda uma conexão livre em vez de abrir conexões extras acima do limite por host
+POOL_CONNECTIONS = int(os.environ.get('SWAPI_POOL_CONNECTIONS', '4'))
+POOL_MAXSIZE = int(os.environ.get('SWAPI_POOL_MAXSIZE', '20'))
+POOL_BLOCK = os.environ.get('SWAPI_POOL_BLOCK', 'true').strip().lower() in ('1', 'true', 'yes')
+
+
+def create_http_session(pool_connections: int = POOL_CONNECTIONS,
+                        pool_maxsize: int = POOL_MAXSIZE,
+                        pool_block: bool = POOL_BLOCK) -> requests.Session:
     """
-    Função auxiliar para consultar a SWAPI com retry automático.
-    
+    Cria uma sessão HTTP com pool de conexões keep-alive para a SWAPI.
+
+    O retry é feito pelas funções fetch_*, por isso o adapter não faz retries próprios.
+
     Args:
-        resource: Tipo de recurso (people, planets, starships, films)
-        params: Parâmetros de busca opcionais
-    
+        pool_connections: Número de pools (hosts) mantidos em cache
+        pool_maxsize: Máximo de conexões reaproveitáveis por host
+        pool_block: Bloqueia quando o limite por host é atingido
+
     Returns:
-        dict: Dados JSON da resposta ou None em caso de falha
+        requests.Session configurada
     """
-    url = f"{SWAPI_BASE_URL}/{resource}/"
-    
-    for attempt in range(MAX_RETRIES):
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        pool_block=pool_block,
+        max_retries=0
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({'Connection': 'keep-alive'})
+    return session
+
+
+# Paginação da SWAPI: itens por página e número de páginas buscadas em paralelo
+SWAPI_PAGE_SIZE = 10
+PAGE_FETCH_WORKERS = int(os.environ.get('SWAPI_PAGE_WORKERS', '8'))
+
+# Fan-out das consultas correlacionadas: concorrência máxima e orçamento total de tempo (segundos)
+FANOUT_MAX_WORKERS = int(os.environ.get('SWAPI_FANOUT_WORKERS', '10'))
+FANOUT_TIME_BUDGET = float(os.environ.get('SWAPI_FANOUT_TIME_BUDGET', '20'))
+
+# Sessão compartilhada no nível do módulo: em uma instância "quente" da Cloud Function
+# as conexões TCP+TLS com a SWAPI são reaproveitadas entre invocações.
+http_session = create_http_session()
+
+
+# Buckets (segundos) dos histogramas de latência exportados em /metricas
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+METRIC_HELP = {
+    'starwars_requests_total': ('counter', 'Requisições atendidas por endpoint e status HTTP'),
+    'starwars_request_duration_seconds': ('histogram', 'Duração total das requisições por endpoint'),
+    'starwars_phase_duration_seconds': ('histogram', 'Duração de cada fase do processamento (por ocorrência)'),
+    'starwars_upstream_requests_total': ('counter', 'Chamadas HTTP à SWAPI por resultado'),
+    'starwars_upstream_retries_total': ('counter', 'Novas tentativas de chamadas à SWAPI'),
+    'starwars_cache_lookups_total': ('counter', 'Consultas aos caches em memória por resultado'),
+    'starwars_circuit_transitions_total': ('counter', 'Mudanças de estado do circuit breaker da SWAPI'),
+    'starwars_retry_budget_exhausted_total': ('counter', 'Retries descartados por falta de orçamento'),
+    'starwars_refresh_total': ('counter', 'Atualizações em segundo plano dos datasets locais por resultado'),
+    'starwars_refresh_records_total': ('counter', 'Registros aplicados nas atualizações dos datasets locais'),
+    'starwars_deadline_exceeded_total': ('counter', 'Etapas interrompidas pelo prazo da requisição'),
+}
+
+
+class Metrics:
+    """
+    Contadores e histogramas em memória (por instância), exportados no formato texto do Prometheus.
+    """
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+        self._histograms: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], List[float]] = {}
+
+    def inc(self, name: str, amount: float = 1, **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        """Registra uma observação; o estado é [contagem por bucket..., soma, contagem]."""
+        key = (name, tuple(sorted(labels.items())))
+        position = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._histograms.get(key)
+            if state is None:
+                state = self._histograms[key] = [0] * (len(self.buckets) + 2)
+            if position < len(self.buckets):
+                state[position] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def counter_value(self, name: str, **labels: str) -> float:
+        with self._lock:
+            return self._counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    @staticmethod
+    def _format_labels(labels: Sequence[Tuple[str, str]]) -> str:
+        if not labels:
+            return ''
+        escaped = (f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+                   for k, v in labels)
+        return '{' + ','.join(escaped) + '}'
+
+    def render(self, gauges: Optional[Dict[str, float]] = None) -> str:
+        """Gera o texto de exposição (text/plain; version=0.0.4)."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, list(state)) for key, state in self._histograms.items())
+
+        lines = []
+        declared = set()
+
+        def declare(name: str, kind: str) -> None:
+            if name not in declared:
+                declared.add(name)
+                lines.append(f"# HELP {name} {METRIC_HELP.get(name, (kind, name))[1]}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            declare(name, 'counter')
+            lines.append(f"{name}{self._format_labels(labels)} {value:g}")
+        for (name, labels), state in histograms:
+            declare(name, 'histogram')
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                lines.append(f"{name}_bucket{self._format_labels(labels + (('le', f'{bound:g}'),))} {cumulative}")
+            lines.append(f"{name}_bucket{self._format_labels(labels + (('le', '+Inf'),))} {state[-1]:g}")
+            lines.append(f"{name}_sum{self._format_labels(labels)} {state[-2]:.6f}")
+            lines.append(f"{name}_count{self._format_labels(labels)} {state[-1]:g}")
+        for name, value in (gauges or {}).items():
+            declare(name, 'gauge')
+            lines.append(f"{name} {value:g}")
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+
+
+class RequestTimings:
+    """
+    Tempo acumulado por fase dentro de uma requisição, emitido no header Server-Timing.
+
+    Pode ser alimentado por várias threads (fan-out); por isso fases paralelas somam mais
+    que o tempo de parede e o header informa também o número de ocorrências.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._phases: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, phase: str, seconds: float) -> None:
+        with self._lock:
+            entry = self._phases.setdefault(phase, [0.0, 0])
+            entry[0] += seconds
+            entry[1] += 1
+
+    def header(self) -> str:
+        with self._lock:
+            phases = [(name, total, count) for name, (total, count) in self._phases.items()]
+        parts = [f'{name};dur={total * 1000:.1f};desc="{count}x"' for name, total, count in phases]
+        parts.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.1f}")
+        return ', '.join(parts)
+
+
+# Tempos da requisição em andamento; propagado às threads de fan-out via contextvars.copy_context()
+_request_timings: contextvars.ContextVar[Optional[RequestTimings]] = contextvars.ContextVar(
+    'request_timings', default=None)
+
+
+@contextmanager
+def timed_phase(phase: str) -> Iterator[None]:
+    """Mede um trecho: alimenta o histograma da fase e o Server-Timing da requisição corrente."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        metrics.observe('starwars_phase_duration_seconds', elapsed, fase=phase)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.record(phase, elapsed)
+
+
+class Deadline:
+    """
+    Prazo absoluto de uma requisição (relógio monotônico), compartilhado pelas threads do fan-out.
+
+    'exceeded' fica marcado quando alguma etapa desiste por falta de tempo, para que a resposta
+    seja sinalizada como parcial.
+    """
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+        self.exceeded = False
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+
+class FlightDeadline(Deadline):
+    """
+    Prazo de uma consulta compartilhada (single-flight): o maior prazo entre as requisições que
+    ainda aguardam o resultado (None = sem prazo). Quando todas desistem, o prazo esgota e a
+    consulta para na próxima verificação, em vez de seguir em segundo plano.
+    """
+
+    def __init__(self):
+        self.exceeded = False
+        self._waiters: List[Optional[Deadline]] = []
+        self._lock = threading.Lock()
+
+    @property
+    def seconds(self) -> float:
+        with self._lock:
+            waiters = list(self._waiters)
+        return max((float('inf') if waiter is None else waiter.seconds for waiter in waiters), default=0.0)
+
+    def join(self, deadline: Optional[Deadline]) -> None:
+        with self._lock:
+            self._waiters.append(deadline)
+
+    def leave(self, deadline: Optional[Deadline]) -> None:
+        with self._lock:
+            self._waiters.remove(deadline)
+
+    def remaining(self) -> float:
+        with self._lock:
+            waiters = list(self._waiters)
+        if any(waiter is None for waiter in waiters):
+            return float('inf')
+        return max((waiter.remaining() for waiter in waiters), default=0.0)
+
+
+# Prazo da requisição em andamento; propagado às threads de fan-out junto com os tempos
+_request_deadline: contextvars.ContextVar[Optional[Deadline]] = contextvars.ContextVar(
+    'request_deadline', default=None)
+
+
+def parse_deadline(request: Request) -> float:
+    """Prazo (s) da requisição: REQUEST_DEADLINE ou o valor menor pedido no header X-Deadline-Ms."""
+    value = request.headers.get(DEADLINE_HEADER)
+    if value:
+        try:
+            requested = float(value) / 1000
+        except ValueError:
+            requested = None
+        if requested is not None and requested > 0:
+            return min(requested, REQUEST_DEADLINE)
+    return REQUEST_DEADLINE
+
+
+def remaining_time(limit: Optional[float] = None) -> Optional[float]:
+    """
+    Tempo restante do prazo da requisição corrente, limitado a 'limit'.
+
+    Returns:
+        Segundos restantes; 'limit' quando não há prazo ativo (ex.: tarefas em segundo plano)
+    """
+    deadline = _request_deadline.get()
+    if deadline is None:
+        return limit
+    remaining = deadline.remaining()
+    return remaining if limit is None else min(limit, remaining)
+
+
+def mark_deadline_exceeded(what: str) -> None:
+    """Registra que uma etapa foi interrompida pelo prazo da requisição."""
+    deadline = _request_deadline.get()
+    if isinstance(deadline, FlightDeadline):
+        # Consulta compartilhada: cada requisição que aguardava registra o próprio prazo esgotado
+        deadline.exceeded = True
+        return
+    if deadline is not None:
+        if not deadline.exceeded:
+            logger.warning(f"Prazo de {deadline.seconds:g}s da requisição esgotado: {what}")
+        deadline.exceeded = True
+    metrics.inc('starwars_deadline_exceeded_total')
+
+
+def deadline_exceeded() -> bool:
+    deadline = _request_deadline.get()
+    return deadline is not None and deadline.exceeded
+
+
+# Sinaliza que o handler respondeu 200 com resultado incompleto ("parcial": true)
+_partial_response: contextvars.ContextVar[bool] = contextvars.ContextVar('partial_response', default=False)
+
+
+def mark_partial(partial: bool) -> bool:
+    """Registra para respond_with_validators se a resposta é parcial; devolve o próprio valor."""
+    if partial:
+        _partial_response.set(True)
+    return partial
+
+
+def swapi_get(url: str, params: Optional[Dict[str, str]] = None,
+              timeout: float = UPSTREAM_TIMEOUT) -> requests.Response:
+    """GET na SWAPI pela sessão compartilhada, medido como fase 'swapi' e contado por resultado."""
+    outcome = 'erro'
+    try:
+        with timed_phase('swapi'):
+            response = http_session.get(url, params=params, timeout=timeout)
+        outcome = str(response.status_code)
+        return response
+    finally:
+        metrics.inc('starwars_upstream_requests_total', resultado=outcome)
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker compartilhado para a SWAPI.
+
+    Estados: 'fechado' (chamadas normais), 'aberto' (falha imediata, sem chamar a SWAPI) e
+    'meio-aberto' (após reset_timeout, uma única chamada de teste decide se fecha ou reabre).
+    """
+
+    def __init__(self, failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 reset_timeout: float = BREAKER_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._state = 'fechado'
+            self._failures = 0
+            self._opened_at = 0.0
+            self._trial_in_flight = False
+            self._saturated_until = 0.0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == 'aberto' and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._transition('meio-aberto')
+        return self._state
+
+    def _transition(self, state: str) -> None:
+        self._state = state
+        metrics.inc('starwars_circuit_transitions_total', estado=state)
+        logger.warning(f"Circuit breaker da SWAPI: {state}")
+
+    def allow_request(self) -> bool:
+        """Indica se uma chamada pode ser feita agora (no estado meio-aberto, só a de teste)."""
+        with self._lock:
+            state = self._current_state()
+            if state == 'fechado':
+                return True
+            if state == 'meio-aberto' and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._trial_in_flight = False
+            if self._state != 'fechado':
+                self._transition('fechado')
+
+    def release_trial(self) -> None:
+        """Libera a chamada de teste sem resultado conclusivo (ex.: interrompida pelo prazo)."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == 'meio-aberto' or (self._state == 'fechado' and self._failures >= self.failure_threshold):
+                self._opened_at = time.monotonic()
+                self._transition('aberto')
+
+    def record_saturation(self, seconds: float = 1.0) -> None:
+        """
+        Capacidade de consultas simultâneas esgotada (UpstreamPool): por 'seconds', as respostas
+        sem resultado indicam Retry-After, sem alterar o estado do circuito.
+        """
+        with self._lock:
+            self._saturated_until = time.monotonic() + seconds
+
+    def retry_after(self) -> Optional[int]:
+        """Segundos até a próxima chamada de teste, ou None se o circuito não estiver rejeitando chamadas."""
+        with self._lock:
+            state = self._current_state()
+            if state == 'fechado' or (state == 'meio-aberto' and not self._trial_in_flight):
+                if time.monotonic() < self._saturated_until:
+                    return 1
+                return None
+            if state == 'meio-aberto':
+                return 1
+            return max(1, int(self.reset_timeout - (time.monotonic() - self._opened_at) + 0.999))
+
+
+class RetryBudget:
+    """
+    Orçamento global de retries (token bucket): cada chamada nova deposita 'ratio' de crédito,
+    até 'capacity'; cada retry consome 1. Em uma indisponibilidade, os retries ficam limitados
+    a uma fração do tráfego em vez de multiplicá-lo.
+    """
+
+    def __init__(self, ratio: float = RETRY_BUDGET_RATIO, capacity: float = RETRY_BUDGET_MAX):
+        self.ratio = ratio
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._balance = self.capacity
+
+    def record_request(self) -> None:
+        with self._lock:
+            self._balance = min(self.capacity, self._balance + self.ratio)
+
+    def try_withdraw(self) -> bool:
+        with self._lock:
+            if self._balance < 1:
+                return False
+            self._balance -= 1
+            return True
+
+
+upstream_breaker = CircuitBreaker()
+retry_budget = RetryBudget()
+
+
+def backoff_delay(attempt: int) -> float:
+    """Backoff exponencial com jitter completo: uniforme entre 0 e min(RETRY_MAX_DELAY, base * fator^tentativa)."""
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_DELAY * (RETRY_BACKOFF ** attempt)))
+
+
+def request_swapi_json(url: str, params: Optional[Dict[str, str]] = None, label: Optional[str] = None,
+                       max_attempts: int = MAX_RETRIES) -> Optional[Dict[str, Any]]:
+    """
+    GET na SWAPI com circuit breaker, orçamento de retries e backoff com jitter.
+
+    Timeouts, erros de conexão e respostas 5xx contam como falha (e são retentados enquanto houver
+    tentativas e orçamento); respostas 4xx não são retentadas. Com o circuito aberto, falha
+    imediatamente sem chamar a SWAPI.
+
+    Returns:
+        JSON da resposta ou None em caso de falha
+    """
+    label = label or url
+    retry_budget.record_request()
+    attempt = 0
+    while attempt < max_attempts:
+        timeout = remaining_time(UPSTREAM_TIMEOUT)
+        if timeout <= 0:
+            mark_deadline_exceeded(f"SWAPI não consultada para {label}")
+            return None
+        if not upstream_breaker.allow_request():
+            logger.warning(f"Circuito da SWAPI aberto; falha imediata para {label}")
+            metrics.inc('starwars_upstream_requests_total', resultado='circuito_aberto')
+            return None
         try:
-            logger.info(f"Consultando SWAPI: {resource} (tentativa {attempt + 1}/{MAX_RETRIES})")
-            response = requests.get(url, params=params, timeout=10)
+            if max_attempts > 1:
+                logger.info(f"Consultando SWAPI: {label} (tentativa {attempt + 1}/{max_attempts})")
+            expires_at = time.monotonic() + timeout
+            response = swapi_get(url, params, timeout)
             response.raise_for_status()  # Levanta erro para status 4xx/5xx
-            logger.info(f"Sucesso ao consultar SWAPI: {resource}")
+            upstream_breaker.record_success()
             return response.json()
-        except requests.exceptions.Timeout:
-            if attempt < MAX_RETRIES - 1:
-                wait_time = RETRY_DELAY * (RETRY_BACKOFF ** attempt)
-                logger.warning(
-                    f"Timeout na tentativa {attempt + 1}/{MAX_RETRIES} para {resource}. "
-                    f"Aguardando {wait_time}s antes de tentar novamente."
-                )
-                time.sleep(wait_time)
-            else:
-                logger.error(f"Timeout após {MAX_RETRIES} tentativas para {resource}")
-                return None
-        except requests.exceptions.ConnectionError:
-            if attempt < MAX_RETRIES - 1:
-                wait_time = RETRY_DELAY * (RETRY_BACKOFF ** attempt)
-                logger.warning(
-                    f"Erro de conexão na tentativa {attempt + 1}/{MAX_RETRIES} para {resource}. "
-                    f"Aguardando {wait_time}s antes de tentar novamente."
-                )
-                time.sleep(wait_time)
-            else:
-                logger.error(f"Falha de conexão após {MAX_RETRIES} tentativas para {resource}")
-                return None
         except requests.exceptions.HTTPError as e:
-            # Erros 4xx não devem ser retentados (erro do cliente)
+            # Erros 4xx não devem ser retentados (erro do cliente); a SWAPI está respondendo
             if 400 <= e.response.status_code < 500:
-                logger.error(f"Erro HTTP do cliente ({e.response.status_code}) para {resource}: {e}")
+                upstream_breaker.record_success()
+                logger.error(f"Erro HTTP do cliente ({e.response.status_code}) para {label}: {e}")
                 return None
-            # Erros 5xx podem ser retentados
-            elif attempt < MAX_RETRIES - 1:
-                wait_time = RETRY_DELAY * (RETRY_BACKOFF ** attempt)
-                logger.warning(
-                    f"Erro HTTP do servidor ({e.response.status_code}) na tentativa {attempt + 1}/{MAX_RETRIES} "
-                    f"para {resource}. Aguardando {wait_time}s..."
-                )
-                time.sleep(wait_time)
-            else:
-                logger.error(f"Falha HTTP após {MAX_RETRIES} tentativas para {resource}")
+            reason = f"Erro HTTP do servidor ({e.response.status_code})"
+        except requests.exceptions.Timeout:
+            if timeout < UPSTREAM_TIMEOUT:
+                # Timeout encurtado pelo prazo da requisição: não é falha da SWAPI
+                upstream_breaker.release_trial()
+                if remaining_time(UPSTREAM_TIMEOUT) > expires_at - time.monotonic() + 0.01:
+                    # Consulta compartilhada: outra requisição com prazo maior passou a aguardar
+                    continue
+                mark_deadline_exceeded(f"timeout de {timeout:.2f}s para {label}")
                 return None
+            reason = "Timeout"
+        except requests.exceptions.ConnectionError:
+            reason = "Erro de conexão"
         except requests.exceptions.RequestException as e:
-            logger.error(f"Erro ao conectar com SWAPI para {resource}: {e}")
-            if attempt < MAX_RETRIES - 1:
-                wait_time = RETRY_DELAY * (RETRY_BACKOFF ** attempt)
-                time.sleep(wait_time)
-            else:
-                return None
-    
+            reason = f"Erro ao conectar com SWAPI ({e})"
+        except ValueError as e:
+            upstream_breaker.record_success()
+            logger.error(f"Resposta inválida da SWAPI para {label}: {e}")
+            return None
+
+        upstream_breaker.record_failure()
+        if attempt == max_attempts - 1:
+            logger.error(f"{reason}: falha após {max_attempts} tentativa(s) para {label}")
+            return None
+        if not retry_budget.try_withdraw():
+            logger.warning(f"{reason} para {label}; orçamento de retries esgotado, sem nova tentativa")
+            metrics.inc('starwars_retry_budget_exhausted_total')
+            return None
+        wait_time = backoff_delay(attempt)
+        if wait_time >= remaining_time(float('inf')):
+            mark_deadline_exceeded(f"sem tempo para nova tentativa para {label}")
+            return None
+        logger.warning(
+            f"{reason} na tentativa {attempt + 1}/{max_attempts} para {label}. "
+            f"Aguardando {wait_time:.2f}s antes de tentar novamente."
+        )
+        wait_before_retry(wait_time)
+        attempt += 1
     return None
 
 
-def fetch_swapi_url(url: str) -> Optional[Dict[str, Any]]:
+def wait_before_retry(wait_time: float) -> None:
+    """Aguarda o backoff antes de uma nova tentativa, contabilizando o retry."""
+    metrics.inc('starwars_upstream_retries_total')
+    time.sleep(wait_time)
+
+
+def upstream_unavailable_response(headers: Dict[str, str]) -> Optional[Tuple[Any, int, Dict[str, str]]]:
     """
-    Consulta a SWAPI por URL completa (usado para seguir paginação 'next').
-    Usa a mesma política de retry que fetch_from_swapi.
+    Resposta para uma consulta à SWAPI sem resultado: 503 com Retry-After se o circuito está
+    rejeitando chamadas, 504 se o prazo da requisição esgotou; None nos demais casos.
+    """
+    if deadline_exceeded():
+        return jsonify({
+            "erro": "Prazo da requisição esgotado antes da resposta da fonte externa.",
+            "parcial": True
+        }), 504, headers
+    retry_after = upstream_breaker.retry_after()
+    if retry_after is None:
+        return None
+    return jsonify({
+        "erro": "Fonte externa (SWAPI) indisponível no momento. Tente novamente em instantes.",
+        "tentar_novamente_em": retry_after
+    }), 503, {**headers, 'Retry-After': str(retry_after)}
+
+
+# Configurações do cache em memória das respostas da SWAPI
+# CACHE_TTL: tempo (s) em que uma entrada é considerada fresca
+# CACHE_STALE_TTL: janela (s) após o TTL em que a entrada ainda é servida enquanto é revalidada em segundo plano
+CACHE_TTL = float(os.environ.get('SWAPI_CACHE_TTL', '3600'))
+CACHE_STALE_TTL = float(os.environ.get('SWAPI_CACHE_STALE_TTL', '86400'))
+CACHE_MAX_ENTRIES = int(os.environ.get('SWAPI_CACHE_MAX_ENTRIES', '2000'))
+CACHE_MAX_BYTES = int(os.environ.get('SWAPI_CACHE_MAX_BYTES', str(32 * 1024 * 1024)))
+
+
+class ResponseCache:
+    """
+    Cache LRU em memória com TTL e suporte a stale-while-revalidate.
+
+    Limita tanto o número de entradas quanto o tamanho total estimado (bytes do JSON).
+    Seguro para uso concorrente entre threads da mesma instância.
     """
-    for attempt in range(MAX_RETRIES):
+
+    def __init__(self, ttl: float, stale_ttl: float, max_entries: int, max_bytes: int):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: 'OrderedDict[str, Tuple[Any, int, float]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._total_bytes = 0
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Tuple[Optional[Any], str]:
+        """
+        Busca uma entrada no cache.
+
+        Returns:
+            Tupla (valor, estado) onde estado é 'hit', 'stale' ou 'miss'
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None, 'miss'
+
+            value, size, stored_at = entry
+            age = time.monotonic() - stored_at
+            if age <= self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value, 'hit'
+            if age <= self.ttl + self.stale_ttl:
+                self._entries.move_to_end(key)
+                self.stale_hits += 1
+                return value, 'stale'
+
+            # Expirada além da janela de revalidação
+            del self._entries[key]
+            self._total_bytes -= size
+            self.misses += 1
+            return None, 'miss'
+
+    def set(self, key: str, value: Any, size: Optional[int] = None) -> None:
+        """Armazena uma entrada, removendo as menos usadas se os limites forem excedidos."""
+        if size is None:
+            size = len(json.dumps(value, separators=(',', ':')))
+        if size > self.max_bytes:
+            logger.warning(f"Resposta de {size} bytes excede o limite do cache; não será armazenada: {key}")
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._total_bytes -= previous[1]
+            self._entries[key] = (value, size, time.monotonic())
+            self._total_bytes += size
+            self._evict_over_limits()
+
+    def grow(self, key: str, value: Any, extra: int) -> bool:
+        """
+        Soma 'extra' bytes ao tamanho de uma entrada ainda presente com o mesmo valor (ex.: variantes
+        derivadas guardadas dentro dele), sem renovar o TTL, e aplica os limites.
+
+        Returns:
+            False se a entrada já não estiver no cache (o chamador não deve anexar os dados ao valor)
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] is not value:
+                return False
+            self._entries[key] = (value, entry[1] + extra, entry[2])
+            self._total_bytes += extra
+            self._evict_over_limits()
+            return True
+
+    def _evict_over_limits(self) -> None:
+        """Remove as entradas menos usadas até respeitar os limites (chamar com o lock)."""
+        while len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes:
+            _, (_, evicted_size, _) = self._entries.popitem(last=False)
+            self._total_bytes -= evicted_size
+            self.evictions += 1
+
+    def discard(self, key: str) -> None:
+        """Remove uma entrada, se existir."""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._total_bytes -= entry[1]
+
+    def clear(self) -> None:
+        """Remove todas as entradas e zera os contadores."""
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+            self.hits = self.stale_hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Retorna os contadores do cache."""
+        with self._lock:
+            return {
+                'entradas': len(self._entries),
+                'bytes': self._total_bytes,
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+
+response_cache = ResponseCache(CACHE_TTL, CACHE_STALE_TTL, CACHE_MAX_ENTRIES, CACHE_MAX_BYTES)
+
+
+class SingleFlight:
+    """
+    Coalescência de requisições idênticas (single-flight).
+
+    Chamadas concorrentes com a mesma chave aguardam uma única execução em andamento
+    e compartilham seu resultado ou sua exceção.
+    """
+
+    class _Call:
+        def __init__(self):
+            self.done = threading.Event()
+            self.result: Any = None
+            self.error: Optional[BaseException] = None
+            self.deadline: Optional[FlightDeadline] = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, 'SingleFlight._Call'] = {}
+        self.executions = 0
+        self.shared = 0
+
+    def _join(self, key: str) -> Tuple['SingleFlight._Call', bool]:
+        """Execução em andamento para a chave (ou uma nova) e se quem chamou a inicia."""
+        call = self._calls.get(key)
+        if call is not None:
+            self.shared += 1
+            return call, False
+        call = SingleFlight._Call()
+        self._calls[key] = call
+        self.executions += 1
+        return call, True
+
+    def do(self, key: str, func: Callable[[], Any], timeout: Optional[float] = None) -> Any:
+        """
+        Executa func para a chave, ou aguarda a execução já em andamento
+        (por até 'timeout' segundos; esgotado o tempo, retorna None).
+        """
+        with self._lock:
+            call, is_leader = self._join(key)
+
+        if is_leader:
+            self._execute(key, call, func)
+
+        if not call.done.wait(timeout):
+            return None
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def do_shared(self, key: str, func: Callable[[FlightDeadline], Any], executor: 'UpstreamPool',
+                  deadline: Optional[Deadline], rejected: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Como do(), mas a execução roda no executor e recebe um FlightDeadline: o maior prazo entre
+        os chamadores que aguardam. Cada chamador espera só até o próprio prazo ('deadline', None
+        para sem prazo) e então sai do grupo; quando todos saem, o prazo da execução esgota.
+        Se o executor recusar a tarefa, o resultado compartilhado é o de rejected().
+
+        Returns:
+            (resultado, interrompida): interrompida indica que o resultado não foi obtido por prazo,
+            o do chamador (espera esgotada) ou o da execução (todos os chamadores haviam desistido)
+        """
+        with self._lock:
+            call, is_leader = self._join(key)
+            if is_leader:
+                call.deadline = FlightDeadline()
+            if call.deadline is not None:
+                call.deadline.join(deadline)
+
+        if is_leader:
+            context = contextvars.copy_context()
+            if not executor.submit(context.run, self._execute, key, call, lambda: func(call.deadline)):
+                self._execute(key, call, rejected)
+
         try:
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.HTTPError as e:
-            if 400 <= e.response.status_code < 500:
-                logger.error(f"Erro HTTP do cliente ao buscar {url}: {e}")
-                return None
-            if attempt < MAX_RETRIES - 1:
-                time.sleep(RETRY_DELAY * (RETRY_BACKOFF ** attempt))
-            else:
-                logger.error(f"Erro ao buscar URL SWAPI {url}: {e}")
-                return None
-        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError,
-                requests.exceptions.RequestException) as e:
-            if attempt < MAX_RETRIES - 1:
-                time.sleep(RETRY_DELAY * (RETRY_BACKOFF ** attempt))
-            else:
-                logger.error(f"Erro ao buscar URL SWAPI {url}: {e}")
-                return None
-    return None
+            finished = call.done.wait(None if deadline is None else deadline.remaining())
+        finally:
+            if call.deadline is not None:
+                call.deadline.leave(deadline)
+        if not finished:
+            return None, True
+        if call.error is not None:
+            raise call.error
+        return call.result, call.result is None and call.deadline is not None and call.deadline.exceeded
+
+    def _execute(self, key: str, call: '_Call', func: Callable[[], Any]) -> None:
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
 
 
-def fetch_all_pages_swapi(resource: str, params: Optional[Dict[str, str]] = None) -> Optional[Tuple[list, int]]:
+upstream_flight = SingleFlight()
+
+
+class UpstreamPool:
+    """
+    Executor de tamanho fixo para as consultas à SWAPI, sem fila: cada tarefa ocupa uma vaga até
+    terminar, e submit recusa trabalho quando todas estão ocupadas em vez de acumular threads.
     """
-    Busca todos os resultados do recurso na SWAPI, percorrendo todas as páginas.
-    A SWAPI retorna no máximo 10 itens por página e um campo 'next' com a URL da próxima página.
 
-    Returns:
-        Tupla (lista_completa_de_resultados, total_count) ou None em caso de falha.
+    def __init__(self, size: int):
+        self.size = size
+        self._executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix='swapi')
+        self._slots = threading.BoundedSemaphore(size)
+
+    def submit(self, func: Callable[..., Any], *args: Any) -> bool:
+        """Agenda func(*args) se houver vaga; retorna False (sem agendar) caso contrário."""
+        if not self._slots.acquire(blocking=False):
+            return False
+        try:
+            self._executor.submit(self._run, func, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        return True
+
+    def _run(self, func: Callable[..., Any], *args: Any) -> None:
+        try:
+            func(*args)
+        finally:
+            self._slots.release()
+
+
+# Consultas compartilhadas à SWAPI: no máximo POOL_MAXSIZE em paralelo, uma por conexão do pool HTTP
+upstream_pool = UpstreamPool(POOL_MAXSIZE)
+
+# Revalidações em segundo plano (stale-while-revalidate); evita revalidar a mesma chave em paralelo
+_revalidation_executor = ThreadPoolExecutor(max_workers=2)
+_revalidating_keys = set()
+_revalidating_lock = threading.Lock()
+
+
+def normalize_cache_key(url: str, params: Optional[Dict[str, str]] = None) -> str:
     """
-    data = fetch_from_swapi(resource, params)
-    if data is None:
-        return None
+    Normaliza URL + parâmetros em uma chave de cache estável
+    (host em minúsculas, barra final no path, parâmetros ordenados).
+    """
+    parts = urlsplit(url)
+    path = parts.path if parts.path.endswith('/') else parts.path + '/'
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    if params:
+        query.extend((key, str(value)) for key, value in params.items())
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, urlencode(sorted(query)), ''))
 
-    all_results = list(data.get('results', []))
-    total_count = data.get('count', len(all_results))
-    next_url = data.get('next')
 
-    while next_url:
-        data = fetch_swapi_url(next_url)
-        if data is None:
-            logger.warning("Falha ao obter próxima página da SWAPI; retornando resultados obtidos até aqui.")
-            break
-        page_results = data.get('results', [])
-        all_results.extend(page_results)
-        next_url = data.get('next')
+def _load_and_store(key: str, loader: Callable[[], Optional[Any]]) -> Optional[Any]:
+    """Executa loader e armazena o resultado no cache (falhas não são armazenadas)."""
+    value = loader()
+    if value is not None:
+        response_cache.set(key, value)
+    return value
 
-    logger.info(f"SWAPI: total de {len(all_results)} resultado(s) para {resource} (count={total_count})")
-    return (all_results, total_count)
+
+def _revalidate(key: str, loader: Callable[[], Optional[Any]]) -> None:
+    """Recarrega uma entrada expirada e atualiza o cache."""
+    try:
+        upstream_flight.do(key, lambda: _load_and_store(key, loader))
+    except Exception as e:
+        logger.error(f"Erro ao revalidar entrada do cache {key}: {e}")
+    finally:
+        with _revalidating_lock:
+            _revalidating_keys.discard(key)
 
 
-def sort_results(results: list, sort_by: str, sort_order: str, resource_type: str) -> list:
+# Ativo durante a atualização dos datasets em segundo plano (DatasetRefresher): as consultas
+# ignoram o cache (e o realimentam) para obter a versão atual da SWAPI
+_bypass_cache: contextvars.ContextVar[bool] = contextvars.ContextVar('bypass_cache', default=False)
+
+
+def cached_fetch(url: str, params: Optional[Dict[str, str]],
+                 loader: Callable[[], Optional[Any]]) -> Optional[Any]:
     """
-    Ordena os resultados baseado no campo especificado.
+    Consulta o cache antes de executar loader (a chamada à SWAPI).
+
+    Entradas frescas são retornadas diretamente; entradas na janela stale são retornadas
+    e revalidadas em segundo plano; falhas (None) não são armazenadas. Em caso de miss,
+    chamadas concorrentes para a mesma chave compartilham uma única consulta (single-flight).
+    """
+    key = normalize_cache_key(url, params)
+    if _bypass_cache.get():
+        return _shared_load(key, loader)
+
+    with timed_phase('cache'):
+        value, state = response_cache.get(key)
+    metrics.inc('starwars_cache_lookups_total', cache='swapi', resultado=state)
+
+    if state == 'hit':
+        return value
+
+    if state == 'stale':
+        with _revalidating_lock:
+            should_schedule = key not in _revalidating_keys
+            _revalidating_keys.add(key)
+        if should_schedule:
+            _revalidation_executor.submit(_revalidate, key, loader)
+        return value
+
+    return _shared_load(key, loader)
+
+
+def _shared_load(key: str, loader: Callable[[], Optional[Any]]) -> Optional[Any]:
+    """
+    Executa loader via single-flight em upstream_pool, armazenando o resultado.
+
+    A consulta compartilhada segue o maior prazo entre as requisições que aguardam por ela: um
+    prazo curto (X-Deadline-Ms) não encurta a espera das demais, e quando todas desistem a
+    consulta para na próxima verificação de prazo (timeout, retry ou backoff). Com todas as vagas
+    de upstream_pool ocupadas, falha imediatamente, como com o circuito aberto (503 + Retry-After).
+    """
+    deadline = _request_deadline.get()
+    while True:
+        if deadline is not None and deadline.remaining() <= 0:
+            mark_deadline_exceeded(f"SWAPI não consultada para {key}")
+            return None
+        value, interrupted = upstream_flight.do_shared(
+            key, lambda flight_deadline: _load_within(flight_deadline, key, loader), upstream_pool, deadline,
+            lambda: _reject_saturated(key))
+        if not interrupted:
+            return value
+        # Prazo do chamador esgotado (registrado acima) ou consulta abandonada pelos demais: nova tentativa
+
+
+def _reject_saturated(key: str) -> None:
+    """Resultado de uma consulta recusada por falta de vaga em upstream_pool."""
+    logger.warning(f"Capacidade de consultas à SWAPI esgotada ({upstream_pool.size}); falha imediata para {key}")
+    metrics.inc('starwars_upstream_requests_total', resultado='saturado')
+    upstream_breaker.record_saturation()
+    return None
+
+
+def _load_within(deadline: FlightDeadline, key: str, loader: Callable[[], Optional[Any]]) -> Optional[Any]:
+    """_load_and_store na thread da consulta compartilhada, sob o prazo do grupo que a aguarda."""
+    _request_deadline.set(deadline)
+    return _load_and_store(key, loader)
+
+
+def fetch_from_swapi(resource: str, params: Optional[Dict[str, str]] = None) -> Optional[Dict[str, Any]]:
+    """
+    Função auxiliar para consultar a SWAPI com retry automático.
+    As respostas passam pelo cache em memória (response_cache).
     
     Args:
-        results: Lista de resultados para ordenar
-        sort_by: Campo para ordenação (nome, altura, etc.)
-        sort_order: Ordem de classificação ('asc' ou 'desc')
-        resource_type: Tipo de recurso para determinar campos válidos
+        resource: Tipo de recurso (people, planets, starships, films)
+        params: Parâmetros de busca opcionais
     
     Returns:
-        Lista ordenada de resultados
+        dict: Dados JSON da resposta ou None em caso de falha
+    """
+    url = f"{SWAPI_BASE_URL}/{resource}/"
+    return cached_fetch(url, params, lambda: _request_from_swapi(resource, url, params))
+
+
+def _request_from_swapi(resource: str, url: str, params: Optional[Dict[str, str]]) -> Optional[Dict[str, Any]]:
+    """Executa a consulta de fetch_from_swapi na SWAPI (sem cache), com retry."""
+    return request_swapi_json(url, params, label=resource)
+
+
+def fetch_swapi_url(url: str) -> Optional[Dict[str, Any]]:
+    """
+    Consulta a SWAPI por URL completa (usado para seguir paginação 'next').
+    Usa a mesma política de retry e o mesmo cache que fetch_from_swapi.
+    """
+    return cached_fetch(url, None, lambda: _request_swapi_url(url))
+
+
+def _request_swapi_url(url: str) -> Optional[Dict[str, Any]]:
+    """Executa a consulta de fetch_swapi_url na SWAPI (sem cache), com retry."""
+    return request_swapi_json(url)
+
+
+def iter_fan_out(func: Callable[[Any], Any], items: Sequence[Any], max_workers: int,
+                 time_budget: Optional[float] = None) -> Iterator[Tuple[Any, Optional[Any]]]:
+    """
+    Executa func para cada item com concorrência limitada e entrega (item, resultado)
+    na ordem de entrada, assim que cada prefixo da sequência fica pronto.
+
+    Itens que falharem (exceção) ou não terminarem dentro do orçamento de tempo
+    resultam em None.
+
+    Args:
+        func: Função aplicada a cada item
+        items: Itens de entrada
+        max_workers: Máximo de execuções simultâneas
+        time_budget: Tempo máximo total em segundos (None = sem limite)
+    """
+    if not items:
+        return
+
+    deadline = None if time_budget is None else time.monotonic() + time_budget
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items))))
+    timed_out = 0
+    try:
+        # Cada tarefa roda numa cópia do contexto da requisição (tempos do Server-Timing)
+        futures = [executor.submit(contextvars.copy_context().run, func, item) for item in items]
+        for item, future in zip(items, futures):
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                yield item, future.result(timeout=remaining)
+            except FutureTimeoutError:
+                timed_out += 1
+                yield item, None
+            except Exception as e:
+                logger.error(f"Erro durante execução concorrente: {e}")
+                yield item, None
+    finally:
+        # Não bloqueia esperando itens que estouraram o orçamento
+        executor.shutdown(wait=False, cancel_futures=True)
+        if timed_out:
+            if remaining_time(1.0) <= 0:
+                mark_deadline_exceeded(f"{timed_out} de {len(items)} item(ns) do fan-out sem resposta")
+            logger.warning(f"Orçamento de tempo de {time_budget}s esgotado: {timed_out} de {len(items)} item(ns) sem resposta")
+
+
+def fan_out(func: Callable[[Any], Any], items: Sequence[Any], max_workers: int,
+            time_budget: Optional[float] = None) -> List[Optional[Any]]:
+    """
+    Executa func para cada item com concorrência limitada, preservando a ordem de entrada.
+
+    Itens que falharem (exceção) ou não terminarem dentro do orçamento de tempo
+    resultam em None na posição correspondente.
+
+    Returns:
+        Lista de resultados alinhada com items
+    """
+    return [result for _, result in iter_fan_out(func, items, max_workers, time_budget)]
+
+
+def build_page_urls(next_url: str, page_size: int, total_count: int) -> List[str]:
+    """
+    Calcula as URLs das páginas restantes a partir do campo 'next' da primeira página.
+
+    Args:
+        next_url: URL da segunda página retornada pela SWAPI
+        page_size: Quantidade de itens por página
+        total_count: Campo 'count' retornado pela SWAPI
+
+    Returns:
+        Lista de URLs da página 2 até a última, em ordem
+    """
+    if page_size <= 0:
+        return [next_url]
+
+    total_pages = (total_count + page_size - 1) // page_size
+    parts = urlsplit(next_url)
+    query = [(key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True) if key != 'page']
+
+    urls = []
+    for page in range(2, total_pages + 1):
+        page_query = urlencode(query + [('page', str(page))])
+        urls.append(urlunsplit((parts.scheme, parts.netloc, parts.path, page_query, parts.fragment)))
+    return urls or [next_url]
+
+
+def fetch_all_pages_swapi(resource: str, params: Optional[Dict[str, str]] = None) -> Optional[Tuple[list, int]]:
+    """
+    Busca todos os resultados do recurso na SWAPI, percorrendo todas as páginas.
+    A SWAPI retorna no máximo 10 itens por página e um campo 'next' com a URL da próxima página.
+    Como a primeira página já informa o 'count', as demais URLs são calculadas de antemão
+    e buscadas em paralelo (até PAGE_FETCH_WORKERS simultâneas), sendo agregadas em ordem.
+
+    Returns:
+        Tupla (lista_completa_de_resultados, total_count) ou None em caso de falha.
+    """
+    data = fetch_from_swapi(resource, params)
+    if data is None:
+        return None
+
+    all_results = list(data.get('results', []))
+    total_count = data.get('count', len(all_results))
+    next_url = data.get('next')
+
+    if next_url:
+        page_size = len(all_results) or SWAPI_PAGE_SIZE
+        page_urls = build_page_urls(next_url, page_size, total_count)
+
+        pages = fan_out(fetch_swapi_url, page_urls, PAGE_FETCH_WORKERS, time_budget=remaining_time())
+
+        # Mantém o comportamento sequencial: na primeira página com falha, retorna o que foi obtido até ali
+        next_url = None
+        for page_data in pages:
+            if page_data is None:
+                logger.warning("Falha ao obter próxima página da SWAPI; retornando resultados obtidos até aqui.")
+                next_url = None
+                break
+            all_results.extend(page_data.get('results', []))
+            next_url = page_data.get('next')
+
+        # Se o 'count' estava desatualizado e ainda há páginas, segue o 'next' como antes
+        while next_url and remaining_time(1.0) > 0:
+            data = fetch_swapi_url(next_url)
+            if data is None:
+                logger.warning("Falha ao obter próxima página da SWAPI; retornando resultados obtidos até aqui.")
+                break
+            all_results.extend(data.get('results', []))
+            next_url = data.get('next')
+
+    # Lista completa e sem filtro: registra como dataset local para busca/relações em memória
+    # (na atualização em segundo plano, quem aplica as mudanças é o DatasetRefresher)
+    if not params and len(all_results) >= total_count and not _bypass_cache.get():
+        register_local_dataset(resource, all_results)
+
+    logger.info(f"SWAPI: total de {len(all_results)} resultado(s) para {resource} (count={total_count})")
+    return (all_results, total_count)
+
+
+# Snapshot local do dataset da SWAPI
+# SNAPSHOT_PATH: quando definido, /explorar e as consultas correlacionadas são servidos apenas a partir do snapshot
+SNAPSHOT_FORMAT = 'starwars-snapshot'
+SNAPSHOT_VERSION = 1
+SNAPSHOT_PATH = os.environ.get('SWAPI_SNAPSHOT_PATH')
+
+# Datasets em memória (snapshot e listagens completas) no formato compacto de CompactRecords
+COMPACT_RECORDS = os.environ.get('SWAPI_COMPACT_RECORDS', 'true').strip().lower() in ('1', 'true', 'yes')
+
+# Campos usados pelo '?search=' da SWAPI em cada tipo de recurso
+SEARCH_FIELDS = {
+    'people': ('name',),
+    'planets': ('name',),
+    'starships': ('name', 'model'),
+    'films': ('title',)
+}
+
+
+def parse_resource_url(url: str) -> Optional[Tuple[str, int]]:
+    """
+    Extrai tipo de recurso e ID de uma URL da SWAPI (ex.: .../api/people/1/ -> ('people', 1)).
+
+    Returns:
+        Tupla (tipo, id) ou None se a URL não identificar um recurso
+    """
+    segments = [segment for segment in urlsplit(url).path.split('/') if segment]
+    if len(segments) < 2 or not segments[-1].isdigit():
+        return None
+    return segments[-2], int(segments[-1])
+
+
+# Maior ID representável nos arrays de IDs ('I': inteiro sem sinal de 32 bits)
+_MAX_COMPACT_ID = 2 ** 32 - 1
+
+
+def split_swapi_url(value: Any) -> Optional[Tuple[str, int]]:
+    """
+    Separa uma URL de recurso em (prefixo, id): '.../api/people/1/' -> ('.../api/people/', 1).
+
+    Returns:
+        Tupla (prefixo, id) ou None se o valor não for uma URL que se reconstrói exatamente
+        como prefixo + id + '/'
+    """
+    if not isinstance(value, str) or not value.endswith('/'):
+        return None
+    prefix, _, tail = value[:-1].rpartition('/')
+    if not prefix or not (tail.isascii() and tail.isdigit()) or str(int(tail)) != tail:
+        return None
+    return prefix + '/', int(tail)
+
+
+class CompactRecords:
+    """
+    Registros de um tipo de recurso em formato compacto, com a interface de leitura de uma lista de dicts.
+
+    Cada registro vira uma tupla (forma, valor1, valor2, ...), em que a forma indexa a sequência de
+    chaves do registro (todos os registros da SWAPI de um tipo têm a mesma). As strings são internadas
+    (valores repetidos como 'unknown', 'n/a' ou 'male' ficam com uma única cópia), e os campos cujos
+    valores são todos URLs da SWAPI com o mesmo prefixo guardam só o ID inteiro ('url', 'homeworld')
+    ou um array('I') de IDs (listas de URLs). Os dicts são materializados sob demanda, ao indexar,
+    fatiar ou iterar, sempre como cópias novas.
+    """
+
+    __slots__ = ('_rows', '_shapes', '_prefixes')
+
+    def __init__(self, rows: List[tuple], shapes: List[Tuple[str, ...]], prefixes: Dict[str, str]):
+        self._rows = rows
+        self._shapes = shapes
+        self._prefixes = prefixes  # prefixo das URLs de cada campo codificado como IDs
+
+    @classmethod
+    def from_dicts(cls, records: Iterable[Dict[str, Any]]) -> 'CompactRecords':
+        """Converte uma lista de registros (dicts da SWAPI) para o formato compacto."""
+        records = list(records)
+        prefixes = {}
+        for field in dict.fromkeys(key for record in records for key in record):
+            prefix = cls._url_prefix(record.get(field) for record in records)
+            if prefix is not None:
+                prefixes[sys.intern(field)] = prefix
+
+        shapes: List[Tuple[str, ...]] = []
+        shape_ids: Dict[Tuple[str, ...], int] = {}
+        rows = []
+        for record in records:
+            shape = tuple(record)
+            shape_id = shape_ids.get(shape)
+            if shape_id is None:
+                shape_id = shape_ids[shape] = len(shapes)
+                shapes.append(tuple(sys.intern(field) for field in shape))
+            rows.append((shape_id, *(cls._encode(value, prefixes.get(field)) for field, value in record.items())))
+        return cls(rows, shapes, prefixes)
+
+    def updated(self, records: Sequence[Dict[str, Any]], reused: Dict[int, int]) -> Optional['CompactRecords']:
+        """
+        Nova versão com os registros dados, reaproveitando as linhas já codificadas.
+
+        Args:
+            records: Lista completa da nova versão (dicts da SWAPI)
+            reused: Posição nova -> posição atual dos registros que não mudaram
+
+        Returns:
+            CompactRecords ou None se algum registro novo não couber na codificação atual
+            (URL com outro prefixo), caso em que a conversão deve ser refeita com from_dicts
+        """
+        shapes = list(self._shapes)
+        shape_ids = {shape: index for index, shape in enumerate(shapes)}
+        rows = []
+        for position, record in enumerate(records):
+            previous = reused.get(position)
+            if previous is not None:
+                rows.append(self._rows[previous])
+                continue
+            for field, prefix in self._prefixes.items():
+                value = record.get(field)
+                urls = value if isinstance(value, list) else () if value is None else (value,)
+                if any((split_swapi_url(url) or ('', 0))[0] != prefix for url in urls):
+                    return None
+            shape = tuple(record)
+            shape_id = shape_ids.get(shape)
+            if shape_id is None:
+                shape_id = shape_ids[shape] = len(shapes)
+                shapes.append(tuple(sys.intern(field) for field in shape))
+            rows.append((shape_id, *(self._encode(value, self._prefixes.get(field)) for field, value in record.items())))
+        return CompactRecords(rows, shapes, self._prefixes)
+
+    @staticmethod
+    def _url_prefix(values: Iterable[Any]) -> Optional[str]:
+        """Prefixo comum se todos os valores do campo forem URLs (ou listas de URLs) de recurso; senão None."""
+        prefix = None
+        for value in values:
+            if value is None:
+                continue
+            for url in (value if isinstance(value, list) else (value,)):
+                parsed = split_swapi_url(url)
+                if parsed is None or parsed[1] > _MAX_COMPACT_ID or (prefix is not None and parsed[0] != prefix):
+                    return None
+                prefix = parsed[0]
+        return prefix and sys.intern(prefix)
+
+    @classmethod
+    def _encode(cls, value: Any, prefix: Optional[str]) -> Any:
+        if prefix is None or value is None:
+            return cls._freeze(value)
+        if isinstance(value, str):
+            return split_swapi_url(value)[1]
+        return array('I', [split_swapi_url(url)[1] for url in value])
+
+    @classmethod
+    def _freeze(cls, value: Any) -> Any:
+        """Interna strings e troca listas por tuplas (imutáveis e menores)."""
+        if isinstance(value, str):
+            return sys.intern(value)
+        if isinstance(value, list):
+            return tuple(cls._freeze(item) for item in value)
+        return value
+
+    @classmethod
+    def _thaw(cls, value: Any) -> Any:
+        if isinstance(value, tuple):
+            return [cls._thaw(item) for item in value]
+        return value
+
+    def _decode(self, field: str, value: Any) -> Any:
+        prefix = self._prefixes.get(field)
+        if prefix is None:
+            return self._thaw(value)
+        if isinstance(value, int):
+            return f"{prefix}{value}/"
+        if isinstance(value, array):
+            return [f"{prefix}{resource_id}/" for resource_id in value]
+        return value
+
+    def _materialize(self, row: tuple) -> Dict[str, Any]:
+        return {field: self._decode(field, value) for field, value in zip(self._shapes[row[0]], row[1:])}
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._materialize(row) for row in self._rows[index]]
+        return self._materialize(self._rows[index])
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return (self._materialize(row) for row in self._rows)
+
+    def column(self, field: str, default: Any = None) -> List[Any]:
+        """Valores de um campo em todos os registros (default onde ausente), sem materializar os dicts."""
+        offsets = [shape.index(field) + 1 if field in shape else None for shape in self._shapes]
+        column = []
+        for row in self._rows:
+            offset = offsets[row[0]]
+            column.append(default if offset is None else self._decode(field, row[offset]))
+        return column
+
+
+def record_column(records: Sequence[Dict[str, Any]], field: str, default: Any = None) -> List[Any]:
+    """Valores de um campo em todos os registros, de uma lista de dicts ou de um CompactRecords."""
+    if isinstance(records, CompactRecords):
+        return records.column(field, default)
+    return [record.get(field, default) for record in records]
+
+
+class RecordView:
+    """Sequência preguiçosa dos registros nas posições dadas: só o que for lido vira dict."""
+
+    __slots__ = ('_records', '_positions')
+
+    def __init__(self, records: Sequence[Dict[str, Any]], positions: Sequence[int]):
+        self._records = records
+        self._positions = positions
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._records[position] for position in self._positions[index]]
+        return self._records[self._positions[index]]
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return (self._records[position] for position in self._positions)
+
+
+def splice(items: List[Any], removed: Sequence[int] = (), inserted: Sequence[Tuple[int, Any]] = ()) -> List[Any]:
+    """
+    Nova lista sem os índices 'removed' e com os valores de 'inserted' ((índice, valor), índices da
+    lista já sem os removidos, em ordem crescente) — copiando os trechos intactos de uma vez.
+    """
+    kept: List[Any] = []
+    start = 0
+    for index in sorted(removed):
+        kept += items[start:index]
+        start = index + 1
+    kept += items[start:]
+    if not inserted:
+        return kept
+    result: List[Any] = []
+    start = 0
+    for index, value in inserted:
+        result += kept[start:index]
+        result.append(value)
+        start = index
+    result += kept[start:]
+    return result
+
+
+class SearchIndex:
+    """
+    Índice em memória para busca por substring nos campos de nome/título.
+
+    Guarda os valores indexados (em minúsculas) e, ordenados pelo sufixo correspondente, pares
+    (valor, deslocamento) em arrays compactos — sem criar uma string por sufixo. Como toda
+    substring é prefixo de algum sufixo, a busca vira uma faixa de prefixo localizada por busca
+    binária, com a mesma semântica case-insensitive do '?search=' da SWAPI.
+
+    O valor do campo i do registro na posição p fica em _values[p * len(fields) + i].
+    """
+
+    def __init__(self, records: Sequence[Dict[str, Any]], fields: Sequence[str]):
+        self._fields = len(fields)
+        columns = [[str(value or '').lower() for value in record_column(records, field)] for field in fields]
+        self._values: List[str] = [value for row in zip(*columns) for value in row]
+        entries = sorted((value[offset:], value_id, offset) for value_id, value in enumerate(self._values)
+                         for offset in range(len(value)))
+        self._value_ids = array('I', [value_id for _, value_id, _ in entries])
+        self._offsets = array('I', [offset for _, _, offset in entries])
+
+    def updated(self, stale: Sequence[int], records: Sequence[Dict[str, Any]], dirty: Sequence[int],
+                remap: Optional[List[int]], fields: Sequence[str]) -> 'SearchIndex':
+        """
+        Novo índice a partir deste, localizando por busca binária só as entradas que mudam (as
+        entradas ficam ordenadas por (sufixo, valor), e os trechos intactos são copiados sem reordenar).
+
+        Args:
+            stale: Posições atuais dos registros alterados ou removidos (saem do índice)
+            records: Registros da nova versão
+            dirty: Posições novas dos registros alterados ou incluídos (entram no índice)
+            remap: Posição atual -> posição nova dos demais registros (None se não mudarem de posição)
+        """
+        width = self._fields
+        removed = []
+        for position in stale:
+            for value_id in range(position * width, (position + 1) * width):
+                value = self._values[value_id]
+                for offset in range(len(value)):
+                    removed.append(self._locate(self._values, self._value_ids, self._offsets,
+                                                value[offset:], value_id))
+
+        index = SearchIndex([], fields)
+        values = index._values = [''] * (len(records) * width)
+        stale_positions = set(stale)
+        for position in range(len(self._values) // width):
+            if position not in stale_positions:
+                target = position if remap is None else remap[position]
+                values[target * width:(target + 1) * width] = self._values[position * width:(position + 1) * width]
+        for position in dirty:
+            values[position * width:(position + 1) * width] = self._values_of(records[position], fields)
+
+        value_ids = splice(self._value_ids, removed)
+        offsets = splice(self._offsets, removed)
+        if remap is not None:
+            value_ids = [remap[value_id // width] * width + value_id % width for value_id in value_ids]
+
+        inserted = sorted((values[value_id][offset:], value_id, offset) for position in dirty
+                          for value_id in range(position * width, (position + 1) * width)
+                          for offset in range(len(values[value_id])))
+        inserted_ids, inserted_offsets = [], []
+        for suffix, value_id, offset in inserted:
+            at = self._locate(values, value_ids, offsets, suffix, value_id)
+            inserted_ids.append((at, value_id))
+            inserted_offsets.append((at, offset))
+
+        index._value_ids = array('I', splice(value_ids, inserted=inserted_ids))
+        index._offsets = array('I', splice(offsets, inserted=inserted_offsets))
+        return index
+
+    @staticmethod
+    def _values_of(record: Dict[str, Any], fields: Sequence[str]) -> List[str]:
+        return [str(record.get(field) or '').lower() for field in fields]
+
+    @staticmethod
+    def _locate(values: List[str], value_ids: Sequence[int], offsets: Sequence[int], suffix: str, value_id: int) -> int:
+        """Índice da primeira entrada que não precede (suffix, value_id)."""
+        low, high = 0, len(value_ids)
+        while low < high:
+            middle = (low + high) // 2
+            entry = value_ids[middle]
+            if (values[entry][offsets[middle]:], entry) < (suffix, value_id):
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def search(self, term: str) -> List[int]:
+        """Retorna as posições (em ordem crescente) dos registros que contêm o termo."""
+        term = term.lower()
+        size = len(term)
+        values, value_ids, offsets = self._values, self._value_ids, self._offsets
+        low, high = 0, len(value_ids)
+        while low < high:
+            middle = (low + high) // 2
+            if values[value_ids[middle]][offsets[middle]:offsets[middle] + size] < term:
+                low = middle + 1
+            else:
+                high = middle
+        matches = set()
+        while low < len(value_ids) and values[value_ids[low]].startswith(term, offsets[low]):
+            matches.add(value_ids[low] // self._fields)
+            low += 1
+        return sorted(matches)
+
+
+class ResourceDataset:
+    """
+    Conjunto completo de registros de um tipo de recurso, mantido em memória.
+
+    Os registros são endereçados por posição (ordem original da SWAPI) e por ID. Com COMPACT_RECORDS
+    ativo, ficam guardados em um CompactRecords e só viram dicts quando lidos.
+    """
+
+    def __init__(self, resource: str, records: Sequence[Dict[str, Any]], ids: Optional[List[Optional[int]]] = None):
+        """
+        Args:
+            ids: ID de cada registro, quando já conhecidos (evita interpretar as URLs de novo)
+        """
+        self.resource = resource
+        if COMPACT_RECORDS and not isinstance(records, CompactRecords):
+            records = CompactRecords.from_dicts(records)
+        self.records = records
+        self._search_index: Optional[SearchIndex] = None
+        self._sort_columns: Dict[str, List[Optional[Tuple[int, Any]]]] = {}
+        self._sorted_positions: Dict[Tuple[str, str], List[int]] = {}
+        if ids is None:
+            ids = []
+            for url in record_column(records, 'url', ''):
+                parsed = parse_resource_url(url)
+                ids.append(parsed[1] if parsed else None)
+        self._ids: List[Optional[int]] = ids
+        self._positions_by_id = {resource_id: position for position, resource_id in enumerate(ids)
+                                 if resource_id is not None}
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def get_by_id(self, resource_id: int) -> Optional[Dict[str, Any]]:
+        """Retorna o registro com o ID informado ou None."""
+        position = self._positions_by_id.get(resource_id)
+        return None if position is None else self.records[position]
+
+    def search(self, term: str) -> List[int]:
+        """
+        Retorna as posições dos registros cujo nome/título contém o termo
+        (sem diferenciar maiúsculas/minúsculas, como o '?search=' da SWAPI).
+        O índice de busca é construído na primeira chamada.
+        """
+        if self._search_index is None:
+            self._search_index = SearchIndex(self.records, SEARCH_FIELDS.get(self.resource, ('name',)))
+        return self._search_index.search(term)
+
+    def sort_column(self, field: str) -> List[Optional[Tuple[int, Any]]]:
+        """Coluna tipada (parse_sort_value) do campo, convertida uma única vez por dataset."""
+        column = self._sort_columns.get(field)
+        if column is None:
+            column = [parse_sort_value(value) for value in record_column(self.records, field, '')]
+            self._sort_columns[field] = column
+        return column
+
+    def sorted_positions(self, field: str, sort_order: str) -> List[int]:
+        """Permutação ordenada de todas as posições, calculada uma vez por (campo, ordem)."""
+        key = (field, sort_order)
+        order = self._sorted_positions.get(key)
+        if order is None:
+            keys = build_sort_keys(self.sort_column(field), sort_order)
+            order = sorted(range(len(self.records)), key=keys.__getitem__, reverse=(sort_order == 'desc'))
+            self._sorted_positions[key] = order
+        return order
+
+    def cursor_key(self, position: int, sort_params: Optional[Tuple[str, str]]) -> Optional[Tuple[Any, int]]:
+        """Equivalente de record_cursor_key para a posição, lendo a coluna tipada em cache."""
+        resource_id = self._ids[position]
+        if resource_id is None:
+            return None
+        if sort_params is None:
+            return None, resource_id
+        field, sort_order = sort_params
+        return build_sort_keys([self.sort_column(field)[position]], sort_order)[0], resource_id
+
+    def refreshed(self, records: List[Dict[str, Any]]) -> Tuple['ResourceDataset', Dict[str, List[int]]]:
+        """
+        Nova versão do dataset com a lista atual da SWAPI, aplicando só os registros alterados.
+
+        Registros com o mesmo ID e o mesmo 'edited' são considerados inalterados: mantêm a linha
+        compacta, as entradas do índice de busca, os valores das colunas tipadas e a posição relativa
+        nas permutações de ordenação. As estruturas derivadas já construídas nesta versão são
+        atualizadas na nova (as demais continuam sob demanda); esta versão não é modificada.
+
+        Returns:
+            Tupla (dataset, mudanças), com os IDs 'alterados', 'incluidos' e 'removidos'; o dataset é
+            o próprio self quando nada mudou
+        """
+        new_ids = []
+        for record in records:
+            parsed = parse_resource_url(record.get('url', ''))
+            new_ids.append(parsed[1] if parsed else None)
+        old_edited = record_column(self.records, 'edited')
+
+        reused: Dict[int, int] = {}  # posição nova -> posição atual
+        for position, (resource_id, record) in enumerate(zip(new_ids, records)):
+            previous = self._positions_by_id.get(resource_id)
+            if previous is not None and record.get('edited') is not None and record.get('edited') == old_edited[previous]:
+                reused[position] = previous
+
+        current_ids = set(self._positions_by_id)
+        listed_ids = set(new_ids) - {None}
+        changes = {
+            'alterados': sorted(resource_id for position, resource_id in enumerate(new_ids)
+                                if resource_id in current_ids and position not in reused),
+            'incluidos': sorted(listed_ids - current_ids),
+            'removidos': sorted(current_ids - listed_ids),
+        }
+        unchanged_order = list(reused.values()) == list(range(len(self.records)))
+        if len(records) == len(self.records) and unchanged_order:
+            return self, changes
+
+        # Fora de ordem ou sem IDs únicos: as posições relativas não se mantêm; reconstrução completa
+        survivors = list(reused.values())
+        if None in new_ids or len(listed_ids) < len(new_ids) or survivors != sorted(survivors):
+            dataset = ResourceDataset(self.resource, records)
+            dataset._rebuild_like(self)
+            return dataset, changes
+
+        compact = self.records.updated(records, reused) if isinstance(self.records, CompactRecords) else None
+        dataset = ResourceDataset(self.resource, compact if compact is not None else records, ids=new_ids)
+        remap = {previous: position for position, previous in reused.items()}
+        dirty = [position for position in range(len(records)) if position not in reused]
+        stale = [position for position in range(len(self.records)) if position not in remap]
+
+        if self._search_index is not None:
+            moved = any(previous != position for position, previous in reused.items())
+            dataset._search_index = self._search_index.updated(
+                stale, records, dirty,
+                [remap.get(position, -1) for position in range(len(self.records))] if moved else None,
+                SEARCH_FIELDS.get(self.resource, ('name',)))
+        # Cópias: requisições podem incluir colunas e permutações nesta versão (publicada) durante o laço
+        for field, column in list(self._sort_columns.items()):
+            new_column = [None] * len(records)
+            for position, previous in reused.items():
+                new_column[position] = column[previous]
+            for position in dirty:
+                new_column[position] = parse_sort_value(records[position].get(field, ''))
+            dataset._sort_columns[field] = new_column
+        for (field, sort_order), order in list(self._sorted_positions.items()):
+            kept = [remap[position] for position in order if position in remap]
+            dataset._sorted_positions[(field, sort_order)] = dataset._merge_sorted(kept, dirty, field, sort_order)
+        return dataset, changes
+
+    def _merge_sorted(self, kept: List[int], added: List[int], field: str, sort_order: str) -> List[int]:
+        """
+        Insere posições em uma permutação já ordenada, na mesma ordem de sorted_positions
+        (chave e, nos empates, posição crescente), localizando cada uma por busca binária.
+        """
+        keys = build_sort_keys(self.sort_column(field), sort_order)
+        descending = sort_order == 'desc'
+
+        def precedes(position: int, other: int) -> bool:
+            if keys[position] != keys[other]:
+                return keys[position] > keys[other] if descending else keys[position] < keys[other]
+            return position < other
+
+        inserted = []
+        for position in sorted(added, key=lambda position: (keys[position], -position if descending else position),
+                               reverse=descending):
+            low, high = 0, len(kept)
+            while low < high:
+                middle = (low + high) // 2
+                if precedes(position, kept[middle]):
+                    high = middle
+                else:
+                    low = middle + 1
+            inserted.append((low, position))
+        return splice(kept, inserted=inserted)
+
+    def _rebuild_like(self, previous: 'ResourceDataset') -> None:
+        """Constrói as mesmas estruturas derivadas que já existiam na versão anterior."""
+        if previous._search_index is not None:
+            self.search('')
+        for field, sort_order in list(previous._sorted_positions):
+            self.sorted_positions(field, sort_order)
+
+    def warm(self) -> None:
+        """Constrói de antemão o índice de busca e as permutações de todos os campos ordenáveis."""
+        self.search('')
+        for field in VALID_SORT_FIELDS.get(self.resource, []):
+            for sort_order in SORT_ORDERS:
+                self.sorted_positions(field, sort_order)
+
+    def sort_positions(self, positions: Optional[Sequence[int]], field: str, sort_order: str) -> List[int]:
+        """
+        Ordena um subconjunto de posições usando a permutação em cache.
+        Mesmo resultado de sort_results sobre os registros correspondentes (ordenação estável).
+
+        Args:
+            positions: Posições em ordem crescente, ou None para todas
+        """
+        order = self.sorted_positions(field, sort_order)
+        if positions is None or len(positions) == len(self.records):
+            return list(order)
+        selected = set(positions)
+        return [position for position in order if position in selected]
+
+    def materialize(self, positions: Sequence[int]) -> List[Dict[str, Any]]:
+        """Converte posições em registros."""
+        return [self.records[position] for position in positions]
+
+    def view(self, positions: Optional[Sequence[int]] = None) -> RecordView:
+        """Registros das posições dadas (todos, se None), materializados apenas quando lidos."""
+        return RecordView(self.records, range(len(self.records)) if positions is None else positions)
+
+
+class Snapshot:
+    """Snapshot validado do dataset da SWAPI, carregado uma vez por instância."""
+
+    def __init__(self, header: Dict[str, Any], datasets: Dict[str, ResourceDataset]):
+        self.header = header
+        self.datasets = datasets
+
+    def get_by_url(self, url: str) -> Optional[Dict[str, Any]]:
+        """Equivalente local de fetch_resource_by_url."""
+        parsed = parse_resource_url(url)
+        if parsed is None or parsed[0] not in self.datasets:
+            return None
+        return self.datasets[parsed[0]].get_by_id(parsed[1])
+
+
+def build_snapshot(path: str, resources: Sequence[str] = VALID_RESOURCES) -> Dict[str, Any]:
     """
-    # Mapeamento de campos válidos por tipo de recurso
-    valid_sort_fields = {
-        'people': ['name', 'height', 'mass', 'birth_year'],
-        'planets': ['name', 'diameter', 'population', 'rotation_period', 'orbital_period'],
-        'starships': ['name', 'length', 'crew', 'passengers', 'cargo_capacity', 'cost_in_credits'],
-        'films': ['title', 'episode_id', 'release_date']
+    Baixa todos os registros dos recursos informados e grava um snapshot compacto (JSON + gzip).
+
+    O arquivo tem duas linhas: um cabeçalho com formato, versão e hash SHA-256
+    do corpo, seguido do corpo com os registros por tipo de recurso.
+
+    Returns:
+        Cabeçalho gravado
+
+    Raises:
+        RuntimeError: Se algum recurso não puder ser baixado por completo
+    """
+    data = {}
+    for resource in resources:
+        fetch_result = fetch_all_pages_swapi(resource)
+        if fetch_result is None:
+            raise RuntimeError(f"Falha ao baixar '{resource}' da SWAPI")
+        results, total_count = fetch_result
+        if len(results) < total_count:
+            raise RuntimeError(f"Download incompleto de '{resource}': {len(results)} de {total_count}")
+        data[resource] = results
+
+    body = json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    header = {
+        'formato': SNAPSHOT_FORMAT,
+        'versao': SNAPSHOT_VERSION,
+        'sha256': hashlib.sha256(body).hexdigest(),
+        'gerado_em': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'recursos': {resource: len(records) for resource, records in data.items()}
     }
-    
-    # Normalizar campo de ordenação
+
+    with gzip.open(path, 'wb') as snapshot_file:
+        snapshot_file.write(json.dumps(header, separators=(',', ':')).encode('utf-8') + b'\n')
+        snapshot_file.write(body)
+
+    logger.info(f"Snapshot gravado em {path}: {header['recursos']}")
+    return header
+
+
+def load_snapshot(path: str) -> Snapshot:
+    """
+    Carrega e valida um snapshot gerado por build_snapshot.
+
+    Raises:
+        ValueError: Se o formato, a versão ou o hash do corpo não conferirem
+    """
+    with gzip.open(path, 'rb') as snapshot_file:
+        header_line = snapshot_file.readline()
+        body = snapshot_file.read()
+
+    header = json.loads(header_line)
+    if header.get('formato') != SNAPSHOT_FORMAT or header.get('versao') != SNAPSHOT_VERSION:
+        raise ValueError(f"Snapshot incompatível: formato={header.get('formato')}, versao={header.get('versao')}")
+    if hashlib.sha256(body).hexdigest() != header.get('sha256'):
+        raise ValueError("Snapshot corrompido: hash SHA-256 não confere")
+
+    data = json.loads(body)
+    datasets = {resource: ResourceDataset(resource, records) for resource, records in data.items()}
+    return Snapshot(header, datasets)
+
+
+_snapshot: Optional[Snapshot] = None
+_snapshot_loaded = False
+_snapshot_lock = threading.Lock()
+
+
+def get_snapshot() -> Optional[Snapshot]:
+    """
+    Retorna o snapshot ativo (carregado na primeira chamada) ou None se o modo snapshot
+    estiver desativado ou o arquivo for inválido.
+    """
+    global _snapshot, _snapshot_loaded
+    if _snapshot_loaded:
+        return _snapshot
+
+    with _snapshot_lock:
+        if not _snapshot_loaded:
+            if SNAPSHOT_PATH:
+                try:
+                    _snapshot = load_snapshot(SNAPSHOT_PATH)
+                    logger.info(f"Snapshot carregado de {SNAPSHOT_PATH}: {_snapshot.header.get('recursos')}")
+                except (OSError, ValueError) as e:
+                    logger.error(f"Falha ao carregar snapshot {SNAPSHOT_PATH}; usando a SWAPI: {e}")
+                    _snapshot = None
+            _snapshot_loaded = True
+    return _snapshot
+
+
+def reset_snapshot() -> None:
+    """Descarta o snapshot carregado (o próximo get_snapshot recarrega a partir de SNAPSHOT_PATH)."""
+    global _snapshot, _snapshot_loaded
+    with _snapshot_lock:
+        _snapshot = None
+        _snapshot_loaded = False
+
+
+# Datasets completos obtidos da SWAPI (sem filtro), reaproveitados para busca local enquanto frescos
+_local_datasets: Dict[str, Tuple[ResourceDataset, float]] = {}
+_local_datasets_lock = threading.Lock()
+
+
+def register_local_dataset(resource: str, records: List[Dict[str, Any]]) -> ResourceDataset:
+    """Registra a lista completa de um recurso para consultas locais (busca, relações)."""
+    dataset = ResourceDataset(resource, list(records))
+    with _local_datasets_lock:
+        _local_datasets[resource] = (dataset, time.monotonic())
+    return dataset
+
+
+def get_local_dataset(resource: str) -> Optional[ResourceDataset]:
+    """
+    Retorna o dataset local do recurso: o do snapshot, se ativo, ou o último dataset
+    completo obtido da SWAPI enquanto estiver dentro do CACHE_TTL.
+    """
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        return snapshot.datasets.get(resource)
+
+    entry = _local_datasets.get(resource)
+    if entry is None:
+        return None
+    dataset, loaded_at = entry
+    if time.monotonic() - loaded_at > CACHE_TTL:
+        return None
+    return dataset
+
+
+def clear_local_datasets() -> None:
+    """Descarta os datasets locais obtidos da SWAPI."""
+    with _local_datasets_lock:
+        _local_datasets.clear()
+
+
+# Relações resolvidas pelo grafo em memória: (recurso_origem, campo) -> recurso_destino.
+# As direções inversas são derivadas: filmes de um personagem, filmes de um planeta e pilotos de uma nave.
+RELATIONS = {
+    ('films', 'characters'): 'people',
+    ('films', 'planets'): 'planets',
+    ('people', 'starships'): 'starships',
+}
+REVERSE_RELATIONS = {
+    ('films', 'characters'): ('people', 'films'),
+    ('films', 'planets'): ('planets', 'films'),
+    ('people', 'starships'): ('starships', 'pilots'),
+}
+
+
+class RelationGraph:
+    """
+    Grafo de relações entre recursos, com adjacência direta e inversa por ID inteiro.
+
+    Exemplo: neighbors('films', 1, 'characters') -> IDs dos personagens do filme 1;
+    neighbors('planets', 1, 'films') -> IDs dos filmes em que o planeta 1 aparece.
+    """
+
+    def __init__(self, datasets: Dict[str, ResourceDataset],
+                 adjacency: Optional[Dict[Tuple[str, str], Dict[int, Tuple[int, ...]]]] = None):
+        self.datasets = datasets
+        if adjacency is not None:
+            self._adjacency = adjacency
+            return
+        self._adjacency: Dict[Tuple[str, str], Dict[int, Tuple[int, ...]]] = {}
+
+        for (source, field), target in RELATIONS.items():
+            if source not in datasets:
+                continue
+            forward: Dict[int, Tuple[int, ...]] = {}
+            reverse: Dict[int, List[int]] = {}
+            records = datasets[source].records
+            for source_url, target_urls in zip(record_column(records, 'url', ''), record_column(records, field, [])):
+                parsed = parse_resource_url(source_url)
+                if parsed is None:
+                    continue
+                source_id = parsed[1]
+                forward[source_id] = self._target_ids(target_urls, target)
+                for target_id in forward[source_id]:
+                    reverse.setdefault(target_id, []).append(source_id)
+            self._adjacency[(source, field)] = forward
+            self._adjacency[REVERSE_RELATIONS[(source, field)]] = {
+                target_id: tuple(sorted(source_ids)) for target_id, source_ids in reverse.items()
+            }
+
+    @staticmethod
+    def _target_ids(urls: Iterable[str], target: str) -> Tuple[int, ...]:
+        target_ids = []
+        for url in urls:
+            parsed = parse_resource_url(url)
+            if parsed is not None and parsed[0] == target:
+                target_ids.append(parsed[1])
+        return tuple(target_ids)
+
+    def with_changes(self, resource: str, dataset: ResourceDataset, changes: Dict[str, List[int]]) -> 'RelationGraph':
+        """
+        Novo grafo com a nova versão do dataset de um recurso, refazendo só as adjacências dos
+        registros alterados, incluídos ou removidos (este grafo não é modificado).
+        """
+        adjacency = dict(self._adjacency)
+        touched = changes['alterados'] + changes['incluidos'] + changes['removidos']
+        for (source, field), target in RELATIONS.items():
+            if source != resource or (source, field) not in adjacency:
+                continue
+            reverse_key = REVERSE_RELATIONS[(source, field)]
+            forward = dict(adjacency[(source, field)])
+            reverse = dict(adjacency[reverse_key])
+            for source_id in touched:
+                for target_id in forward.pop(source_id, ()):
+                    remaining = tuple(item for item in reverse.get(target_id, ()) if item != source_id)
+                    if remaining:
+                        reverse[target_id] = remaining
+                    else:
+                        reverse.pop(target_id, None)
+            for source_id in changes['alterados'] + changes['incluidos']:
+                record = dataset.get_by_id(source_id)
+                forward[source_id] = self._target_ids(record.get(field) or [], target)
+                for target_id in forward[source_id]:
+                    reverse[target_id] = tuple(sorted(reverse.get(target_id, ()) + (source_id,)))
+            adjacency[(source, field)] = forward
+            adjacency[reverse_key] = reverse
+        return RelationGraph({**self.datasets, resource: dataset}, adjacency)
+
+    def neighbors(self, resource: str, resource_id: int, relation: str) -> Tuple[int, ...]:
+        """Retorna os IDs relacionados (tupla vazia se não houver)."""
+        return self._adjacency.get((resource, relation), {}).get(resource_id, ())
+
+    def can_resolve(self, resource: str, relation: str) -> bool:
+        """Indica se origem e destino da relação estão disponíveis em memória."""
+        target = RELATIONS.get((resource, relation))
+        return target is not None and resource in self.datasets and target in self.datasets
+
+
+_relation_graph: Optional[RelationGraph] = None
+_relation_graph_lock = threading.Lock()
+
+
+def get_relation_graph() -> RelationGraph:
+    """
+    Retorna o grafo de relações construído a partir dos datasets locais atuais
+    (snapshot ou listagens completas em cache), reconstruindo-o quando algum dataset muda.
+    """
+    global _relation_graph
+    datasets = {}
+    for resource in VALID_RESOURCES:
+        dataset = get_local_dataset(resource)
+        if dataset is not None:
+            datasets[resource] = dataset
+
+    graph = _relation_graph
+    if graph is not None and graph.datasets.keys() == datasets.keys() and \
+            all(graph.datasets[resource] is dataset for resource, dataset in datasets.items()):
+        return graph
+
+    with _relation_graph_lock:
+        graph = RelationGraph(datasets)
+        _relation_graph = graph
+    return graph
+
+
+# Atualização dos datasets locais em segundo plano (snapshot ou listagens completas)
+# SWAPI_REFRESH_INTERVAL: intervalo (s) entre atualizações; 0 desativa
+REFRESH_INTERVAL = float(os.environ.get('SWAPI_REFRESH_INTERVAL', '0'))
+
+
+def current_local_datasets() -> Dict[str, ResourceDataset]:
+    """Datasets locais carregados (do snapshot ou das listagens completas, inclusive fora do CACHE_TTL)."""
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        return dict(snapshot.datasets)
+    with _local_datasets_lock:
+        return {resource: dataset for resource, (dataset, _) in _local_datasets.items()}
+
+
+def publish_dataset(resource: str, previous: ResourceDataset, dataset: ResourceDataset,
+                    changes: Dict[str, List[int]]) -> None:
+    """
+    Troca o dataset de um recurso pela nova versão, já completa, e o grafo de relações junto.
+
+    Cada troca é uma única atribuição de referência: as requisições em andamento continuam com a
+    versão que já tinham e as seguintes leem a nova. Se outra thread já substituiu o dataset de
+    uma listagem completa, a troca é descartada.
+    """
+    global _relation_graph
+    graph = _relation_graph
+    new_graph = None
+    if dataset is not previous and graph is not None and graph.datasets.get(resource) is previous:
+        new_graph = graph.with_changes(resource, dataset, changes)
+
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        snapshot.datasets = {**snapshot.datasets, resource: dataset}
+    else:
+        with _local_datasets_lock:
+            entry = _local_datasets.get(resource)
+            if entry is None or entry[0] is not previous:
+                return
+            _local_datasets[resource] = (dataset, time.monotonic())
+    if new_graph is not None:
+        with _relation_graph_lock:
+            _relation_graph = new_graph
+
+    if dataset is not previous:
+        # Respostas já renderizadas e registros individuais em cache podem conter a versão anterior
+        rendered_responses.clear()
+        for resource_id in changes['alterados'] + changes['removidos']:
+            record = previous.get_by_id(resource_id)
+            if record is not None and record.get('url'):
+                response_cache.discard(normalize_cache_key(record['url'], None))
+
+
+def refresh_dataset(resource: str) -> Optional[Dict[str, List[int]]]:
+    """
+    Baixa de novo a lista completa do recurso (pelos caminhos normais, ignorando o cache) e
+    aplica ao dataset local apenas os registros alterados, incluídos ou removidos.
+
+    Returns:
+        IDs 'alterados', 'incluidos' e 'removidos', ou None se o recurso não tiver dataset local
+        ou não puder ser baixado por completo
+    """
+    previous = current_local_datasets().get(resource)
+    if previous is None:
+        return None
+
+    token = _bypass_cache.set(True)
+    try:
+        fetch_result = fetch_all_pages_swapi(resource)
+    finally:
+        _bypass_cache.reset(token)
+    if fetch_result is None or len(fetch_result[0]) < fetch_result[1]:
+        logger.warning(f"Atualização de '{resource}' falhou ou veio incompleta; mantendo a versão atual")
+        metrics.inc('starwars_refresh_total', recurso=resource, resultado='falha')
+        return None
+
+    dataset, changes = previous.refreshed(fetch_result[0])
+    publish_dataset(resource, previous, dataset, changes)
+
+    for kind, resource_ids in changes.items():
+        if resource_ids:
+            metrics.inc('starwars_refresh_records_total', len(resource_ids), recurso=resource, tipo=kind)
+    metrics.inc('starwars_refresh_total', recurso=resource,
+                resultado='atualizado' if dataset is not previous else 'sem_mudancas')
+    logger.info(f"Atualização de '{resource}': {', '.join(f'{len(ids)} {kind}' for kind, ids in changes.items())}")
+    return changes
+
+
+class DatasetRefresher:
+    """
+    Atualiza periodicamente, em uma thread daemon, os datasets locais já carregados (refresh_dataset).
+
+    As requisições nunca esperam pela atualização: leem a versão publicada até a troca.
+    Ciclos que se sobreporiam a um ciclo em andamento são ignorados.
+    """
+
+    def __init__(self, interval: float = REFRESH_INTERVAL):
+        self.interval = interval
+        self.last_changes: Dict[str, Dict[str, List[int]]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Inicia a thread de atualização (sem efeito se já estiver rodando)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='swapi-refresh', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Interrompe a thread após o ciclo em andamento."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.refresh_all()
+
+    def refresh_all(self) -> Dict[str, Dict[str, List[int]]]:
+        """
+        Executa um ciclo de atualização, um recurso por vez.
+
+        Returns:
+            Mudanças aplicadas por recurso (vazio se outro ciclo já estiver em andamento)
+        """
+        if not self._lock.acquire(blocking=False):
+            return {}
+        try:
+            applied = {}
+            for resource in current_local_datasets():
+                try:
+                    changes = refresh_dataset(resource)
+                except Exception as e:
+                    logger.error(f"Erro ao atualizar '{resource}': {e}")
+                    metrics.inc('starwars_refresh_total', recurso=resource, resultado='falha')
+                    continue
+                if changes is not None:
+                    applied[resource] = changes
+            self.last_changes = applied
+            return applied
+        finally:
+            self._lock.release()
+
+
+dataset_refresher = DatasetRefresher()
+
+
+def resolve_relation(resource: str, resource_id: str,
+                     relation: str) -> Optional[Tuple[Optional[Dict[str, Any]], list, List[str]]]:
+    """
+    Resolve uma consulta correlacionada inteiramente em memória.
+
+    Returns:
+        Tupla (registro_origem_ou_None, registros_relacionados, urls_não_encontradas),
+        ou None se os dados necessários não estiverem disponíveis localmente
+    """
+    if not str(resource_id).isdigit():
+        return None
+    graph = get_relation_graph()
+    if not graph.can_resolve(resource, relation):
+        return None
+
+    source = graph.datasets[resource].get_by_id(int(resource_id))
+    if source is None:
+        return None, [], []
+
+    target = RELATIONS[(resource, relation)]
+    related = []
+    missing = []
+    for target_id in graph.neighbors(resource, int(resource_id), relation):
+        record = graph.datasets[target].get_by_id(target_id)
+        if record is None:
+            missing.append(f"{SWAPI_BASE_URL}/{target}/{target_id}/")
+        else:
+            related.append(record)
+    return source, related, missing
+
+
+# Campos que podem ser pedidos em 'campos=' (projeção) por tipo de recurso
+VALID_PROJECTION_FIELDS = {
+    'people': ['name', 'height', 'mass', 'hair_color', 'skin_color', 'eye_color', 'birth_year', 'gender',
+               'homeworld', 'films', 'species', 'vehicles', 'starships', 'created', 'edited', 'url'],
+    'planets': ['name', 'rotation_period', 'orbital_period', 'diameter', 'climate', 'gravity', 'terrain',
+                'surface_water', 'population', 'residents', 'films', 'created', 'edited', 'url'],
+    'starships': ['name', 'model', 'manufacturer', 'cost_in_credits', 'length', 'max_atmosphering_speed',
+                  'crew', 'passengers', 'cargo_capacity', 'consumables', 'hyperdrive_rating', 'MGLT',
+                  'starship_class', 'pilots', 'films', 'created', 'edited', 'url'],
+    'films': ['title', 'episode_id', 'opening_crawl', 'director', 'producer', 'release_date', 'characters',
+              'planets', 'starships', 'vehicles', 'species', 'created', 'edited', 'url']
+}
+
+
+def parse_projection(request: Request, resource_type: str) -> Tuple[Optional[List[str]], Optional[Dict[str, Any]]]:
+    """
+    Lê o parâmetro opcional 'campos' (lista separada por vírgulas) e valida contra
+    VALID_PROJECTION_FIELDS do tipo de recurso.
+
+    Returns:
+        Tupla (campos_ou_None, payload_de_erro_ou_None)
+    """
+    value = request.args.get('campos')
+    if value is None:
+        return None, None
+
+    available = VALID_PROJECTION_FIELDS[resource_type]
+    canonical = {field.lower(): field for field in available}
+    fields = []
+    for raw_field in value.split(','):
+        field = raw_field.strip().lower()
+        if not field:
+            continue
+        if field not in canonical:
+            logger.warning(f"Campo de projeção inválido '{field}' para {resource_type}")
+            return None, {
+                "erro": f"Parâmetro 'campos' contém campo inválido para {resource_type}: '{raw_field.strip()}'.",
+                "campos_disponiveis": available
+            }
+        if canonical[field] not in fields:
+            fields.append(canonical[field])
+
+    if not fields:
+        return None, {"erro": "Parâmetro 'campos' não pode estar vazio.", "campos_disponiveis": available}
+    return fields, None
+
+
+def project_records(records: Iterable[Dict[str, Any]], fields: Optional[List[str]]) -> list:
+    """Reduz cada registro aos campos pedidos (sem projeção, retorna os registros como estão)."""
+    if fields is None:
+        return list(records)
+    return [{field: record[field] for field in fields if field in record} for record in records]
+
+
+# Campos com URLs de recursos relacionados que podem ser expandidos em /explorar (?expandir=)
+VALID_EXPANSION_FIELDS = {
+    'people': ['homeworld', 'films', 'species', 'vehicles', 'starships'],
+    'planets': ['residents', 'films'],
+    'starships': ['pilots', 'films'],
+    'films': ['characters', 'planets', 'starships', 'vehicles', 'species']
+}
+
+# Tipo de recurso apontado pelas URLs de cada campo expansível
+EXPANSION_TARGETS = {
+    'homeworld': 'planets', 'residents': 'people', 'pilots': 'people', 'characters': 'people',
+    'films': 'films', 'planets': 'planets', 'starships': 'starships', 'species': 'species', 'vehicles': 'vehicles'
+}
+
+
+def parse_expansion(request: Request, resource_type: str,
+                    fields: Optional[List[str]]) -> Tuple[Optional[List[str]], Optional[Dict[str, Any]]]:
+    """
+    Lê o parâmetro opcional 'expandir' (lista separada por vírgulas) e valida contra
+    VALID_EXPANSION_FIELDS do tipo de recurso, contra a projeção pedida em 'campos' e,
+    no modo snapshot, contra os recursos presentes no snapshot.
+
+    Returns:
+        Tupla (campos_a_expandir_ou_None, payload_de_erro_ou_None)
+    """
+    value = request.args.get('expandir')
+    if value is None:
+        return None, None
+
+    available = VALID_EXPANSION_FIELDS[resource_type]
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        # No modo snapshot não há rede: só são expansíveis os campos cujo recurso está no snapshot
+        available = [field for field in available if EXPANSION_TARGETS[field] in snapshot.datasets]
+    expand = []
+    for raw_field in value.split(','):
+        field = raw_field.strip().lower()
+        if not field:
+            continue
+        if field not in available:
+            if snapshot is not None and field in VALID_EXPANSION_FIELDS[resource_type]:
+                logger.warning(f"Campo de expansão '{field}' indisponível no modo snapshot")
+                return None, {
+                    "erro": f"Campo '{field}' em 'expandir' não pode ser resolvido no modo snapshot: "
+                            f"'{EXPANSION_TARGETS[field]}' não está no snapshot.",
+                    "campos_expansiveis": available
+                }
+            logger.warning(f"Campo de expansão inválido '{field}' para {resource_type}")
+            return None, {
+                "erro": f"Parâmetro 'expandir' contém campo inválido para {resource_type}: '{raw_field.strip()}'.",
+                "campos_expansiveis": available
+            }
+        if fields is not None and field not in fields:
+            return None, {"erro": f"Campo '{field}' em 'expandir' precisa estar também em 'campos'."}
+        if field not in expand:
+            expand.append(field)
+
+    if not expand:
+        return None, {"erro": "Parâmetro 'expandir' não pode estar vazio.", "campos_expansiveis": available}
+    return expand, None
+
+
+def resolve_related_urls(urls: List[str]) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+    """
+    Obtém os registros de um conjunto de URLs já sem duplicatas: primeiro pelos datasets
+    locais e o restante em um único fan-out concorrente.
+
+    Returns:
+        Tupla (registros_por_url, urls_que_falharam)
+    """
+    resolved: Dict[str, Dict[str, Any]] = {}
+    pending = []
+    for url in urls:
+        parsed = parse_resource_url(url)
+        dataset = get_local_dataset(parsed[0]) if parsed and parsed[0] in VALID_RESOURCES else None
+        record = dataset.get_by_id(parsed[1]) if dataset is not None else None
+        if record is not None:
+            resolved[url] = record
+        else:
+            pending.append(url)
+
+    failed = []
+    for url, data in iter_resources_by_urls(pending):
+        if data:
+            resolved[url] = data
+        else:
+            failed.append(url)
+    return resolved, failed
+
+
+def expand_records(records: List[Dict[str, Any]], expand: List[str]) -> Tuple[list, List[str]]:
+    """
+    Substitui, nos campos pedidos, as URLs de recursos relacionados pelos próprios registros.
+
+    As URLs de todos os registros são reunidas e deduplicadas antes da busca, então cada
+    recurso relacionado é obtido uma única vez por página. Os registros são copiados antes
+    da substituição (os originais podem estar em cache); URLs que falharem permanecem como URL.
+
+    Returns:
+        Tupla (registros_expandidos, urls_que_falharam)
+    """
+    urls = list(dict.fromkeys(
+        url
+        for record in records
+        for field in expand
+        for url in (record.get(field) if isinstance(record.get(field), list) else [record.get(field)])
+        if isinstance(url, str) and url
+    ))
+    resolved, failed = resolve_related_urls(urls)
+
+    expanded = []
+    for record in records:
+        copy = dict(record)
+        for field in expand:
+            value = record.get(field)
+            if isinstance(value, list):
+                copy[field] = [resolved.get(url, url) for url in value]
+            elif isinstance(value, str):
+                copy[field] = resolved.get(value, value)
+        expanded.append(copy)
+    return expanded, failed
+
+
+# Ordens de classificação aceitas
+SORT_ORDERS = frozenset(('asc', 'desc'))
+
+# Mapeamento de campos válidos para ordenação por tipo de recurso
+VALID_SORT_FIELDS = {
+    'people': ['name', 'height', 'mass', 'birth_year'],
+    'planets': ['name', 'diameter', 'population', 'rotation_period', 'orbital_period'],
+    'starships': ['name', 'length', 'crew', 'passengers', 'cargo_capacity', 'cost_in_credits'],
+    'films': ['title', 'episode_id', 'release_date']
+}
+
+
+def normalize_sort_params(sort_by: str, sort_order: str, resource_type: str) -> Optional[Tuple[str, str]]:
+    """
+    Normaliza e valida campo e ordem de classificação.
+
+    Returns:
+        Tupla (campo, ordem) ou None se o campo/tipo não for ordenável
+    """
     sort_by = sort_by.strip().lower()
     sort_order = sort_order.strip().lower()
-    
-    # Validar campo de ordenação
-    if resource_type not in valid_sort_fields:
+
+    if resource_type not in VALID_SORT_FIELDS:
         logger.warning(f"Tipo de recurso inválido para ordenação: {resource_type}")
-        return results
-    
-    if sort_by not in valid_sort_fields[resource_type]:
+        return None
+
+    if sort_by not in VALID_SORT_FIELDS[resource_type]:
         logger.warning(f"Campo de ordenação inválido '{sort_by}' para {resource_type}")
-        return results
+        return None
+
+    if sort_order not in SORT_ORDERS:
+        logger.warning(f"Ordem de classificação inválida: {sort_order}. Usando 'asc'")
+        sort_order = 'asc'
+
+    return sort_by, sort_order
+
+
+def parse_sort_value(value: Any) -> Optional[Tuple[int, Any]]:
+    """
+    Converte o valor bruto de um campo para comparação.
+
+    Retorna (0, num) ou (1, str), para evitar TypeError ao comparar int/float com str,
+    ou None para valores desconhecidos ('unknown', 'n/a', vazio), que sempre vão para o fim.
+    """
+    if value is None or value == 'unknown' or value == 'n/a' or value == '':
+        return None
+    try:
+        cleaned = str(value).replace(',', '').replace('km', '').strip()
+        if not cleaned:
+            return None
+        if '.' in cleaned:
+            return (0, float(cleaned))
+        return (0, int(cleaned))
+    except (ValueError, AttributeError, TypeError):
+        return (1, str(value).lower())
+
+
+def build_sort_keys(column: Sequence[Optional[Tuple[int, Any]]], sort_order: str) -> List[Tuple[int, Any]]:
+    """Gera as chaves de ordenação a partir de uma coluna já convertida por parse_sort_value."""
+    sentinel = (0, float('inf') if sort_order == 'asc' else float('-inf'))
+    return [sentinel if parsed is None else parsed for parsed in column]
+
+
+def sort_results(results: list, sort_by: str, sort_order: str, resource_type: str) -> list:
+    """
+    Ordena os resultados baseado no campo especificado.
     
-    if sort_order not in ['asc', 'desc']:
-        logger.warning(f"Ordem de classificação inválida: {sort_order}. Usando 'asc'")
-        sort_order = 'asc'
+    Args:
+        results: Lista de resultados para ordenar
+        sort_by: Campo para ordenação (nome, altura, etc.)
+        sort_order: Ordem de classificação ('asc' ou 'desc')
+        resource_type: Tipo de recurso para determinar campos válidos
     
-    # Função auxiliar para converter valores para comparação.
-    # Retorna sempre (tipo, valor): (0, num) ou (1, str), para evitar TypeError ao comparar int/float com str.
-    def get_sort_key(item: dict, field: str) -> Tuple[int, Any]:
-        value = item.get(field, '')
-        if value is None or value == 'unknown' or value == 'n/a' or value == '':
-            sentinel = float('inf') if sort_order == 'asc' else float('-inf')
-            return (0, sentinel)
-        try:
-            cleaned = str(value).replace(',', '').replace('km', '').strip()
-            if not cleaned:
-                sentinel = float('inf') if sort_order == 'asc' else float('-inf')
-                return (0, sentinel)
-            if '.' in cleaned:
-                return (0, float(cleaned))
-            return (0, int(cleaned))
-        except (ValueError, AttributeError, TypeError):
-            return (1, str(value).lower())
+    Returns:
+        Lista ordenada de resultados
+    """
+    normalized = normalize_sort_params(sort_by, sort_order, resource_type)
+    if normalized is None:
+        return results
+    sort_by, sort_order = normalized
     
     # Ordenar resultados
     try:
-        sorted_results = sorted(
-            results,
-            key=lambda x: get_sort_key(x, sort_by),
-            reverse=(sort_order == 'desc')
-        )
+        keys = build_sort_keys([parse_sort_value(item.get(sort_by, '')) for item in results], sort_order)
+        order = sorted(range(len(results)), key=keys.__getitem__, reverse=(sort_order == 'desc'))
+        sorted_results = [results[position] for position in order]
         logger.info(f"Resultados ordenados por '{sort_by}' em ordem '{sort_order}'")
         return sorted_results
     except Exception as e:
         logger.error(f"Erro ao ordenar resultados: {e}")
         return results
 
+# Ordenação parcial (top-K): usada quando a janela pedida é pequena em relação à lista.
+# Abaixo de TOPK_MAX_FRACTION * len(resultados) a seleção por heap supera o sort completo: o
+# cruzamento medido com bench_main.py --cenario topk fica entre 10% e 15% (82 e 1000 registros),
+# então a primeira página padrão (limite 10) das listas completas da SWAPI (até 82) usa o heap.
+TOPK_MAX_FRACTION = float(os.environ.get('TOPK_MAX_FRACTION', '0.125'))
+
+
+def sort_results_window(results: list, sort_by: str, sort_order: str, resource_type: str, window: int) -> list:
+    """
+    Retorna apenas os primeiros 'window' itens da ordenação de sort_results.
+
+    Para janelas pequenas usa seleção parcial por heap (heapq.nsmallest/nlargest, estáveis
+    e equivalentes a sorted(...)[:window]); caso contrário, faz a ordenação completa.
+
+    Args:
+        results: Lista de resultados
+        sort_by: Campo para ordenação
+        sort_order: 'asc' ou 'desc'
+        resource_type: Tipo de recurso
+        window: Quantidade de itens necessários a partir do início
+
+    Returns:
+        Lista com os primeiros 'window' itens ordenados
+    """
+    if window >= len(results) or window > len(results) * TOPK_MAX_FRACTION:
+        return sort_results(results, sort_by, sort_order, resource_type)[:window]
+
+    normalized = normalize_sort_params(sort_by, sort_order, resource_type)
+    if normalized is None:
+        return results[:window]
+    sort_by, sort_order = normalized
+
+    try:
+        keys = build_sort_keys([parse_sort_value(item.get(sort_by, '')) for item in results], sort_order)
+        select = heapq.nlargest if sort_order == 'desc' else heapq.nsmallest
+        order = select(window, range(len(results)), key=keys.__getitem__)
+        logger.info(f"Top-{window} de {len(results)} resultados ordenados por '{sort_by}' em ordem '{sort_order}'")
+        return [results[position] for position in order]
+    except Exception as e:
+        logger.error(f"Erro ao ordenar resultados: {e}")
+        return results[:window]
+
+
+def parse_pagination(page: str, limit: str) -> Tuple[int, int]:
+    """
+    Converte e valida os parâmetros de paginação.
+
+    Returns:
+        Tupla (número_da_página, limite); valores inválidos usam o padrão (1, 10)
+    """
+    try:
+        page_num = max(1, int(page))
+        limit_num = max(1, min(100, int(limit)))  # Limite máximo de 100 itens
+    except (ValueError, TypeError):
+        logger.warning(f"Valores de paginação inválidos: pagina={page}, limite={limit}. Usando valores padrão.")
+        page_num = 1
+        limit_num = 10
+    return page_num, limit_num
+
+
 def apply_pagination(results: list, page: str, limit: str) -> Tuple[int, int, list]:
     """
     Aplica paginação aos resultados.
@@ -230,13 +2517,7 @@ def apply_pagination(results: list, page: str, limit: str) -> Tuple[int, int, li
     Returns:
         Tupla contendo (número_da_página, limite, resultados_paginados)
     """
-    try:
-        page_num = max(1, int(page))
-        limit_num = max(1, min(100, int(limit)))  # Limite máximo de 100 itens
-    except (ValueError, TypeError):
-        logger.warning(f"Valores de paginação inválidos: pagina={page}, limite={limit}. Usando valores padrão.")
-        page_num = 1
-        limit_num = 10
+    page_num, limit_num = parse_pagination(page, limit)
     
     # Calcular índices
     start_index = (page_num - 1) * limit_num
@@ -248,6 +2529,258 @@ def apply_pagination(results: list, page: str, limit: str) -> Tuple[int, int, li
     logger.info(f"Paginação aplicada: página {page_num}, limite {limit_num}, {len(paginated_results)} resultados")
     return page_num, limit_num, paginated_results
 
+# Paginação por cursor (keyset) do /explorar: o token opaco guarda a chave de ordenação e o ID do
+# último registro entregue, e a página seguinte começa logo depois dele na ordem (chave, ID) —
+# a mesma de sort_results, já que a SWAPI lista os registros em ordem crescente de ID
+CURSOR_VERSION = 1
+
+
+def cursor_query_hash(resource_type: str, search_query: Optional[str], sort_params: Optional[Tuple[str, str]]) -> str:
+    """Identifica a consulta (tipo, termo, ordenar_por, ordem) à qual um cursor pertence."""
+    identity = json.dumps([resource_type, (search_query or '').lower(), *(sort_params or (None, None))])
+    return hashlib.blake2b(identity.encode('utf-8'), digest_size=8).hexdigest()
+
+
+def record_cursor_key(record: Dict[str, Any], sort_params: Optional[Tuple[str, str]]) -> Optional[Tuple[Any, int]]:
+    """
+    Posição do registro na ordem do cursor: (chave de ordenação, ID).
+
+    Returns:
+        Tupla (chave ou None sem ordenação, ID) ou None se o registro não tiver URL de recurso
+    """
+    parsed = parse_resource_url(record.get('url', ''))
+    if parsed is None:
+        return None
+    if sort_params is None:
+        return None, parsed[1]
+    field, sort_order = sort_params
+    return build_sort_keys([parse_sort_value(record.get(field, ''))], sort_order)[0], parsed[1]
+
+
+def encode_cursor(query_hash: str, cursor_key: Tuple[Any, int]) -> str:
+    """Gera o token opaco (base64 url-safe, sem padding) a partir da posição do último registro."""
+    key, resource_id = cursor_key
+    payload = {'v': CURSOR_VERSION, 'q': query_hash, 'k': None if key is None else list(key), 'i': resource_id}
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token: str, query_hash: str, sort_params: Optional[Tuple[str, str]]) -> Optional[Tuple[Any, int]]:
+    """
+    Valida e decodifica um token gerado por encode_cursor para a mesma consulta.
+
+    Returns:
+        Tupla (chave, ID) ou None se o token for inválido ou de outra consulta
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except ValueError:
+        return None
+    if not isinstance(payload, dict) or payload.get('v') != CURSOR_VERSION or payload.get('q') != query_hash:
+        return None
+
+    key, resource_id = payload.get('k'), payload.get('i')
+    if type(resource_id) is not int:
+        return None
+    if sort_params is None:
+        return (None, resource_id) if key is None else None
+    if not isinstance(key, list) or len(key) != 2 or key[0] not in (0, 1) or type(key[0]) is not int:
+        return None
+    valid_value = isinstance(key[1], str) if key[0] == 1 else type(key[1]) in (int, float)
+    return (tuple(key), resource_id) if valid_value else None
+
+
+def is_after_cursor(cursor_key: Optional[Tuple[Any, int]], cursor: Tuple[Any, int], sort_order: str) -> bool:
+    """Indica se o registro na posição cursor_key vem depois do cursor na ordem (chave, ID)."""
+    if cursor_key is None:
+        return False
+    key, resource_id = cursor_key
+    cursor_value, cursor_id = cursor
+    if key != cursor_value:
+        return key < cursor_value if sort_order == 'desc' else key > cursor_value
+    return resource_id > cursor_id
+
+
+def seek_cursor(count: int, key_at: Callable[[int], Optional[Tuple[Any, int]]],
+                cursor: Tuple[Any, int], sort_order: str) -> int:
+    """
+    Busca binária pelo primeiro índice, em uma sequência já ordenada, que vem depois do cursor.
+
+    Args:
+        count: Tamanho da sequência
+        key_at: Posição (chave, ID) do item de cada índice
+    """
+    low, high = 0, count
+    while low < high:
+        middle = (low + high) // 2
+        if is_after_cursor(key_at(middle), cursor, sort_order):
+            high = middle
+        else:
+            low = middle + 1
+    return low
+
+
+# Cache HTTP das respostas dos endpoints: max-age (s) do Cache-Control por endpoint
+ENDPOINT_MAX_AGE = {
+    '/explorar': int(os.environ.get('HTTP_MAX_AGE_EXPLORAR', '300')),
+    '/personagens-filme': int(os.environ.get('HTTP_MAX_AGE_RELACOES', '3600')),
+    '/naves-personagem': int(os.environ.get('HTTP_MAX_AGE_RELACOES', '3600')),
+    '/planetas-filme': int(os.environ.get('HTTP_MAX_AGE_RELACOES', '3600')),
+}
+
+# Corpos JSON já serializados (e seus ETags) por endpoint + parâmetros, para responder sem re-serializar
+RENDERED_CACHE_TTL = float(os.environ.get('RENDERED_CACHE_TTL', '60'))
+rendered_responses = ResponseCache(RENDERED_CACHE_TTL, 0, 500, 16 * 1024 * 1024)
+
+
+# Compressão negociada por Accept-Encoding: tamanho mínimo do corpo (bytes) e nível (1-9)
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', '1024'))
+COMPRESSION_LEVEL = int(os.environ.get('COMPRESSION_LEVEL', '6'))
+SUPPORTED_ENCODINGS = ('gzip', 'deflate')  # em ordem de preferência
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Escolhe a codificação de conteúdo a partir do cabeçalho Accept-Encoding (com q-values).
+
+    Returns:
+        'gzip', 'deflate' ou None (sem compressão)
+    """
+    if not accept_encoding:
+        return None
+
+    weights = {}
+    for token in accept_encoding.split(','):
+        name, _, params = token.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        weights[name.strip().lower()] = quality
+
+    wildcard = weights.get('*', 0.0)
+    best = None
+    best_quality = 0.0
+    for encoding in SUPPORTED_ENCODINGS:
+        quality = weights.get(encoding, wildcard)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress_body(body: bytes, encoding: str) -> bytes:
+    """Comprime o corpo com a codificação negociada (gzip determinístico, sem mtime)."""
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=COMPRESSION_LEVEL, mtime=0)
+    return zlib.compress(body, COMPRESSION_LEVEL)
+
+
+def uncached_json_response(request: Request, body: bytes,
+                           headers: Dict[str, str]) -> Tuple[Any, int, Dict[str, str]]:
+    """
+    Resposta 200 com corpo JSON que não pode ser reaproveitada (ex.: POST /lote): comprimida
+    conforme o Accept-Encoding como as demais, sem ETag e com 'Cache-Control: no-store'.
+    """
+    headers = {**headers, 'Cache-Control': 'no-store', 'Vary': 'Accept-Encoding'}
+    encoding = None
+    if len(body) >= COMPRESSION_MIN_SIZE:
+        encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+    if encoding is not None:
+        with timed_phase('compressao'):
+            body = compress_body(body, encoding)
+        headers['Content-Encoding'] = encoding
+    return current_app.response_class(body, mimetype='application/json'), 200, headers
+
+
+def encoded_etag(etag: str, encoding: Optional[str]) -> str:
+    """ETag da representação codificada (cada codificação tem seu próprio ETag forte)."""
+    return etag if encoding is None else f'{etag[:-1]}-{encoding}"'
+
+
+def compute_etag(body: bytes) -> str:
+    """Gera um ETag forte a partir do hash do corpo da resposta."""
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Verifica se o cabeçalho If-None-Match do cliente contém o ETag atual."""
+    if not if_none_match:
+        return False
+    variants = {etag} | {encoded_etag(etag, encoding) for encoding in SUPPORTED_ENCODINGS}
+    candidates = [candidate.strip() for candidate in if_none_match.split(',')]
+    return '*' in candidates or any(
+        (candidate[2:] if candidate.startswith('W/') else candidate) in variants for candidate in candidates
+    )
+
+
+def rendered_cache_key(endpoint: str, request: Request) -> str:
+    """Chave do cache de respostas renderizadas: endpoint + parâmetros ordenados."""
+    return endpoint + '?' + urlencode(sorted(request.args.items(multi=True)))
+
+
+def respond_with_validators(request: Request, endpoint: str,
+                            handler: Callable[[Request], Tuple[Any, int, Dict[str, str]]]) -> Tuple[Any, int, Dict[str, str]]:
+    """
+    Executa o handler do endpoint adicionando ETag e Cache-Control às respostas 200.
+    Respostas parciais (marcadas com mark_partial ou com prazo esgotado) saem com
+    'Cache-Control: no-store', sem ETag e fora do cache.
+
+    O corpo serializado e seu ETag ficam em cache (rendered_responses); requisições repetidas
+    reutilizam o hash sem re-serializar, e If-None-Match correspondente gera 304 sem corpo.
+    Corpos acima de COMPRESSION_MIN_SIZE são comprimidos conforme o Accept-Encoding, e a versão
+    comprimida fica guardada junto da entrada para ser gerada uma única vez (contando no limite
+    de bytes do cache).
+    """
+    key = rendered_cache_key(endpoint, request)
+    rendered, state = rendered_responses.get(key)
+    metrics.inc('starwars_cache_lookups_total', cache='renderizadas', resultado=state)
+
+    if rendered is None:
+        partial_token = _partial_response.set(False)
+        try:
+            response, status_code, headers = handler(request)
+            partial = _partial_response.get() or deadline_exceeded()
+        finally:
+            _partial_response.reset(partial_token)
+        if status_code == 200 and partial:
+            # Respostas parciais (falhas ou prazo esgotado) não entram no cache nem são reaproveitadas
+            return response, status_code, {**headers, 'Cache-Control': 'no-store'}
+        if status_code != 200 or not isinstance(response, Response) or not response.is_json \
+                or response.is_streamed:
+            return response, status_code, headers
+        body = response.get_data()
+        rendered = {'body': body, 'etag': compute_etag(body), 'headers': dict(headers), 'encoded': {}}
+        rendered_responses.set(key, rendered, size=len(body))
+
+    encoding = None
+    if len(rendered['body']) >= COMPRESSION_MIN_SIZE:
+        encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+
+    headers = dict(rendered['headers'])
+    headers['ETag'] = encoded_etag(rendered['etag'], encoding)
+    headers['Cache-Control'] = f"public, max-age={ENDPOINT_MAX_AGE.get(endpoint, 0)}"
+    headers['Vary'] = 'Accept-Encoding'
+
+    if etag_matches(request.headers.get('If-None-Match'), rendered['etag']):
+        logger.info(f"ETag confere para {endpoint}; respondendo 304")
+        return current_app.response_class(status=304), 304, headers
+
+    if encoding is None:
+        return current_app.response_class(rendered['body'], mimetype='application/json'), 200, headers
+
+    body = rendered['encoded'].get(encoding)
+    if body is None:
+        with timed_phase('compressao'):
+            body = compress_body(rendered['body'], encoding)
+        # A variante comprimida conta no limite de bytes do cache junto com o corpo original
+        if rendered_responses.grow(key, rendered, len(body)):
+            rendered['encoded'][encoding] = body
+    headers['Content-Encoding'] = encoding
+    return current_app.response_class(body, mimetype='application/json'), 200, headers
+
+
 @functions_framework.http
 def starwars_handler(request: Request) -> Tuple[Any, int, Dict[str, str]]:
     """
@@ -263,8 +2796,8 @@ def starwars_handler(request: Request) -> Tuple[Any, int, Dict[str, str]]:
         logger.info("Requisição OPTIONS (CORS preflight)")
         headers = {
             'Access-Control-Allow-Origin': '*',
-            'Access-Control-Allow-Methods': 'GET',
-            'Access-Control-Allow-Headers': 'Content-Type',
+            'Access-Control-Allow-Methods': 'GET, POST',
+            'Access-Control-Allow-Headers': f'Content-Type, If-None-Match, {DEADLINE_HEADER}',
             'Access-Control-Max-Age': '3600'
         }
         return ('', 204, headers)
@@ -273,23 +2806,73 @@ def starwars_handler(request: Request) -> Tuple[Any, int, Dict[str, str]]:
     path = request.path
 
     logger.info(f"Requisição recebida: {request.method} {path}")
-    
-    # Roteamento baseado no path
-    if path == '/personagens-filme' or path.endswith('/personagens-filme'):
-        return personagens_filme_handler(request)
+
+    if path == '/metricas' or path.endswith('/metricas'):
+        return metricas_handler(request)
+
+    timings = RequestTimings()
+    token = _request_timings.set(timings)
+    deadline_token = _request_deadline.set(Deadline(parse_deadline(request)))
+    try:
+        endpoint, response, status_code, headers = route_request(request, path, headers)
+    finally:
+        _request_deadline.reset(deadline_token)
+        _request_timings.reset(token)
+
+    elapsed = time.perf_counter() - timings.started
+    if STARTUP_TIMINGS['primeira_requisicao'] is None:
+        STARTUP_TIMINGS['primeira_requisicao'] = elapsed
+        STARTUP_TIMINGS['ate_primeira_resposta'] = time.perf_counter() - _IMPORT_STARTED
+        logger.info(f"Primeira requisição da instância: {elapsed * 1000:.1f} ms ({endpoint})")
+    metrics.inc('starwars_requests_total', endpoint=endpoint, status=str(status_code))
+    metrics.observe('starwars_request_duration_seconds', elapsed, endpoint=endpoint)
+
+    headers = dict(headers)
+    headers['Server-Timing'] = timings.header()
+    headers['Timing-Allow-Origin'] = '*'
+    return response, status_code, headers
+
+
+def route_request(request: Request, path: str,
+                  headers: Dict[str, str]) -> Tuple[str, Any, int, Dict[str, str]]:
+    """Roteia a requisição pelo path, retornando (endpoint, resposta, status, headers)."""
+    if path == '/lote' or path.endswith('/lote'):
+        return ('/lote', *lote_handler(request))
+    elif path == '/personagens-filme' or path.endswith('/personagens-filme'):
+        return ('/personagens-filme', *respond_with_validators(request, '/personagens-filme', personagens_filme_handler))
     elif path == '/naves-personagem' or path.endswith('/naves-personagem'):
-        return naves_personagem_handler(request)
+        return ('/naves-personagem', *respond_with_validators(request, '/naves-personagem', naves_personagem_handler))
     elif path == '/planetas-filme' or path.endswith('/planetas-filme'):
-        return planetas_filme_handler(request)
+        return ('/planetas-filme', *respond_with_validators(request, '/planetas-filme', planetas_filme_handler))
     elif path == '/explorar' or path.endswith('/explorar') or path == '/' or not path or path == '':
         # Endpoint principal de exploração
-        return explorar_handler(request)
+        return ('/explorar', *respond_with_validators(request, '/explorar', explorar_handler))
     else:
-        return jsonify({
+        return 'desconhecido', jsonify({
             "erro": f"Endpoint não encontrado: {path}",
-            "endpoints_disponiveis": ["/explorar", "/personagens-filme", "/naves-personagem", "/planetas-filme"]
+            "endpoints_disponiveis": ["/explorar", "/personagens-filme", "/naves-personagem", "/planetas-filme",
+                                      "/lote", "/metricas"]
         }), 404, headers
 
+
+def metricas_handler(request: Request) -> Tuple[Any, int, Dict[str, str]]:
+    """
+    Handler para /metricas: contadores e histogramas da instância no formato texto do Prometheus.
+    """
+    cache_stats = response_cache.stats()
+    gauges = {
+        'starwars_cache_entries': cache_stats['entradas'],
+        'starwars_cache_bytes': cache_stats['bytes'],
+        'starwars_rendered_cache_entries': rendered_responses.stats()['entradas'],
+        'starwars_circuit_open': 0 if upstream_breaker.state == 'fechado' else 1,
+    }
+    for name, value in STARTUP_TIMINGS.items():
+        if value is not None:
+            gauges[f'starwars_startup_{STARTUP_METRIC_NAMES[name]}_seconds'] = value
+    body = metrics.render(gauges)
+    headers = {'Access-Control-Allow-Origin': '*', 'Cache-Control': 'no-store'}
+    return current_app.response_class(body, content_type='text/plain; version=0.0.4; charset=utf-8'), 200, headers
+
 def explorar_handler(request: Request) -> Tuple[Any, int, Dict[str, str]]:
     """
     Handler para o endpoint principal /explorar
@@ -305,16 +2888,15 @@ def explorar_handler(request: Request) -> Tuple[Any, int, Dict[str, str]]:
     sort_order = args.get('ordem', 'asc')  # asc ou desc
     page = args.get('pagina', '1')  # Número da página
     limit = args.get('limite', '10')  # Itens por página
+    cursor_token = args.get('cursor')  # Continuação opaca (proximo_cursor da página anterior)
     
     # Validação do parâmetro 'tipo'
-    valid_resources = ['people', 'planets', 'starships', 'films']
-    
     # Validar se o tipo foi fornecido
     if not resource_type:
         logger.warning("Requisição sem parâmetro 'tipo'")
         return jsonify({
             "erro": "Parâmetro 'tipo' é obrigatório.",
-            "tipos_disponiveis": valid_resources
+            "tipos_disponiveis": VALID_RESOURCES
         }), 400, headers
     
     # Validar se o tipo é uma string
@@ -322,16 +2904,16 @@ def explorar_handler(request: Request) -> Tuple[Any, int, Dict[str, str]]:
         logger.warning(f"Parâmetro 'tipo' não é string: {type(resource_type)}")
         return jsonify({
             "erro": "Parâmetro 'tipo' deve ser uma string.",
-            "tipos_disponiveis": valid_resources
+            "tipos_disponiveis": VALID_RESOURCES
         }), 400, headers
     
     # Validar se o tipo está na lista de recursos válidos
     resource_type = resource_type.strip().lower()
-    if resource_type not in valid_resources:
+    if resource_type not in VALID_RESOURCES:
         logger.warning(f"Parâmetro 'tipo' inválido recebido: '{resource_type}'")
         return jsonify({
             "erro": f"Parâmetro 'tipo' inválido: '{resource_type}'.",
-            "tipos_disponiveis": valid_resources
+            "tipos_disponiveis": VALID_RESOURCES
         }), 400, headers
     
     # Validação do parâmetro 'termo' (opcional)
@@ -353,8 +2935,7 @@ def explorar_handler(request: Request) -> Tuple[Any, int, Dict[str, str]]:
                 "erro": "Parâmetro 'termo' não pode estar vazio ou conter apenas espaços."
             }), 400, headers
         
-        # Validar comprimento máximo do termo (limite de 100 caracteres)
-        MAX_SEARCH_LENGTH = 100
+        # Validar comprimento máximo do termo (limite de MAX_SEARCH_LENGTH caracteres)
         if len(search_query) > MAX_SEARCH_LENGTH:
             logger.warning(f"Parâmetro 'termo' excede limite: {len(search_query)} caracteres")
             return jsonify({
@@ -364,24 +2945,75 @@ def explorar_handler(request: Request) -> Tuple[Any, int, Dict[str, str]]:
         
         # Validar caracteres especiais perigosos (proteção básica contra injection)
         # Permitir apenas letras, números, espaços e alguns caracteres especiais comuns
-        if not re.match(r'^[a-zA-Z0-9\s\-_\.]+$', search_query):
+        if not SEARCH_TERM_PATTERN.match(search_query):
             logger.warning(f"Parâmetro 'termo' contém caracteres inválidos: '{search_query}'")
             return jsonify({
                 "erro": "Parâmetro 'termo' contém caracteres inválidos. Use apenas letras, números, espaços e os caracteres: - _ ."
             }), 400, headers
 
+    # Validação do parâmetro 'campos' (opcional): projeção dos registros
+    fields, projection_error = parse_projection(request, resource_type)
+    if projection_error:
+        return jsonify(projection_error), 400, headers
+
+    # Validação do parâmetro 'expandir' (opcional): recursos relacionados embutidos nos registros
+    expand, expansion_error = parse_expansion(request, resource_type, fields)
+    if expansion_error:
+        return jsonify(expansion_error), 400, headers
+
+    # Validação do parâmetro 'cursor' (opcional): precisa ter sido gerado para a mesma consulta
+    sort_params = normalize_sort_params(sort_by, sort_order, resource_type) if sort_by else None
+    query_hash = cursor_query_hash(resource_type, search_query, sort_params)
+    cursor = None
+    if cursor_token is not None:
+        cursor = decode_cursor(cursor_token, query_hash, sort_params)
+        if cursor is None:
+            logger.warning("Parâmetro 'cursor' inválido ou de outra consulta")
+            return jsonify({
+                "erro": "Parâmetro 'cursor' inválido. Use o 'proximo_cursor' de uma resposta com os mesmos "
+                        "'tipo', 'termo', 'ordenar_por' e 'ordem'."
+            }), 400, headers
+
     # 2. Construção da busca na SWAPI
     # A SWAPI usa o parâmetro '?search=' para filtrar
     swapi_params = {}
     if search_query:
         swapi_params['search'] = search_query
 
-    # 3. Execução — buscar todas as páginas da SWAPI para ter a lista completa
+    # 3. Execução — usar o dataset local (snapshot ou lista completa em cache) quando disponível;
+    # caso contrário, buscar todas as páginas da SWAPI para ter a lista completa
     logger.info(f"Buscando dados: tipo={resource_type}, termo={search_query or 'nenhum'}")
-    fetch_result = fetch_all_pages_swapi(resource_type, swapi_params)
+    dataset = get_local_dataset(resource_type)
+    sorted_locally = False
+    start_index = 0  # com cursor: índice, em 'results', do primeiro registro da página
+    if dataset is not None:
+        with timed_phase('busca'):
+            positions = dataset.search(search_query) if search_query else None
+        # Ordenação pelas colunas tipadas e permutações em cache do dataset
+        if sort_params is not None:
+            with timed_phase('ordenacao'):
+                positions = dataset.sort_positions(positions, *sort_params)
+            sorted_locally = True
+        # Só a página pedida é materializada em dicts
+        results = dataset.view(positions)
+        fetch_result = (results, len(results))
+        if cursor is not None:
+            ordered = positions if positions is not None else range(len(dataset))
+            with timed_phase('paginacao'):
+                start_index = seek_cursor(len(ordered), lambda index: dataset.cursor_key(ordered[index], sort_params),
+                                          cursor, sort_order=sort_params[1] if sort_params else 'asc')
+            sorted_locally = True
+    elif get_snapshot() is not None:
+        fetch_result = None
+    else:
+        with timed_phase('busca'):
+            fetch_result = fetch_all_pages_swapi(resource_type, swapi_params)
 
     if fetch_result is None:
         logger.error(f"Falha ao obter dados da SWAPI para {resource_type}")
+        unavailable = upstream_unavailable_response(headers)
+        if unavailable is not None:
+            return unavailable
         return jsonify({"erro": "Falha ao obter dados da fonte externa."}), 502, headers
 
     results, total_count = fetch_result
@@ -390,13 +3022,44 @@ def explorar_handler(request: Request) -> Tuple[Any, int, Dict[str, str]]:
         logger.info(f"Nenhum resultado encontrado para {resource_type} com termo '{search_query or 'nenhum'}'")
         return jsonify({"mensagem": "Nenhum registro encontrado para os critérios."}), 404, headers
 
-    # 4. Aplicar ordenação se solicitada
-    if sort_by:
-        results = sort_results(results, sort_by, sort_order, resource_type)
-
-    # 5. Aplicar paginação sobre a lista completa
+    # 4. Aplicar ordenação se solicitada (e ainda não feita pelo dataset local);
+    # só é preciso ordenar até o fim da página pedida. Com cursor, ficam apenas os registros
+    # posteriores a ele e a janela é a própria página
     total_results = len(results)
-    page_num, limit_num, paginated_results = apply_pagination(results, page, limit)
+    skipped = 0  # registros anteriores a 'results' na ordem completa (cursor fora do dataset local)
+    if cursor is not None and not sorted_locally:
+        with timed_phase('paginacao'):
+            results = [record for record in results
+                       if is_after_cursor(record_cursor_key(record, sort_params), cursor,
+                                          sort_params[1] if sort_params else 'asc')]
+        skipped = total_results - len(results)
+    if sort_by and not sorted_locally:
+        page_num, limit_num = parse_pagination('1' if cursor is not None else page, limit)
+        with timed_phase('ordenacao'):
+            results = sort_results_window(results, sort_by, sort_order, resource_type, page_num * limit_num)
+
+    # 5. Aplicar paginação (por página ou a partir do cursor), gerar o cursor da página
+    # seguinte e projetar os campos pedidos
+    with timed_phase('paginacao'):
+        if cursor is None:
+            page_num, limit_num, paginated_results = apply_pagination(results, page, limit)
+            page_start = (page_num - 1) * limit_num
+        else:
+            _, limit_num = parse_pagination('1', limit)
+            paginated_results = results[start_index:start_index + limit_num]
+            page_start = skipped + start_index
+            page_num = page_start // limit_num + 1
+        next_cursor = None
+        if paginated_results and page_start + len(paginated_results) < total_results:
+            last_key = record_cursor_key(paginated_results[-1], sort_params)
+            next_cursor = encode_cursor(query_hash, last_key) if last_key is not None else None
+        paginated_results = project_records(paginated_results, fields)
+
+    # 6. Expandir os recursos relacionados da página (cada URL distinta buscada uma vez)
+    expansion_failures: List[str] = []
+    if expand:
+        with timed_phase('expansao'):
+            paginated_results, expansion_failures = expand_records(paginated_results, expand)
 
     # Retorna os dados encontrados com metadados básicos
     response_payload = {
@@ -406,11 +3069,25 @@ def explorar_handler(request: Request) -> Tuple[Any, int, Dict[str, str]]:
         "pagina_atual": page_num,
         "total_paginas": (total_results + limit_num - 1) // limit_num if limit_num > 0 else 1,
         "limite_por_pagina": limit_num,
+        # Continuação por keyset ('?cursor='), estável mesmo se registros forem incluídos ou removidos
+        "proximo_cursor": next_cursor,
+        # Lista incompleta: falha em alguma página ou prazo da requisição esgotado
+        "parcial": mark_partial(total_results < total_count or bool(expansion_failures) or deadline_exceeded()),
         "resultados": paginated_results
     }
+    if expand:
+        response_payload["falhas_expansao"] = expansion_failures
 
     logger.info(f"Sucesso: {len(paginated_results)} resultado(s) encontrado(s) para {resource_type} (página {page_num})")
-    return jsonify(response_payload), 200, headers
+
+    # Streaming: envelope primeiro e depois cada registro serializado individualmente
+    if wants_streaming(request):
+        envelope = {key: value for key, value in response_payload.items() if key != 'resultados'}
+        return stream_json(envelope, 'resultados', paginated_results), 200, headers
+
+    with timed_phase('serializacao'):
+        response = jsonify(response_payload)
+    return response, 200, headers
 
 def fetch_resource_by_url(url: str) -> Optional[Dict[str, Any]]:
     """
@@ -422,13 +3099,133 @@ def fetch_resource_by_url(url: str) -> Optional[Dict[str, Any]]:
     Returns:
         Dados do recurso ou None em caso de falha
     """
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        return snapshot.get_by_url(url)
+    return cached_fetch(url, None, lambda: _request_resource_by_url(url))
+
+def _request_resource_by_url(url: str) -> Optional[Dict[str, Any]]:
+    """
+    Executa a consulta de fetch_resource_by_url na SWAPI (sem cache). Uma única tentativa:
+    no fan-out, retentar cada item multiplicaria a espera pelo número de itens.
+    """
+    return request_swapi_json(url, max_attempts=1)
+
+def iter_resources_by_urls(urls: List[str], max_workers: Optional[int] = None,
+                           time_budget: Optional[float] = None) -> Iterator[Tuple[str, Optional[Dict[str, Any]]]]:
+    """
+    Busca vários recursos da SWAPI em paralelo (fan-out das consultas correlacionadas),
+    entregando (url, dados_ou_None) na ordem original à medida que ficam prontos.
+
+    Args:
+        urls: URLs completas dos recursos
+        max_workers: Concorrência máxima (padrão: FANOUT_MAX_WORKERS)
+        time_budget: Tempo máximo total em segundos (padrão: FANOUT_TIME_BUDGET)
+    """
+    workers = max_workers or FANOUT_MAX_WORKERS
+    budget = FANOUT_TIME_BUDGET if time_budget is None else time_budget
+    return iter_fan_out(fetch_resource_by_url, urls, workers, remaining_time(budget))
+
+def fetch_resources_by_urls(urls: List[str], max_workers: Optional[int] = None,
+                            time_budget: Optional[float] = None) -> Tuple[list, List[str]]:
+    """
+    Busca vários recursos da SWAPI em paralelo (fan-out das consultas correlacionadas).
+
+    Returns:
+        Tupla (recursos_encontrados_na_ordem_original, urls_com_falha)
+    """
+    found = []
+    failed = []
+    for url, data in iter_resources_by_urls(urls, max_workers, time_budget):
+        if data:
+            found.append(data)
+        else:
+            failed.append(url)
+
+    if failed:
+        logger.warning(f"{len(failed)} de {len(urls)} recurso(s) não puderam ser obtidos")
+    return found, failed
+
+def wants_streaming(request: Request) -> bool:
+    """Indica se o cliente pediu resposta em streaming (?stream=1)."""
+    return str(request.args.get('stream', '')).strip().lower() in ('1', 'true', 'sim')
+
+def stream_json(envelope: Dict[str, Any], list_key: str, items: Iterable[Any],
+                trailer: Optional[Callable[[], Dict[str, Any]]] = None) -> Response:
+    """
+    Monta uma resposta JSON em streaming (chunked): primeiro os campos do envelope,
+    depois cada item da lista à medida que é produzido e, por fim, os campos do trailer
+    (calculados após o último item, como totais e falhas).
+
+    Args:
+        envelope: Campos emitidos antes da lista
+        list_key: Nome do campo da lista
+        items: Itens da lista (pode ser um gerador)
+        trailer: Função que retorna os campos emitidos após a lista
+    """
+    def generate() -> Iterator[str]:
+        yield '{'
+        for key, value in envelope.items():
+            yield f'{json.dumps(key)}:{json.dumps(value)},'
+        yield f'{json.dumps(list_key)}:['
+        for index, item in enumerate(items):
+            yield (',' if index else '') + json.dumps(item)
+        yield ']'
+        for key, value in (trailer() if trailer else {}).items():
+            yield f',{json.dumps(key)}:{json.dumps(value)}'
+        yield '}'
+
+    return current_app.response_class(generate(), mimetype='application/json')
+
+def stream_relation_response(envelope: Dict[str, Any], list_key: str, total_key: str,
+                             urls: List[str], concurrency: Optional[int],
+                             records: Optional[list] = None, failed: Optional[List[str]] = None,
+                             fields: Optional[List[str]] = None) -> Response:
+    """
+    Resposta em streaming de uma consulta correlacionada.
+
+    Sem 'records', os recursos de 'urls' são buscados pelo fan-out concorrente e cada um é
+    enviado ao cliente assim que ele e os anteriores estiverem prontos (já projetado em 'fields').
+    """
+    failures = list(failed or [])
+    counter = {'total': 0}
+    # O corpo é gerado depois que o handler retorna: o fan-out roda no contexto (prazo e tempos) da requisição
+    context = contextvars.copy_context()
+
+    def related_items() -> Iterator[Dict[str, Any]]:
+        source = iter(((None, record) for record in records) if records is not None
+                      else context.run(iter_resources_by_urls, urls, concurrency))
+        while True:
+            try:
+                url, data = context.run(next, source)
+            except StopIteration:
+                break
+            if data:
+                counter['total'] += 1
+                yield project_records([data], fields)[0]
+            else:
+                failures.append(url)
+
+    return stream_json(envelope, list_key, related_items(),
+                       lambda: {total_key: counter['total'], 'falhas': failures, 'parcial': bool(failures)})
+
+def parse_concurrency(request: Request) -> Tuple[Optional[int], Optional[str]]:
+    """
+    Lê o parâmetro opcional 'concorrencia' (limite de buscas simultâneas por requisição).
+
+    Returns:
+        Tupla (concorrencia_ou_None, mensagem_de_erro_ou_None)
+    """
+    value = request.args.get('concorrencia')
+    if value is None:
+        return None, None
     try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        return response.json()
-    except Exception as e:
-        logger.error(f"Erro ao buscar recurso por URL {url}: {e}")
-        return None
+        concurrency = int(value)
+    except (ValueError, TypeError):
+        return None, "Parâmetro 'concorrencia' deve ser um número inteiro."
+    if not 1 <= concurrency <= FANOUT_MAX_WORKERS:
+        return None, f"Parâmetro 'concorrencia' deve estar entre 1 e {FANOUT_MAX_WORKERS}."
+    return concurrency, None
 
 def personagens_filme_handler(request: Request) -> Tuple[Any, int, Dict[str, str]]:
     """
@@ -451,38 +3248,69 @@ def personagens_filme_handler(request: Request) -> Tuple[Any, int, Dict[str, str
         return jsonify({
             "erro": "Parâmetro 'filme_id' é obrigatório."
         }), 400, headers
+
+    concurrency, concurrency_error = parse_concurrency(request)
+    if concurrency_error:
+        return jsonify({"erro": concurrency_error}), 400, headers
+
+    fields, projection_error = parse_projection(request, 'people')
+    if projection_error:
+        return jsonify(projection_error), 400, headers
     
-    # Buscar filme na SWAPI
-    filme_url = f"{SWAPI_BASE_URL}/films/{filme_id}/"
-    filme_data = fetch_resource_by_url(filme_url)
+    # Responder pelo grafo de relações em memória quando os datasets locais estiverem disponíveis
+    relation = resolve_relation('films', filme_id, 'characters')
+    if relation is not None:
+        filme_data, personagens, falhas = relation
+    else:
+        # Buscar filme na SWAPI
+        filme_url = f"{SWAPI_BASE_URL}/films/{filme_id}/"
+        filme_data = fetch_resource_by_url(filme_url)
     
     if not filme_data:
+        unavailable = upstream_unavailable_response(headers)
+        if unavailable is not None:
+            return unavailable
         return jsonify({
             "erro": f"Filme com ID {filme_id} não encontrado."
         }), 404, headers
     
+    filme_info = {
+        "titulo": filme_data.get('title'),
+        "episodio": filme_data.get('episode_id'),
+        "data_lancamento": filme_data.get('release_date')
+    }
+
     # Extrair URLs dos personagens
     characters_urls = filme_data.get('characters', [])
-    
-    # Buscar dados de cada personagem
-    personagens = []
-    for char_url in characters_urls:
-        char_data = fetch_resource_by_url(char_url)
-        if char_data:
-            personagens.append(char_data)
+
+    # Streaming: envia cada personagem assim que ele (e os anteriores) estiver pronto
+    if wants_streaming(request):
+        return stream_relation_response(
+            {"filme": filme_info}, 'personagens', 'total_personagens', characters_urls, concurrency,
+            records=personagens if relation is not None else None,
+            failed=falhas if relation is not None else None,
+            fields=fields
+        ), 200, headers
+
+    if relation is None:
+        # Buscar dados dos personagens em paralelo
+        with timed_phase('fanout'):
+            personagens, falhas = fetch_resources_by_urls(characters_urls, concurrency)
+
+    personagens = project_records(personagens, fields)
     
     response_payload = {
-        "filme": {
-            "titulo": filme_data.get('title'),
-            "episodio": filme_data.get('episode_id'),
-            "data_lancamento": filme_data.get('release_date')
-        },
+        "filme": filme_info,
         "total_personagens": len(personagens),
-        "personagens": personagens
+        "personagens": personagens,
+        "falhas": falhas,
+        "parcial": mark_partial(bool(falhas))
     }
     
     logger.info(f"Retornados {len(personagens)} personagens para o filme {filme_id}")
-    return jsonify(response_payload), 200, headers
+    with timed_phase('serializacao'):
+        response = jsonify(response_payload)
+    return response, 200, headers
 
 def naves_personagem_handler(request: Request) -> Tuple[Any, int, Dict[str, str]]:
     """
@@ -505,38 +3333,69 @@ def naves_personagem_handler(request: Request) -> Tuple[Any, int, Dict[str, str]
         return jsonify({
             "erro": "Parâmetro 'personagem_id' é obrigatório."
         }), 400, headers
+
+    concurrency, concurrency_error = parse_concurrency(request)
+    if concurrency_error:
+        return jsonify({"erro": concurrency_error}), 400, headers
+
+    fields, projection_error = parse_projection(request, 'starships')
+    if projection_error:
+        return jsonify(projection_error), 400, headers
     
-    # Buscar personagem na SWAPI
-    personagem_url = f"{SWAPI_BASE_URL}/people/{personagem_id}/"
-    personagem_data = fetch_resource_by_url(personagem_url)
+    # Responder pelo grafo de relações em memória quando os datasets locais estiverem disponíveis
+    relation = resolve_relation('people', personagem_id, 'starships')
+    if relation is not None:
+        personagem_data, naves, falhas = relation
+    else:
+        # Buscar personagem na SWAPI
+        personagem_url = f"{SWAPI_BASE_URL}/people/{personagem_id}/"
+        personagem_data = fetch_resource_by_url(personagem_url)
     
     if not personagem_data:
+        unavailable = upstream_unavailable_response(headers)
+        if unavailable is not None:
+            return unavailable
         return jsonify({
             "erro": f"Personagem com ID {personagem_id} não encontrado."
         }), 404, headers
     
+    personagem_info = {
+        "nome": personagem_data.get('name'),
+        "altura": personagem_data.get('height'),
+        "peso": personagem_data.get('mass')
+    }
+
     # Extrair URLs das naves
     starships_urls = personagem_data.get('starships', [])
-    
-    # Buscar dados de cada nave
-    naves = []
-    for ship_url in starships_urls:
-        ship_data = fetch_resource_by_url(ship_url)
-        if ship_data:
-            naves.append(ship_data)
+
+    # Streaming: envia cada nave assim que ela (e as anteriores) estiver pronta
+    if wants_streaming(request):
+        return stream_relation_response(
+            {"personagem": personagem_info}, 'naves', 'total_naves', starships_urls, concurrency,
+            records=naves if relation is not None else None,
+            failed=falhas if relation is not None else None,
+            fields=fields
+        ), 200, headers
+
+    if relation is None:
+        # Buscar dados das naves em paralelo
+        with timed_phase('fanout'):
+            naves, falhas = fetch_resources_by_urls(starships_urls, concurrency)
+
+    naves = project_records(naves, fields)
     
     response_payload = {
-        "personagem": {
-            "nome": personagem_data.get('name'),
-            "altura": personagem_data.get('height'),
-            "peso": personagem_data.get('mass')
-        },
+        "personagem": personagem_info,
         "total_naves": len(naves),
-        "naves": naves
+        "naves": naves,
+        "falhas": falhas,
+        "parcial": mark_partial(bool(falhas))
     }
     
     logger.info(f"Retornadas {len(naves)} naves para o personagem {personagem_id}")
-    return jsonify(response_payload), 200, headers
+    with timed_phase('serializacao'):
+        response = jsonify(response_payload)
+    return response, 200, headers
 
 def planetas_filme_handler(request: Request) -> Tuple[Any, int, Dict[str, str]]:
     """
@@ -559,35 +3418,240 @@ def planetas_filme_handler(request: Request) -> Tuple[Any, int, Dict[str, str]]:
         return jsonify({
             "erro": "Parâmetro 'filme_id' é obrigatório."
         }), 400, headers
+
+    concurrency, concurrency_error = parse_concurrency(request)
+    if concurrency_error:
+        return jsonify({"erro": concurrency_error}), 400, headers
+
+    fields, projection_error = parse_projection(request, 'planets')
+    if projection_error:
+        return jsonify(projection_error), 400, headers
     
-    # Buscar filme na SWAPI
-    filme_url = f"{SWAPI_BASE_URL}/films/{filme_id}/"
-    filme_data = fetch_resource_by_url(filme_url)
+    # Responder pelo grafo de relações em memória quando os datasets locais estiverem disponíveis
+    relation = resolve_relation('films', filme_id, 'planets')
+    if relation is not None:
+        filme_data, planetas, falhas = relation
+    else:
+        # Buscar filme na SWAPI
+        filme_url = f"{SWAPI_BASE_URL}/films/{filme_id}/"
+        filme_data = fetch_resource_by_url(filme_url)
     
     if not filme_data:
+        unavailable = upstream_unavailable_response(headers)
+        if unavailable is not None:
+            return unavailable
         return jsonify({
             "erro": f"Filme com ID {filme_id} não encontrado."
         }), 404, headers
     
+    filme_info = {
+        "titulo": filme_data.get('title'),
+        "episodio": filme_data.get('episode_id'),
+        "data_lancamento": filme_data.get('release_date')
+    }
+
     # Extrair URLs dos planetas
     planets_urls = filme_data.get('planets', [])
-    
-    # Buscar dados de cada planeta
-    planetas = []
-    for planet_url in planets_urls:
-        planet_data = fetch_resource_by_url(planet_url)
-        if planet_data:
-            planetas.append(planet_data)
+
+    # Streaming: envia cada planeta assim que ele (e os anteriores) estiver pronto
+    if wants_streaming(request):
+        return stream_relation_response(
+            {"filme": filme_info}, 'planetas', 'total_planetas', planets_urls, concurrency,
+            records=planetas if relation is not None else None,
+            failed=falhas if relation is not None else None,
+            fields=fields
+        ), 200, headers
+
+    if relation is None:
+        # Buscar dados dos planetas em paralelo
+        with timed_phase('fanout'):
+            planetas, falhas = fetch_resources_by_urls(planets_urls, concurrency)
+
+    planetas = project_records(planetas, fields)
     
     response_payload = {
-        "filme": {
-            "titulo": filme_data.get('title'),
-            "episodio": filme_data.get('episode_id'),
-            "data_lancamento": filme_data.get('release_date')
-        },
+        "filme": filme_info,
         "total_planetas": len(planetas),
-        "planetas": planetas
+        "planetas": planetas,
+        "falhas": falhas,
+        "parcial": mark_partial(bool(falhas))
     }
     
     logger.info(f"Retornados {len(planetas)} planetas para o filme {filme_id}")
-    return jsonify(response_payload), 200, headers
\ No newline at end of file
+    with timed_phase('serializacao'):
+        response = jsonify(response_payload)
+    return response, 200, headers
+
+
+# /lote: máximo de consultas por chamada e quantas são executadas ao mesmo tempo
+BATCH_MAX_QUERIES = int(os.environ.get('BATCH_MAX_QUERIES', '20'))
+BATCH_MAX_WORKERS = int(os.environ.get('BATCH_MAX_WORKERS', '4'))
+
+# Endpoints aceitos como consultas do lote
+BATCH_ENDPOINTS = {
+    '/explorar': explorar_handler,
+    '/personagens-filme': personagens_filme_handler,
+    '/naves-personagem': naves_personagem_handler,
+    '/planetas-filme': planetas_filme_handler,
+}
+
+
+class SubRequest:
+    """Requisição GET sintética de uma consulta do lote, com a interface usada pelos handlers."""
+
+    method = 'GET'
+
+    def __init__(self, path: str, args: MultiDict):
+        self.path = path
+        self.args = args
+        self.headers = Headers()
+
+
+def parse_batch_query(query: Any) -> Tuple[Optional[SubRequest], Optional[str]]:
+    """
+    Valida uma consulta do lote ({"endpoint": "/explorar", "parametros": {...}}).
+
+    Parâmetros aceitam valores escalares ou listas de escalares; 'stream' é ignorado,
+    pois as respostas do lote são montadas em um único corpo.
+
+    Returns:
+        Tupla (sub_requisição_ou_None, mensagem_de_erro_ou_None)
+    """
+    if not isinstance(query, dict):
+        return None, "Cada consulta deve ser um objeto com 'endpoint' e 'parametros'."
+    endpoint = query.get('endpoint')
+    if endpoint not in BATCH_ENDPOINTS:
+        return None, f"Endpoint inválido: '{endpoint}'. Use um de: {', '.join(BATCH_ENDPOINTS)}."
+    params = query.get('parametros', {})
+    if not isinstance(params, dict):
+        return None, "Campo 'parametros' deve ser um objeto."
+    args = MultiDict()
+    for name, value in params.items():
+        if name == 'stream':
+            continue
+        for item in value if isinstance(value, list) else [value]:
+            if not isinstance(item, (str, int, float, bool)):
+                return None, f"Parâmetro '{name}' deve ser texto, número ou lista deles."
+            args.add(name, str(item))
+    return SubRequest(endpoint, args), None
+
+
+def batch_item(endpoint: Any, status_code: int, body: bytes) -> bytes:
+    """Item do lote com o corpo JSON já serializado embutido sem re-serialização."""
+    envelope = json.dumps({'endpoint': endpoint, 'status': status_code}, ensure_ascii=False)
+    return envelope[:-1].encode('utf-8') + b', "corpo": ' + body + b'}'
+
+
+def lote_handler(request: Request) -> Tuple[Any, int, Dict[str, str]]:
+    """
+    Handler para POST /lote: executa várias consultas em uma única chamada.
+
+    Corpo: {"consultas": [{"endpoint": "/explorar", "parametros": {"tipo": "people"}}, ...]}.
+    As consultas rodam em paralelo (até BATCH_MAX_WORKERS) passando pelos mesmos caches e pelo
+    single-flight, então cada URL da SWAPI comum a várias consultas é buscada uma única vez.
+    Os resultados voltam na ordem das consultas, cada um com seu status e corpo.
+    """
+    headers = {'Access-Control-Allow-Origin': '*'}
+
+    if request.method != 'POST':
+        return jsonify({"erro": "Use POST em /lote."}), 405, {**headers, 'Allow': 'POST, OPTIONS'}
+
+    body = request.get_json(silent=True)
+    queries = body.get('consultas') if isinstance(body, dict) else None
+    if not isinstance(queries, list) or not queries:
+        return jsonify({
+            "erro": "Corpo deve ser um JSON com a lista 'consultas' (ex.: "
+                    "{\"consultas\": [{\"endpoint\": \"/explorar\", \"parametros\": {\"tipo\": \"people\"}}]})."
+        }), 400, headers
+    if len(queries) > BATCH_MAX_QUERIES:
+        return jsonify({
+            "erro": f"O lote aceita no máximo {BATCH_MAX_QUERIES} consultas.",
+            "total_recebido": len(queries)
+        }), 400, headers
+
+    app = current_app._get_current_object()
+
+    def run(query: Any) -> bytes:
+        sub_request, error = parse_batch_query(query)
+        endpoint = query.get('endpoint') if isinstance(query, dict) else None
+        if error:
+            return batch_item(endpoint, 400, json.dumps({"erro": error}, ensure_ascii=False).encode('utf-8'))
+        try:
+            with app.app_context():
+                response, status_code, _ = respond_with_validators(
+                    sub_request, sub_request.path, BATCH_ENDPOINTS[sub_request.path])
+                return batch_item(endpoint, status_code, response.get_data())
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Erro da SWAPI na consulta do lote {endpoint}: {e}")
+            status_code, message = 502, f"Erro ao consultar a SWAPI: {e}"
+        except Exception as e:
+            logger.exception(f"Erro inesperado na consulta do lote {endpoint}")
+            status_code, message = 500, f"Erro interno ao executar a consulta: {type(e).__name__}: {e}"
+        return batch_item(endpoint, status_code, json.dumps({"erro": message}, ensure_ascii=False).encode('utf-8'))
+
+    logger.info(f"Lote com {len(queries)} consulta(s)")
+    items = []
+    for query, item in iter_fan_out(run, queries, BATCH_MAX_WORKERS, remaining_time()):
+        if item is None:
+            # run trata as exceções: None aqui é sempre orçamento de tempo esgotado
+            endpoint = query.get('endpoint') if isinstance(query, dict) else None
+            item = batch_item(endpoint, 504, json.dumps(
+                {"erro": "Consulta não concluída dentro do prazo."}, ensure_ascii=False).encode('utf-8'))
+        items.append(item)
+
+    with timed_phase('serializacao'):
+        payload = (b'{"total_consultas": ' + str(len(items)).encode() + b', "resultados": ['
+                   + b', '.join(items) + b']}')
+    # Sem ETag nem cache de respostas renderizadas: o corpo depende do POST, fora da chave de cache
+    return uncached_json_response(request, payload, headers)
+
+
+# Inicialização da instância (cold start): aquecimento opcional e tempos de inicialização
+# SWAPI_WARMUP: 'snapshot' e/ou tipos de recurso separados por vírgula (ex.: "snapshot" ou "people,films").
+# Os recursos são baixados da SWAPI e registrados como datasets locais; em todos os casos o índice de
+# busca e as permutações de ordenação são construídos antes da primeira requisição.
+WARMUP_TARGETS = [target.strip().lower() for target in os.environ.get('SWAPI_WARMUP', '').split(',')
+                  if target.strip()]
+
+STARTUP_TIMINGS: Dict[str, Optional[float]] = {
+    'importacao': None,             # import do módulo, incluindo dependências (s)
+    'aquecimento': None,            # warm_up no carregamento (s)
+    'primeira_requisicao': None,    # duração da primeira requisição atendida (s)
+    'ate_primeira_resposta': None,  # do início do import até o fim da primeira requisição (s)
+}
+STARTUP_METRIC_NAMES = {
+    'importacao': 'import',
+    'aquecimento': 'warmup',
+    'primeira_requisicao': 'first_request',
+    'ate_primeira_resposta': 'time_to_first_response',
+}
+
+
+def warm_up(targets: Sequence[str]) -> None:
+    """Carrega e prepara os dados indicados em SWAPI_WARMUP; falhas são registradas e ignoradas."""
+    for target in targets:
+        try:
+            if target == 'snapshot':
+                snapshot = get_snapshot()
+                datasets = list(snapshot.datasets.values()) if snapshot is not None else []
+            elif target in VALID_RESOURCES:
+                fetch_all_pages_swapi(target)
+                dataset = get_local_dataset(target)
+                datasets = [dataset] if dataset is not None else []
+            else:
+                logger.warning(f"Alvo de aquecimento desconhecido: '{target}'")
+                continue
+            for dataset in datasets:
+                dataset.warm()
+            logger.info(f"Aquecimento concluído: {target} ({len(datasets)} dataset(s))")
+        except Exception as e:
+            logger.error(f"Falha no aquecimento de '{target}': {e}")
+
+
+STARTUP_TIMINGS['importacao'] = time.perf_counter() - _IMPORT_STARTED
+if WARMUP_TARGETS:
+    _warmup_started = time.perf_counter()
+    warm_up(WARMUP_TARGETS)
+    STARTUP_TIMINGS['aquecimento'] = time.perf_counter() - _warmup_started
+if REFRESH_INTERVAL > 0:
+    dataset_refresher.start()
@@ -0,0 +1,138 @@
+"""
+Relatório de cold start da Cloud Function Star Wars API Explorer.
+
+Cada execução sobe um interpretador novo que importa main.py e atende duas requisições
+(/explorar) contra o servidor local swapi_standin.py, medindo o import, a primeira e a segunda
+requisição. Uma execução extra com '-X importtime' lista os módulos mais lentos de importar.
+
+Uso:
+    python startup_report.py                                   # 5 execuções
+    python startup_report.py --aquecimento people --execucoes 10
+    python startup_report.py --saida atual.json --baseline baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+from bench_main import compare, print_table
+from swapi_standin import SwapiStandin, generate_datasets
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Executado em um interpretador novo a cada medição
+CHILD_SCRIPT = r'''
+import json, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+from flask import Flask, request
+app = Flask('startup_report')
+durations = []
+for _ in range(2):
+    with app.test_request_context('/explorar', query_string={'tipo': 'people', 'termo': 'a', 'ordenar_por': 'height'}):
+        begin = time.perf_counter()
+        response, status_code, headers = main.starwars_handler(request)
+        durations.append((time.perf_counter() - begin, status_code))
+print(json.dumps({
+    'importacao': imported - started,
+    'primeira_requisicao': durations[0][0],
+    'segunda_requisicao': durations[1][0],
+    'status': [status for _, status in durations],
+    'modulo': main.STARTUP_TIMINGS,
+}))
+'''
+
+
+def run_child(env: Dict[str, str]) -> dict:
+    """Mede uma inicialização completa em um processo novo."""
+    result = subprocess.run([sys.executable, '-c', CHILD_SCRIPT], cwd=HERE, env=env,
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(env: Dict[str, str], top: int) -> List[tuple]:
+    """Módulos com maior tempo acumulado de import (saída de 'python -X importtime')."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import main'], cwd=HERE, env=env,
+                            capture_output=True, text=True, check=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, module = (part.strip() for part in line[len('import time:'):].split('|'))
+        rows.append((module.strip(), int(self_us), int(cumulative_us)))
+    return sorted(rows, key=lambda row: row[2], reverse=True)[:top]
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    values = [sample * 1000 for sample in samples]
+    return {'min_ms': min(values), 'mediana_ms': statistics.median(values), 'max_ms': max(values)}
+
+
+def main_cli(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Relatório de cold start (import e primeira requisição).")
+    parser.add_argument('--execucoes', type=int, default=5)
+    parser.add_argument('--aquecimento', default='', help="Valor de SWAPI_WARMUP nos processos medidos")
+    parser.add_argument('--latencia-ms', type=float, default=20.0, help="Latência do servidor SWAPI local")
+    parser.add_argument('--top', type=int, default=15, help="Quantos módulos listar no ranking de import")
+    parser.add_argument('--saida', help="Grava os resultados em JSON neste arquivo")
+    parser.add_argument('--baseline', help="Arquivo de resultados anterior para comparação")
+    parser.add_argument('--tolerancia', type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    with SwapiStandin(generate_datasets(), latency_ms=args.latencia_ms) as standin:
+        env = dict(os.environ, SWAPI_BASE_URL=standin.base_url, SWAPI_WARMUP=args.aquecimento)
+        runs = [run_child(env) for _ in range(args.execucoes)]
+        imports = slowest_imports(env, args.top)
+
+    statuses = {status for run in runs for status in run['status']}
+    if statuses != {200}:
+        print(f"Aviso: status inesperados nas requisições medidas: {sorted(statuses)}")
+
+    results = {
+        'importacao': summarize([run['importacao'] for run in runs]),
+        'primeira_requisicao': summarize([run['primeira_requisicao'] for run in runs]),
+        'segunda_requisicao': summarize([run['segunda_requisicao'] for run in runs]),
+    }
+    if args.aquecimento:
+        results['aquecimento'] = summarize([run['modulo']['aquecimento'] or 0.0 for run in runs])
+    print_table(results)
+
+    print(f"\nMódulos mais lentos de importar (acumulado):")
+    for module, self_us, cumulative_us in imports:
+        print(f"  {cumulative_us / 1000:>8.1f} ms  (próprio {self_us / 1000:>6.1f} ms)  {module}")
+
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as output:
+            json.dump({
+                'meta': {
+                    'python': platform.python_version(),
+                    'plataforma': platform.platform(),
+                    'data': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                    'execucoes': args.execucoes,
+                    'aquecimento': args.aquecimento,
+                },
+                'resultados': results,
+                'imports': [{'modulo': m, 'proprio_us': s, 'acumulado_us': c} for m, s, c in imports],
+            }, output, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as baseline_file:
+            baseline = json.load(baseline_file)['resultados']
+        regressions = compare(results, baseline, args.tolerancia)
+        if regressions:
+            print(f"\n{len(regressions)} regressão(ões) acima de {args.tolerancia:.0%}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print(f"\nSem regressões acima de {args.tolerancia:.0%} em relação a {args.baseline}.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main_cli())
@@ -0,0 +1,310 @@
+"""
+Servidor local que emula os endpoints da SWAPI usados por main.py.
+
+Serve listas paginadas (count/next/previous/results), '?search=' e '/<recurso>/<id>/' a partir
+de dados gerados ou de um snapshot, com latência, jitter, taxa de erro e limite de requisições
+configuráveis. Permite exercitar retry, paginação e fan-out de ponta a ponta sem rede.
+
+Uso:
+    python swapi_standin.py --porta 8001 --latencia-ms 80 --jitter-ms 40 --taxa-erro 0.05
+    SWAPI_BASE_URL=http://127.0.0.1:8001/api functions-framework --target=starwars_handler
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+import main
+
+PAGE_SIZE = 10
+SOURCE_BASE_URL = "https://swapi.dev/api"
+
+DEFAULT_COUNTS = {'people': 82, 'planets': 60, 'starships': 36, 'films': 6}
+NAMES = ['Luke', 'Leia', 'Han', 'Chewbacca', 'Anakin', 'Padmé', 'Obi-Wan', 'Yoda', 'Lando', 'Rey']
+PLACES = ['Tatooine', 'Alderaan', 'Hoth', 'Dagobah', 'Bespin', 'Endor', 'Naboo', 'Coruscant', 'Kamino']
+SHIPS = ['Falcon', 'X-wing', 'Destroyer', 'Corvette', 'Interceptor', 'Cruiser', 'Shuttle', 'Frigate']
+
+
+def _sample_urls(rng: random.Random, resource: str, total: int, maximum: int) -> List[str]:
+    ids = rng.sample(range(1, total + 1), min(total, rng.randint(0, maximum)))
+    return [f"{SOURCE_BASE_URL}/{resource}/{resource_id}/" for resource_id in sorted(ids)]
+
+
+def generate_datasets(counts: Optional[Dict[str, int]] = None, seed: int = 42) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Gera registros sintéticos no formato da SWAPI, com referências cruzadas consistentes
+    (toda URL relacionada aponta para um registro existente).
+    """
+    counts = {**DEFAULT_COUNTS, **(counts or {})}
+    rng = random.Random(seed)
+    people, planets, starships, films = (counts[r] for r in ('people', 'planets', 'starships', 'films'))
+    timestamp = "2014-12-20T21:17:56.891000Z"
+    datasets: Dict[str, List[Dict[str, Any]]] = {'people': [], 'planets': [], 'starships': [], 'films': []}
+
+    for i in range(1, people + 1):
+        datasets['people'].append({
+            'name': f"{rng.choice(NAMES)} {i}",
+            'height': str(rng.randint(60, 260)),
+            'mass': rng.choice([str(rng.randint(20, 180)), 'unknown']),
+            'birth_year': rng.choice([f"{rng.randint(8, 900)}BBY", 'unknown']),
+            'gender': rng.choice(['male', 'female', 'n/a']),
+            'homeworld': f"{SOURCE_BASE_URL}/planets/{rng.randint(1, planets)}/",
+            'films': _sample_urls(rng, 'films', films, 4),
+            'starships': _sample_urls(rng, 'starships', starships, 3),
+            'created': timestamp, 'edited': timestamp,
+            'url': f"{SOURCE_BASE_URL}/people/{i}/",
+        })
+    for i in range(1, planets + 1):
+        datasets['planets'].append({
+            'name': f"{rng.choice(PLACES)} {i}",
+            'diameter': str(rng.randint(0, 120000)),
+            'population': rng.choice([f"{rng.randint(1000, 10 ** 12)}", 'unknown']),
+            'rotation_period': str(rng.randint(6, 60)),
+            'orbital_period': str(rng.randint(200, 5000)),
+            'climate': rng.choice(['arid', 'temperate', 'frozen', 'murky']),
+            'terrain': rng.choice(['desert', 'grasslands', 'tundra', 'swamp']),
+            'residents': _sample_urls(rng, 'people', people, 5),
+            'films': _sample_urls(rng, 'films', films, 3),
+            'created': timestamp, 'edited': timestamp,
+            'url': f"{SOURCE_BASE_URL}/planets/{i}/",
+        })
+    for i in range(1, starships + 1):
+        datasets['starships'].append({
+            'name': f"{rng.choice(SHIPS)} {i}",
+            'model': f"{rng.choice(SHIPS)}-class {rng.randint(1, 99)}",
+            'manufacturer': 'Corellian Engineering Corporation',
+            'cost_in_credits': rng.choice([str(rng.randint(10 ** 4, 10 ** 9)), 'unknown']),
+            'length': str(rng.randint(5, 19000)),
+            'crew': str(rng.randint(1, 50000)),
+            'passengers': str(rng.randint(0, 600)),
+            'starship_class': rng.choice(['Starfighter', 'Freighter', 'Star Destroyer']),
+            'pilots': _sample_urls(rng, 'people', people, 3),
+            'films': _sample_urls(rng, 'films', films, 3),
+            'created': timestamp, 'edited': timestamp,
+            'url': f"{SOURCE_BASE_URL}/starships/{i}/",
+        })
+    for i in range(1, films + 1):
+        datasets['films'].append({
+            'title': f"Episode {i}",
+            'episode_id': i,
+            'director': 'George Lucas',
+            'producer': 'Rick McCallum',
+            'release_date': f"{1976 + i * 3}-05-25",
+            'characters': _sample_urls(rng, 'people', people, 20),
+            'planets': _sample_urls(rng, 'planets', planets, 6),
+            'starships': _sample_urls(rng, 'starships', starships, 8),
+            'created': timestamp, 'edited': timestamp,
+            'url': f"{SOURCE_BASE_URL}/films/{i}/",
+        })
+    return datasets
+
+
+def load_snapshot_datasets(path: str) -> Dict[str, List[Dict[str, Any]]]:
+    """Carrega os registros de um snapshot gerado por build_snapshot.py."""
+    snapshot = main.load_snapshot(path)
+    return {resource: list(dataset.records) for resource, dataset in snapshot.datasets.items()}
+
+
+class RateLimiter:
+    """Token bucket: até 'rate' requisições por segundo, com rajadas de até 'rate' requisições."""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self._tokens = rate
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.rate, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+class SwapiStandin:
+    """
+    Servidor HTTP local com a API da SWAPI.
+
+    Args:
+        datasets: Registros por tipo de recurso (URLs em SOURCE_BASE_URL são reescritas para o servidor)
+        latency_ms: Latência fixa adicionada a cada resposta
+        jitter_ms: Variação aleatória (uniforme, 0..jitter_ms) somada à latência
+        error_rate: Fração das requisições respondidas com HTTP 500
+        max_rps: Limite de requisições por segundo; excedentes recebem HTTP 429 (None = sem limite)
+        seed: Semente da latência e da injeção de erros
+    """
+
+    def __init__(self, datasets: Optional[Dict[str, List[Dict[str, Any]]]] = None,
+                 host: str = '127.0.0.1', port: int = 0, latency_ms: float = 0.0, jitter_ms: float = 0.0,
+                 error_rate: float = 0.0, max_rps: Optional[float] = None, seed: int = 0):
+        self.datasets = datasets if datasets is not None else generate_datasets()
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limiter = RateLimiter(max_rps) if max_rps else None
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.stats = {'requisicoes': 0, 'erros_injetados': 0, 'limitadas': 0}
+        self._by_id = {
+            resource: {main.parse_resource_url(record['url'])[1]: record for record in records}
+            for resource, records in self.datasets.items()
+        }
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/api"
+
+    def start(self) -> 'SwapiStandin':
+        """Inicia o servidor em uma thread em segundo plano."""
+        self._thread = threading.Thread(target=self._server.serve_forever, args=(0.05,), daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        """Atende requisições na thread atual até Ctrl+C."""
+        try:
+            self._server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._server.server_close()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self) -> 'SwapiStandin':
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def _count(self, key: str) -> None:
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _draw(self) -> tuple:
+        with self._rng_lock:
+            return self._rng.uniform(0, self.jitter_ms), self._rng.random()
+
+    def _list(self, resource: str, query: Dict[str, List[str]]) -> tuple:
+        records = self.datasets[resource]
+        term = query.get('search', [''])[0].lower()
+        if term:
+            fields = main.SEARCH_FIELDS[resource]
+            records = [r for r in records if any(term in str(r.get(f, '')).lower() for f in fields)]
+        try:
+            page = int(query.get('page', ['1'])[0])
+        except ValueError:
+            return 404, {'detail': 'Not found'}
+        last_page = max(1, (len(records) + PAGE_SIZE - 1) // PAGE_SIZE)
+        if page < 1 or page > last_page:
+            return 404, {'detail': 'Not found'}
+
+        def page_url(number: int) -> str:
+            params = {'search': term, 'page': number} if term else {'page': number}
+            return f"{SOURCE_BASE_URL}/{resource}/?{urlencode(params)}"
+
+        return 200, {
+            'count': len(records),
+            'next': page_url(page + 1) if page < last_page else None,
+            'previous': page_url(page - 1) if page > 1 else None,
+            'results': records[(page - 1) * PAGE_SIZE:page * PAGE_SIZE],
+        }
+
+    def route(self, path: str, query: Dict[str, List[str]]) -> tuple:
+        """Resolve uma requisição GET, retornando (status, corpo)."""
+        segments = [segment for segment in path.split('/') if segment]
+        if len(segments) < 2 or segments[0] != 'api' or segments[1] not in self.datasets:
+            return 404, {'detail': 'Not found'}
+        resource = segments[1]
+        if len(segments) == 2:
+            return self._list(resource, query)
+        if len(segments) == 3 and segments[2].isdigit():
+            record = self._by_id[resource].get(int(segments[2]))
+            return (200, record) if record is not None else (404, {'detail': 'Not found'})
+        return 404, {'detail': 'Not found'}
+
+    def _make_handler(self):
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                standin._count('requisicoes')
+                jitter, roll = standin._draw()
+                if standin.rate_limiter and not standin.rate_limiter.acquire():
+                    standin._count('limitadas')
+                    return self._send(429, {'detail': 'Request was throttled.'}, {'Retry-After': '1'})
+                delay = (standin.latency_ms + jitter) / 1000
+                if delay:
+                    time.sleep(delay)
+                if roll < standin.error_rate:
+                    standin._count('erros_injetados')
+                    return self._send(500, {'detail': 'Injected server error'})
+                parts = urlsplit(self.path)
+                status, body = standin.route(parts.path, parse_qs(parts.query))
+                self._send(status, body)
+
+            def _send(self, status: int, body: Any, headers: Optional[Dict[str, str]] = None):
+                payload = json.dumps(body).replace(SOURCE_BASE_URL, standin.base_url).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main_cli(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Servidor local que emula a SWAPI.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--porta', type=int, default=8001)
+    parser.add_argument('--snapshot', help="Serve os registros deste snapshot em vez de dados gerados")
+    parser.add_argument('--contagem', type=int, nargs=4, metavar=('PEOPLE', 'PLANETS', 'STARSHIPS', 'FILMS'),
+                        help="Quantidade de registros gerados por recurso")
+    parser.add_argument('--latencia-ms', type=float, default=0.0)
+    parser.add_argument('--jitter-ms', type=float, default=0.0)
+    parser.add_argument('--taxa-erro', type=float, default=0.0, help="Fração de respostas HTTP 500 (0 a 1)")
+    parser.add_argument('--max-rps', type=float, help="Limite de requisições por segundo (excedentes: HTTP 429)")
+    parser.add_argument('--semente', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.snapshot:
+        datasets = load_snapshot_datasets(args.snapshot)
+    else:
+        counts = dict(zip(('people', 'planets', 'starships', 'films'), args.contagem)) if args.contagem else None
+        datasets = generate_datasets(counts, seed=args.semente)
+
+    standin = SwapiStandin(datasets, host=args.host, port=args.porta, latency_ms=args.latencia_ms,
+                           jitter_ms=args.jitter_ms, error_rate=args.taxa_erro, max_rps=args.max_rps,
+                           seed=args.semente)
+    print(f"SWAPI local em {standin.base_url} "
+          f"({', '.join(f'{r}: {len(v)}' for r, v in standin.datasets.items())})")
+    standin.serve_forever()
+
+
+if __name__ == '__main__':
+    main_cli()
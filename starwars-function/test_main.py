@@ -1,17 +1,135 @@
 """
 Testes unitários para a Cloud Function Star Wars API Explorer.
 """
+import gzip
+import heapq
+import json
+import random
+import threading
+import time
+import zlib
+from array import array
 import pytest
 from unittest.mock import Mock, patch
 import requests
 from flask import Flask
-from main import fetch_from_swapi, starwars_handler, MAX_RETRIES, RETRY_DELAY, RETRY_BACKOFF
+from werkzeug.datastructures import MultiDict, Headers
+import main
+from swapi_standin import SwapiStandin, generate_datasets
+from main import (
+    fetch_from_swapi, fetch_swapi_url, fetch_all_pages_swapi, build_page_urls, starwars_handler, create_http_session, fan_out,
+    ResponseCache, normalize_cache_key, build_snapshot, load_snapshot, parse_resource_url, SearchIndex,
+    sort_results, sort_results_window, ResourceDataset, VALID_SORT_FIELDS, MAX_RETRIES, RETRY_DELAY, RETRY_BACKOFF,
+    Metrics, CircuitBreaker, RetryBudget, Deadline, parse_deadline, CompactRecords
+)
+
+SWAPI = 'https://swapi.dev/api'
+
+# Dataset sintético reduzido no formato da SWAPI, usado nos testes que trabalham com dados locais
+SAMPLE_DATA = {
+    'people': [
+        {'name': 'Luke Skywalker', 'height': '172', 'mass': '77', 'birth_year': '19BBY',
+         'homeworld': f'{SWAPI}/planets/1/', 'films': [f'{SWAPI}/films/1/', f'{SWAPI}/films/2/'],
+         'starships': [f'{SWAPI}/starships/12/'], 'edited': '2014-12-20T21:17:56.891000Z',
+         'url': f'{SWAPI}/people/1/'},
+        {'name': 'C-3PO', 'height': '167', 'mass': '75', 'birth_year': '112BBY',
+         'homeworld': f'{SWAPI}/planets/1/', 'films': [f'{SWAPI}/films/1/'],
+         'starships': [], 'edited': '2014-12-20T21:17:50.309000Z', 'url': f'{SWAPI}/people/2/'},
+        {'name': 'Darth Vader', 'height': '202', 'mass': '136', 'birth_year': '41.9BBY',
+         'homeworld': f'{SWAPI}/planets/1/', 'films': [f'{SWAPI}/films/1/', f'{SWAPI}/films/2/'],
+         'starships': [f'{SWAPI}/starships/13/'], 'edited': '2014-12-20T21:17:50.313000Z',
+         'url': f'{SWAPI}/people/4/'},
+        {'name': 'Leia Organa', 'height': '150', 'mass': 'unknown', 'birth_year': '19BBY',
+         'homeworld': f'{SWAPI}/planets/2/', 'films': [f'{SWAPI}/films/2/'],
+         'starships': [], 'edited': '2014-12-20T21:17:50.315000Z', 'url': f'{SWAPI}/people/5/'},
+    ],
+    'planets': [
+        {'name': 'Tatooine', 'diameter': '10465', 'population': '200000',
+         'residents': [f'{SWAPI}/people/1/', f'{SWAPI}/people/2/', f'{SWAPI}/people/4/'],
+         'films': [f'{SWAPI}/films/1/'], 'edited': '2014-12-20T20:58:18.411000Z', 'url': f'{SWAPI}/planets/1/'},
+        {'name': 'Alderaan', 'diameter': '12500', 'population': '2000000000',
+         'residents': [f'{SWAPI}/people/5/'], 'films': [f'{SWAPI}/films/1/', f'{SWAPI}/films/2/'],
+         'edited': '2014-12-20T20:58:18.420000Z', 'url': f'{SWAPI}/planets/2/'},
+    ],
+    'starships': [
+        {'name': 'X-wing', 'model': 'T-65 X-wing', 'length': '12.5', 'crew': '1',
+         'pilots': [f'{SWAPI}/people/1/'], 'films': [f'{SWAPI}/films/1/'],
+         'edited': '2014-12-20T21:23:49.886000Z', 'url': f'{SWAPI}/starships/12/'},
+        {'name': 'TIE Advanced x1', 'model': 'Twin Ion Engine Advanced x1', 'length': '9.2', 'crew': '1',
+         'pilots': [f'{SWAPI}/people/4/'], 'films': [f'{SWAPI}/films/1/'],
+         'edited': '2014-12-20T21:23:49.889000Z', 'url': f'{SWAPI}/starships/13/'},
+    ],
+    'films': [
+        {'title': 'A New Hope', 'episode_id': 4, 'release_date': '1977-05-25',
+         'characters': [f'{SWAPI}/people/1/', f'{SWAPI}/people/2/', f'{SWAPI}/people/4/'],
+         'planets': [f'{SWAPI}/planets/1/', f'{SWAPI}/planets/2/'],
+         'starships': [f'{SWAPI}/starships/12/', f'{SWAPI}/starships/13/'],
+         'edited': '2014-12-20T19:49:45.256000Z', 'url': f'{SWAPI}/films/1/'},
+        {'title': 'The Empire Strikes Back', 'episode_id': 5, 'release_date': '1980-05-17',
+         'characters': [f'{SWAPI}/people/1/', f'{SWAPI}/people/4/', f'{SWAPI}/people/5/'],
+         'planets': [f'{SWAPI}/planets/2/'], 'starships': [],
+         'edited': '2014-12-15T13:07:53.386000Z', 'url': f'{SWAPI}/films/2/'},
+    ],
+}
+
+
+def fake_fetch_all_pages(resource, params=None):
+    """Substituto de fetch_all_pages_swapi que serve SAMPLE_DATA."""
+    records = [dict(record) for record in SAMPLE_DATA[resource]]
+    return records, len(records)
+
+
+def make_request(args=None, path='/explorar', headers=None, method='GET'):
+    """Cria um mock de request Flask com query string, path e headers."""
+    request = Mock(method=method, path=path)
+    request.args = MultiDict(args or {})
+    request.headers = Headers(headers or {})
+    return request
+
+
+def wait_for_shared_fetches(timeout=2.0):
+    """Aguarda as consultas compartilhadas que seguem em segundo plano após o prazo de quem as iniciou."""
+    expires_at = time.monotonic() + timeout
+    while main.upstream_flight._calls and time.monotonic() < expires_at:
+        time.sleep(0.01)
+
+
+@pytest.fixture(autouse=True)
+def clear_response_cache():
+    """Garante que cada teste comece com o cache de respostas da SWAPI vazio."""
+    main.response_cache.clear()
+    main.upstream_breaker.reset()
+    main.retry_budget.reset()
+    yield
+    main.response_cache.clear()
+    main.reset_snapshot()
+    main.clear_local_datasets()
+    main.rendered_responses.clear()
+    main.metrics.clear()
+
+
+@pytest.fixture(autouse=True)
+def app_context():
+    """Executa cada teste dentro do contexto de uma aplicação Flask, exigido por jsonify."""
+    with Flask(__name__).app_context():
+        yield
+
+
+@pytest.fixture
+def snapshot_path(tmp_path):
+    """Gera um snapshot a partir de SAMPLE_DATA e ativa o modo snapshot."""
+    path = str(tmp_path / 'snapshot.json.gz')
+    with patch('main.fetch_all_pages_swapi', side_effect=fake_fetch_all_pages):
+        build_snapshot(path)
+    with patch('main.SNAPSHOT_PATH', path):
+        main.reset_snapshot()
+        yield path
 
 
 class TestFetchFromSwapi:
     """Testes para a função fetch_from_swapi."""
     
-    @patch('main.requests.get')
+    @patch('main.http_session.get')
     def test_success_first_attempt(self, mock_get):
         """Testa sucesso na primeira tentativa."""
         mock_response = Mock()
@@ -25,7 +143,7 @@ class TestFetchFromSwapi:
         assert mock_get.call_count == 1
     
     @patch('main.time.sleep')
-    @patch('main.requests.get')
+    @patch('main.http_session.get')
     def test_retry_on_timeout(self, mock_get, mock_sleep):
         """Testa retry em caso de timeout."""
         # Primeira tentativa: timeout
@@ -40,11 +158,11 @@ class TestFetchFromSwapi:
         assert result == {"results": []}
         assert mock_get.call_count == 2
         assert mock_sleep.call_count == 1
-        # Verifica que o tempo de espera é calculado corretamente
-        assert mock_sleep.call_args[0][0] == RETRY_DELAY * (RETRY_BACKOFF ** 0)
+        # Verifica que o tempo de espera respeita o backoff com jitter (entre 0 e o atraso base)
+        assert 0 <= mock_sleep.call_args[0][0] <= RETRY_DELAY * (RETRY_BACKOFF ** 0)
     
     @patch('main.time.sleep')
-    @patch('main.requests.get')
+    @patch('main.http_session.get')
     def test_retry_on_connection_error(self, mock_get, mock_sleep):
         """Testa retry em caso de erro de conexão."""
         mock_get.side_effect = [
@@ -59,7 +177,7 @@ class TestFetchFromSwapi:
         assert mock_sleep.call_count == 1
     
     @patch('main.time.sleep')
-    @patch('main.requests.get')
+    @patch('main.http_session.get')
     def test_retry_on_http_5xx(self, mock_get, mock_sleep):
         """Testa retry em caso de erro HTTP 5xx."""
         mock_response_500 = Mock()
@@ -77,7 +195,7 @@ class TestFetchFromSwapi:
         assert mock_get.call_count == 2
         assert mock_sleep.call_count == 1
     
-    @patch('main.requests.get')
+    @patch('main.http_session.get')
     def test_no_retry_on_http_4xx(self, mock_get):
         """Testa que não há retry em caso de erro HTTP 4xx."""
         mock_response_404 = Mock()
@@ -91,7 +209,7 @@ class TestFetchFromSwapi:
         assert mock_get.call_count == 1
     
     @patch('main.time.sleep')
-    @patch('main.requests.get')
+    @patch('main.http_session.get')
     def test_failure_after_all_retries(self, mock_get, mock_sleep):
         """Testa falha após todas as tentativas."""
         mock_get.side_effect = requests.exceptions.Timeout()
@@ -102,7 +220,7 @@ class TestFetchFromSwapi:
         assert mock_get.call_count == MAX_RETRIES
         assert mock_sleep.call_count == MAX_RETRIES - 1
     
-    @patch('main.requests.get')
+    @patch('main.http_session.get')
     def test_with_search_params(self, mock_get):
         """Testa busca com parâmetros de pesquisa."""
         mock_response = Mock()
@@ -118,136 +236,395 @@ class TestFetchFromSwapi:
         assert call_args[1]['params'] == {"search": "Luke"}
 
 
+class TestHttpSession:
+    """Testes para a sessão HTTP compartilhada com a SWAPI."""
+
+    def test_pool_configuration(self):
+        """Testa que o adapter usa os limites de pool informados e não faz retries próprios."""
+        session = create_http_session(pool_connections=2, pool_maxsize=7, pool_block=True)
+        adapter = session.get_adapter('https://swapi.dev/api/people/')
+
+        assert adapter._pool_connections == 2
+        assert adapter._pool_maxsize == 7
+        assert adapter._pool_block is True
+        assert adapter.max_retries.total == 0
+
+    @patch('main.http_session.get')
+    def test_fetch_uses_shared_session(self, mock_get):
+        """Testa que as consultas usam a sessão compartilhada (keep-alive)."""
+        mock_get.return_value = Mock(json=Mock(return_value={"results": []}), raise_for_status=Mock())
+
+        fetch_from_swapi("films")
+        fetch_from_swapi("planets")
+
+        assert mock_get.call_count == 2
+
+
+class TestResponseCache:
+    """Testes para o cache em memória das respostas da SWAPI."""
+
+    def test_normalize_cache_key(self):
+        """Testa que URL e parâmetros equivalentes geram a mesma chave."""
+        assert normalize_cache_key('https://SWAPI.dev/api/people?page=2', {'search': 'a'}) == \
+            normalize_cache_key('https://swapi.dev/api/people/?search=a&page=2')
+
+    def test_lru_eviction_by_entries(self):
+        """Testa a remoção da entrada menos usada ao exceder o número de entradas."""
+        cache = ResponseCache(ttl=60, stale_ttl=0, max_entries=2, max_bytes=10_000)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        assert cache.get('b') == (None, 'miss')
+        assert cache.get('a') == (1, 'hit')
+        assert cache.stats()['evictions'] == 1
+
+    def test_eviction_by_bytes(self):
+        """Testa o limite de tamanho total em bytes."""
+        cache = ResponseCache(ttl=60, stale_ttl=0, max_entries=100, max_bytes=10)
+        cache.set('a', 'x', size=6)
+        cache.set('b', 'y', size=6)
+
+        assert cache.get('a') == (None, 'miss')
+        assert cache.get('b') == ('y', 'hit')
+
+    def test_ttl_and_stale_window(self):
+        """Testa a transição fresco -> stale -> expirado."""
+        cache = ResponseCache(ttl=10, stale_ttl=10, max_entries=10, max_bytes=10_000)
+        with patch('main.time.monotonic', return_value=100.0):
+            cache.set('a', 1)
+        with patch('main.time.monotonic', return_value=105.0):
+            assert cache.get('a') == (1, 'hit')
+        with patch('main.time.monotonic', return_value=115.0):
+            assert cache.get('a') == (1, 'stale')
+        with patch('main.time.monotonic', return_value=125.0):
+            assert cache.get('a') == (None, 'miss')
+
+    @patch('main.http_session.get')
+    def test_repeated_fetch_served_from_cache(self, mock_get):
+        """Testa que consultas repetidas não geram novo acesso à rede."""
+        mock_get.return_value = Mock(json=Mock(return_value={"results": [1]}), raise_for_status=Mock())
+
+        assert fetch_from_swapi("people", {"search": "Luke"}) == {"results": [1]}
+        assert fetch_from_swapi("people", {"search": "Luke"}) == {"results": [1]}
+
+        assert mock_get.call_count == 1
+        assert main.response_cache.stats()['hits'] == 1
+
+    @patch('main.http_session.get')
+    def test_failures_not_cached(self, mock_get):
+        """Testa que falhas não são armazenadas no cache."""
+        mock_response_404 = Mock(status_code=404)
+        mock_get.side_effect = requests.exceptions.HTTPError(response=mock_response_404)
+
+        assert fetch_from_swapi("people") is None
+        assert fetch_from_swapi("people") is None
+        assert mock_get.call_count == 2
+
+    def test_stale_entry_revalidated_in_background(self):
+        """Testa que entradas stale são servidas e revalidadas em segundo plano."""
+        main.response_cache.set(normalize_cache_key('https://swapi.dev/api/films/1/'), {'title': 'old'})
+        loader = Mock(return_value={'title': 'new'})
+
+        with patch.object(main.response_cache, 'ttl', -1):
+            assert main.cached_fetch('https://swapi.dev/api/films/1/', None, loader) == {'title': 'old'}
+            for _ in range(100):
+                if not main._revalidating_keys:
+                    break
+                time.sleep(0.01)
+
+        loader.assert_called_once()
+        assert main.response_cache.get(normalize_cache_key('https://swapi.dev/api/films/1/'))[0] == {'title': 'new'}
+
+
+class TestSortResults:
+    """Testes para a ordenação de resultados."""
+
+    ITEMS = [
+        {'name': 'a', 'population': '1,000'},
+        {'name': 'b', 'population': 'unknown'},
+        {'name': 'c', 'population': '200'},
+        {'name': 'd', 'population': 'muitos'},
+        {'name': 'e', 'population': '3.5'},
+        {'name': 'f'},
+        {'name': 'g', 'population': '200'},
+    ]
+
+    def test_ascending_unknown_last(self):
+        """Testa ordem crescente numérica com desconhecidos após os números."""
+        names = [r['name'] for r in sort_results(self.ITEMS, 'population', 'asc', 'planets')]
+        assert names == ['e', 'c', 'g', 'a', 'b', 'f', 'd']
+
+    def test_descending_unknown_last(self):
+        """Testa ordem decrescente com desconhecidos no fim e empates estáveis."""
+        names = [r['name'] for r in sort_results(self.ITEMS, 'population', 'desc', 'planets')]
+        assert names == ['d', 'a', 'c', 'g', 'e', 'b', 'f']
+
+    def test_invalid_field_keeps_order(self):
+        """Testa que campo inválido mantém a ordem original."""
+        assert sort_results(self.ITEMS, 'residents', 'asc', 'planets') == self.ITEMS
+
+    def test_dataset_permutation_matches_sort_results(self):
+        """Testa que as permutações em cache do dataset reproduzem sort_results."""
+        rng = random.Random(42)
+        values = ['unknown', 'n/a', '', '10', '2', '1,500', '3.25', 'abc', 'Zeta', '7', '7']
+        records = [
+            {field: rng.choice(values) for field in VALID_SORT_FIELDS['starships']}
+            | {'url': f'{SWAPI}/starships/{i}/'}
+            for i in range(1, 200)
+        ]
+        dataset = ResourceDataset('starships', records)
+        subset = sorted(rng.sample(range(len(records)), 50))
+
+        for field in VALID_SORT_FIELDS['starships']:
+            for order in ('asc', 'desc'):
+                expected = sort_results(records, field, order, 'starships')
+                assert dataset.materialize(dataset.sort_positions(None, field, order)) == expected
+                expected_subset = sort_results([records[p] for p in subset], field, order, 'starships')
+                assert dataset.materialize(dataset.sort_positions(subset, field, order)) == expected_subset
+
+        assert dataset.sorted_positions('crew', 'asc') is dataset.sorted_positions('crew', 'asc')
+
+    @patch('main.TOPK_MAX_FRACTION', 1.0)
+    def test_window_matches_full_sort(self):
+        """Testa que a seleção parcial por heap produz o mesmo prefixo da ordenação completa."""
+        rng = random.Random(7)
+        values = ['unknown', '', '10', '2', '1,500', '3.25', 'abc', '7', '7', '7']
+        records = [{'name': str(i), 'population': rng.choice(values)} for i in range(300)]
+
+        for order in ('asc', 'desc'):
+            expected = sort_results(records, 'population', order, 'planets')
+            for window in (1, 5, 10, 37, 100, 299):
+                assert sort_results_window(records, 'population', order, 'planets', window) == expected[:window]
+
+    def test_default_threshold_covers_first_page_of_swapi_list(self):
+        """Testa que a primeira página padrão (10) de uma lista do tamanho da SWAPI (82) usa o heap."""
+        records = [{'name': str(i), 'population': str(i * 37 % 82)} for i in range(82)]
+
+        with patch('main.heapq.nlargest', wraps=heapq.nlargest) as heap_spy:
+            page = sort_results_window(records, 'population', 'desc', 'planets', 10)
+
+        assert heap_spy.call_count == 1
+        assert page == sort_results(records, 'population', 'desc', 'planets')[:10]
+
+    @patch('main.fetch_all_pages_swapi')
+    def test_explorar_sorted_page_uses_window(self, mock_fetch):
+        """Testa que /explorar ordena só até o fim da página pedida, mantendo totais e ordem."""
+        records = [{'name': f'p{i}', 'population': str(i * 7 % 50)} for i in range(50)]
+        mock_fetch.return_value = (records, len(records))
+        mock_request = make_request(
+            {'tipo': 'planets', 'ordenar_por': 'population', 'ordem': 'desc', 'pagina': '2', 'limite': '5'})
+
+        with patch('main.sort_results_window', wraps=sort_results_window) as window_spy:
+            response, status_code, headers = starwars_handler(mock_request)
+
+        data = response.get_json()
+        assert window_spy.call_args[0][4] == 10
+        assert data['total_paginas'] == 10
+        assert data['resultados'] == sort_results(records, 'population', 'desc', 'planets')[5:10]
+
+
+class TestSingleFlight:
+    """Testes para a coalescência de consultas idênticas à SWAPI."""
+
+    def run_concurrently(self, func, count):
+        """Executa func em 'count' threads liberadas ao mesmo tempo e retorna resultados/erros."""
+        barrier = threading.Barrier(count)
+        outcomes = [None] * count
+
+        def worker(index):
+            barrier.wait()
+            try:
+                outcomes[index] = func()
+            except Exception as e:
+                outcomes[index] = e
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return outcomes
+
+    def test_concurrent_callers_share_one_fetch(self):
+        """Testa que chamadas simultâneas para a mesma URL geram uma única consulta."""
+        def slow_loader():
+            time.sleep(0.1)
+            return {'title': 'A New Hope'}
+
+        loader = Mock(side_effect=slow_loader)
+        outcomes = self.run_concurrently(lambda: main.cached_fetch(f'{SWAPI}/films/1/', None, loader), 8)
+
+        assert outcomes == [{'title': 'A New Hope'}] * 8
+        assert loader.call_count == 1
+
+    def test_error_shared_with_waiters(self):
+        """Testa que a exceção da consulta em andamento é propagada a quem aguardava."""
+        flight = main.SingleFlight()
+
+        def failing():
+            time.sleep(0.1)
+            raise RuntimeError("upstream indisponível")
+
+        outcomes = self.run_concurrently(lambda: flight.do('k', failing), 4)
+
+        assert all(isinstance(outcome, RuntimeError) for outcome in outcomes)
+        assert flight.executions == 1
+        assert flight.shared == 3
+
+
+class TestFetchAllPagesSwapi:
+    """Testes para a busca paralela de páginas em fetch_all_pages_swapi."""
+
+    @staticmethod
+    def make_page(page, total=25, page_size=10, search=None):
+        """Gera uma página sintética no formato da SWAPI."""
+        start = (page - 1) * page_size
+        items = [{'name': f'item {i}'} for i in range(start, min(start + page_size, total))]
+        has_next = start + page_size < total
+        query = f'search={search}&' if search else ''
+        return {
+            'count': total,
+            'next': f'https://swapi.dev/api/people/?{query}page={page + 1}' if has_next else None,
+            'results': items
+        }
+
+    def test_build_page_urls(self):
+        """Testa o cálculo das URLs restantes preservando os demais parâmetros."""
+        urls = build_page_urls('https://swapi.dev/api/people/?search=a&page=2', 10, 82)
+
+        assert len(urls) == 8
+        assert urls[0] == 'https://swapi.dev/api/people/?search=a&page=2'
+        assert urls[-1] == 'https://swapi.dev/api/people/?search=a&page=9'
+
+    @patch('main.fetch_swapi_url')
+    @patch('main.fetch_from_swapi')
+    def test_pages_merged_in_order(self, mock_first, mock_url):
+        """Testa que as páginas buscadas em paralelo são agregadas na ordem original."""
+        mock_first.return_value = self.make_page(1)
+        mock_url.side_effect = lambda url: self.make_page(int(url.rsplit('=', 1)[1]))
+
+        results, total = fetch_all_pages_swapi('people')
+
+        assert total == 25
+        assert [r['name'] for r in results] == [f'item {i}' for i in range(25)]
+        assert mock_url.call_count == 2
+
+    @patch('main.fetch_swapi_url')
+    @patch('main.fetch_from_swapi')
+    def test_partial_failure_keeps_previous_pages(self, mock_first, mock_url):
+        """Testa que uma página com falha interrompe a agregação como no fluxo sequencial."""
+        mock_first.return_value = self.make_page(1, total=35)
+
+        def fetch_page(url):
+            page = int(url.rsplit('=', 1)[1])
+            return None if page == 3 else self.make_page(page, total=35)
+
+        mock_url.side_effect = fetch_page
+
+        results, total = fetch_all_pages_swapi('people')
+
+        assert total == 35
+        assert len(results) == 20
+
+
 class TestStarwarsHandler:
     """Testes para a função starwars_handler."""
     
-    @pytest.fixture
-    def app(self):
-        """Cria uma aplicação Flask para contexto de teste."""
-        app = Flask(__name__)
-        return app
-    
-    def create_mock_request(self, method='GET', args=None):
-        """Cria um mock de request Flask."""
-        mock_request = Mock()
-        mock_request.method = method
-        mock_request.path = '/explorar'
-        
-        # Criar um mock mais robusto para args
-        mock_args = Mock()
-        if args:
-            def get_arg(key, default=None):
-                return args.get(key, default)
-            mock_args.get = get_arg
-        else:
-            def get_arg(key, default=None):
-                return default
-            mock_args.get = get_arg
-        
-        mock_request.args = mock_args
-        return mock_request
-    
-    def test_options_request(self, app):
+    def test_options_request(self):
         """Testa requisição OPTIONS (CORS preflight)."""
-        mock_request = self.create_mock_request(method='OPTIONS')
+        mock_request = make_request(method='OPTIONS')
         
-        with app.app_context():
-            response, status_code, headers = starwars_handler(mock_request)
+        response, status_code, headers = starwars_handler(mock_request)
         
         assert status_code == 204
         assert headers['Access-Control-Allow-Origin'] == '*'
-        assert headers['Access-Control-Allow-Methods'] == 'GET'
+        assert headers['Access-Control-Allow-Methods'] == 'GET, POST'
     
-    def test_missing_tipo_parameter(self, app):
+    def test_missing_tipo_parameter(self):
         """Testa validação quando parâmetro 'tipo' está ausente."""
-        mock_request = self.create_mock_request(args={})
+        mock_request = make_request(args={})
         
-        with app.app_context():
-            response, status_code, headers = starwars_handler(mock_request)
+        response, status_code, headers = starwars_handler(mock_request)
         
         assert status_code == 400
         data = response.get_json()
         assert 'erro' in data
         assert "obrigatório" in data['erro'].lower()
     
-    def test_invalid_tipo_parameter(self, app):
+    def test_invalid_tipo_parameter(self):
         """Testa validação quando parâmetro 'tipo' é inválido."""
-        mock_request = self.create_mock_request(args={'tipo': 'invalid'})
+        mock_request = make_request(args={'tipo': 'invalid'})
         
-        with app.app_context():
-            response, status_code, headers = starwars_handler(mock_request)
+        response, status_code, headers = starwars_handler(mock_request)
         
         assert status_code == 400
         data = response.get_json()
         assert 'erro' in data
         assert 'tipos_disponiveis' in data
     
-    def test_tipo_case_insensitive(self, app):
+    def test_tipo_case_insensitive(self):
         """Testa que o parâmetro 'tipo' é case-insensitive."""
-        mock_request = self.create_mock_request(args={'tipo': 'PEOPLE'})
+        mock_request = make_request(args={'tipo': 'PEOPLE'})
         
         with patch('main.fetch_all_pages_swapi') as mock_fetch:
             mock_fetch.return_value = ([{'name': 'Luke'}], 1)
             
-            with app.app_context():
-                response, status_code, headers = starwars_handler(mock_request)
+            response, status_code, headers = starwars_handler(mock_request)
             
             assert status_code == 200
             mock_fetch.assert_called_once_with('people', {})
     
-    def test_invalid_termo_characters(self, app):
+    def test_invalid_termo_characters(self):
         """Testa validação de caracteres inválidos no parâmetro 'termo'."""
-        mock_request = self.create_mock_request(args={
+        mock_request = make_request(args={
             'tipo': 'people',
             'termo': 'Luke<script>alert("xss")</script>'
         })
         
-        with app.app_context():
-            response, status_code, headers = starwars_handler(mock_request)
+        response, status_code, headers = starwars_handler(mock_request)
         
         assert status_code == 400
         data = response.get_json()
         assert 'erro' in data
         assert 'caracteres inválidos' in data['erro'].lower()
     
-    def test_termo_too_long(self, app):
+    def test_termo_too_long(self):
         """Testa validação de comprimento máximo do parâmetro 'termo'."""
         long_term = 'a' * 101  # 101 caracteres
-        mock_request = self.create_mock_request(args={
+        mock_request = make_request(args={
             'tipo': 'people',
             'termo': long_term
         })
         
-        with app.app_context():
-            response, status_code, headers = starwars_handler(mock_request)
+        response, status_code, headers = starwars_handler(mock_request)
         
         assert status_code == 400
         data = response.get_json()
         assert 'erro' in data
         assert 'limite' in data['erro'].lower()
     
-    def test_termo_empty_string(self, app):
+    def test_termo_empty_string(self):
         """Testa validação quando 'termo' é string vazia."""
-        mock_request = self.create_mock_request(args={
+        mock_request = make_request(args={
             'tipo': 'people',
             'termo': '   '  # apenas espaços
         })
         
-        with app.app_context():
-            response, status_code, headers = starwars_handler(mock_request)
+        response, status_code, headers = starwars_handler(mock_request)
         
         assert status_code == 400
         data = response.get_json()
         assert 'erro' in data
     
     @patch('main.fetch_all_pages_swapi')
-    def test_success_without_filter(self, mock_fetch, app):
+    def test_success_without_filter(self, mock_fetch):
         """Testa sucesso sem filtro de busca."""
-        mock_request = self.create_mock_request(args={'tipo': 'people'})
+        mock_request = make_request(args={'tipo': 'people'})
         mock_fetch.return_value = ([{'name': 'Luke Skywalker'}], 1)
         
-        with app.app_context():
-            response, status_code, headers = starwars_handler(mock_request)
+        response, status_code, headers = starwars_handler(mock_request)
         
         assert status_code == 200
         data = response.get_json()
@@ -257,16 +634,15 @@ class TestStarwarsHandler:
         mock_fetch.assert_called_once_with('people', {})
     
     @patch('main.fetch_all_pages_swapi')
-    def test_success_with_filter(self, mock_fetch, app):
+    def test_success_with_filter(self, mock_fetch):
         """Testa sucesso com filtro de busca."""
-        mock_request = self.create_mock_request(args={
+        mock_request = make_request(args={
             'tipo': 'people',
             'termo': 'Luke'
         })
         mock_fetch.return_value = ([{'name': 'Luke Skywalker'}], 1)
         
-        with app.app_context():
-            response, status_code, headers = starwars_handler(mock_request)
+        response, status_code, headers = starwars_handler(mock_request)
         
         assert status_code == 200
         data = response.get_json()
@@ -275,53 +651,50 @@ class TestStarwarsHandler:
         mock_fetch.assert_called_once_with('people', {'search': 'Luke'})
     
     @patch('main.fetch_all_pages_swapi')
-    def test_no_results_found(self, mock_fetch, app):
+    def test_no_results_found(self, mock_fetch):
         """Testa resposta quando não há resultados."""
-        mock_request = self.create_mock_request(args={
+        mock_request = make_request(args={
             'tipo': 'people',
             'termo': 'NonExistent'
         })
         mock_fetch.return_value = ([], 0)
         
-        with app.app_context():
-            response, status_code, headers = starwars_handler(mock_request)
+        response, status_code, headers = starwars_handler(mock_request)
         
         assert status_code == 404
         data = response.get_json()
         assert 'mensagem' in data
     
     @patch('main.fetch_all_pages_swapi')
-    def test_swapi_error(self, mock_fetch, app):
+    def test_swapi_error(self, mock_fetch):
         """Testa tratamento de erro da SWAPI."""
-        mock_request = self.create_mock_request(args={'tipo': 'people'})
+        mock_request = make_request(args={'tipo': 'people'})
         mock_fetch.return_value = None
         
-        with app.app_context():
-            response, status_code, headers = starwars_handler(mock_request)
+        response, status_code, headers = starwars_handler(mock_request)
         
         assert status_code == 502
         data = response.get_json()
         assert 'erro' in data
     
     @patch('main.fetch_all_pages_swapi')
-    def test_all_resource_types(self, mock_fetch, app):
+    def test_all_resource_types(self, mock_fetch):
         """Testa que todos os tipos de recursos são aceitos."""
         mock_fetch.return_value = ([], 0)
         
         resource_types = ['people', 'planets', 'starships', 'films']
         
         for resource_type in resource_types:
-            mock_request = self.create_mock_request(args={'tipo': resource_type})
-            with app.app_context():
-                response, status_code, headers = starwars_handler(mock_request)
+            mock_request = make_request(args={'tipo': resource_type})
+            response, status_code, headers = starwars_handler(mock_request)
             
             # Deve retornar 404 (sem resultados) mas não erro de validação
             assert status_code in [200, 404]
             mock_fetch.assert_called_with(resource_type, {})
     
-    def test_termo_stripped(self, app):
+    def test_termo_stripped(self):
         """Testa que espaços em branco são removidos do 'termo'."""
-        mock_request = self.create_mock_request(args={
+        mock_request = make_request(args={
             'tipo': 'people',
             'termo': '  Luke  '
         })
@@ -329,8 +702,1436 @@ class TestStarwarsHandler:
         with patch('main.fetch_all_pages_swapi') as mock_fetch:
             mock_fetch.return_value = ([], 0)
             
-            with app.app_context():
-                starwars_handler(mock_request)
+            starwars_handler(mock_request)
             
             # Verifica que o termo foi passado sem espaços
             mock_fetch.assert_called_once_with('people', {'search': 'Luke'})
+
+
+class TestFanOut:
+    """Testes para o motor de fan-out concorrente."""
+
+    def test_preserves_order(self):
+        """Testa que os resultados seguem a ordem de entrada mesmo com tempos diferentes."""
+        def slow_double(value):
+            time.sleep(0.01 * (5 - value))
+            return value * 2
+
+        assert fan_out(slow_double, [1, 2, 3, 4], max_workers=4) == [2, 4, 6, 8]
+
+    def test_failures_become_none(self):
+        """Testa que exceções viram None na posição do item."""
+        def fail_on_two(value):
+            if value == 2:
+                raise ValueError("falha")
+            return value
+
+        assert fan_out(fail_on_two, [1, 2, 3], max_workers=2) == [1, None, 3]
+
+    def test_time_budget(self):
+        """Testa que itens acima do orçamento de tempo são descartados sem bloquear."""
+        def maybe_slow(value):
+            if value == 'lento':
+                time.sleep(0.5)
+            return value
+
+        start = time.monotonic()
+        results = fan_out(maybe_slow, ['rapido', 'lento'], max_workers=2, time_budget=0.1)
+
+        assert results == ['rapido', None]
+        assert time.monotonic() - start < 0.4
+
+
+class TestRelationHandlers:
+    """Testes para os endpoints de consultas correlacionadas."""
+
+    @patch('main.fetch_resource_by_url')
+    def test_personagens_filme_order_and_failures(self, mock_fetch):
+        """Testa ordem preservada e reporte de falhas no fan-out de personagens."""
+        film = {
+            'title': 'A New Hope', 'episode_id': 4, 'release_date': '1977-05-25',
+            'characters': [f'https://swapi.dev/api/people/{i}/' for i in range(1, 6)]
+        }
+
+        def fetch(url):
+            if url.endswith('/films/1/'):
+                return film
+            person_id = int(url.rstrip('/').rsplit('/', 1)[1])
+            if person_id == 3:
+                return None
+            time.sleep(0.005 * (6 - person_id))
+            return {'name': f'person {person_id}'}
+
+        mock_fetch.side_effect = fetch
+        mock_request = make_request({'filme_id': '1', 'concorrencia': '3'}, path='/personagens-filme')
+
+        response, status_code, headers = starwars_handler(mock_request)
+
+        data = response.get_json()
+        assert status_code == 200
+        assert [p['name'] for p in data['personagens']] == ['person 1', 'person 2', 'person 4', 'person 5']
+        assert data['total_personagens'] == 4
+        assert data['falhas'] == ['https://swapi.dev/api/people/3/']
+
+    def test_invalid_concurrency(self):
+        """Testa validação do parâmetro 'concorrencia'."""
+        mock_request = make_request({'filme_id': '1', 'concorrencia': '0'}, path='/planetas-filme')
+
+        response, status_code, headers = starwars_handler(mock_request)
+
+        assert status_code == 400
+        assert 'concorrencia' in response.get_json()['erro']
+
+
+class TestSnapshot:
+    """Testes para o modo snapshot (dataset local sem rede)."""
+
+    def test_parse_resource_url(self):
+        """Testa a extração de tipo e ID de URLs da SWAPI."""
+        assert parse_resource_url('https://swapi.dev/api/people/1/') == ('people', 1)
+        assert parse_resource_url('https://swapi.dev/api/people/') is None
+
+    def test_roundtrip(self, snapshot_path):
+        """Testa que o snapshot gravado é carregado com todos os registros."""
+        snapshot = load_snapshot(snapshot_path)
+
+        assert snapshot.header['recursos'] == {resource: len(records) for resource, records in SAMPLE_DATA.items()}
+        assert snapshot.get_by_url(f'{SWAPI}/people/4/')['name'] == 'Darth Vader'
+        starships = snapshot.datasets['starships']
+        assert [r['name'] for r in starships.materialize(starships.search('twin'))] == ['TIE Advanced x1']
+
+    def test_rejects_tampered_body(self, snapshot_path, tmp_path):
+        """Testa que um corpo alterado é rejeitado pela validação do hash."""
+        with gzip.open(snapshot_path, 'rb') as f:
+            header, body = f.read().split(b'\n', 1)
+        tampered = str(tmp_path / 'tampered.json.gz')
+        with gzip.open(tampered, 'wb') as f:
+            f.write(header + b'\n' + body.replace(b'Luke', b'Lucas'))
+
+        with pytest.raises(ValueError):
+            load_snapshot(tampered)
+
+    def test_build_fails_on_incomplete_download(self, tmp_path):
+        """Testa que um download parcial não gera snapshot."""
+        with patch('main.fetch_all_pages_swapi', return_value=([{'name': 'Luke'}], 82)):
+            with pytest.raises(RuntimeError):
+                build_snapshot(str(tmp_path / 'parcial.json.gz'))
+
+    @patch('main.http_session.get')
+    def test_explorar_served_from_snapshot(self, mock_get, snapshot_path):
+        """Testa que /explorar responde a partir do snapshot, sem rede."""
+        mock_request = make_request({'tipo': 'people', 'termo': 'sky'})
+
+        response, status_code, headers = starwars_handler(mock_request)
+
+        data = response.get_json()
+        assert status_code == 200
+        assert [r['name'] for r in data['resultados']] == ['Luke Skywalker']
+        mock_get.assert_not_called()
+
+    @patch('main.http_session.get')
+    def test_relation_served_from_snapshot(self, mock_get, snapshot_path):
+        """Testa que as consultas correlacionadas respondem a partir do snapshot, sem rede."""
+        mock_request = make_request({'filme_id': '1'}, path='/planetas-filme')
+
+        response, status_code, headers = starwars_handler(mock_request)
+
+        data = response.get_json()
+        assert status_code == 200
+        assert [p['name'] for p in data['planetas']] == ['Tatooine', 'Alderaan']
+        mock_get.assert_not_called()
+
+
+class TestSearchIndex:
+    """Testes para o índice local de busca por termo."""
+
+    def test_substring_semantics(self):
+        """Testa busca por substring, sem diferenciar maiúsculas, como a SWAPI."""
+        index = SearchIndex(SAMPLE_DATA['people'], ('name',))
+
+        assert index.search('SKY') == [0]
+        assert index.search('a') == [0, 2, 3]
+        assert index.search('th v') == [2]
+        assert index.search('3p') == [1]
+        assert index.search('yoda') == []
+
+    def test_multiple_fields(self):
+        """Testa busca em mais de um campo (name e model das naves) sem duplicatas."""
+        index = SearchIndex(SAMPLE_DATA['starships'], ('name', 'model'))
+
+        assert index.search('x') == [0, 1]
+        assert index.search('ion engine') == [1]
+
+    def test_matches_naive_scan(self):
+        """Testa o índice contra a busca linear em valores repetidos, vazios e ausentes."""
+        rng = random.Random(7)
+        records = [{'name': ''.join(rng.choice('abA ') for _ in range(rng.randint(0, 6))),
+                    'model': rng.choice(['', None, 'ab', 'Ba'])} for _ in range(60)]
+        index = SearchIndex(records, ('name', 'model'))
+
+        for term in ('', 'a', 'ab', 'ba a', 'bab', 'A B', 'zz'):
+            expected = [position for position, record in enumerate(records)
+                        if any(term.lower() in str(record[field] or '').lower() for field in ('name', 'model'))
+                        and any(record[field] for field in ('name', 'model'))]
+            assert index.search(term) == expected
+
+    @patch('main.fetch_all_pages_swapi')
+    def test_termo_resolved_locally_after_full_listing(self, mock_fetch):
+        """Testa que, com a lista completa em memória, 'termo' não vai à SWAPI."""
+        main.register_local_dataset('people', SAMPLE_DATA['people'])
+
+        response, status_code, headers = starwars_handler(
+            make_request({'tipo': 'people', 'termo': 'vader'}))
+
+        data = response.get_json()
+        assert status_code == 200
+        assert data['total_encontrado'] == 1
+        assert data['resultados'][0]['name'] == 'Darth Vader'
+        mock_fetch.assert_not_called()
+
+    @patch('main.fetch_from_swapi')
+    def test_full_listing_registers_dataset(self, mock_first):
+        """Testa que uma listagem completa sem filtro alimenta o dataset local."""
+        mock_first.return_value = {'count': 2, 'next': None, 'results': SAMPLE_DATA['planets']}
+
+        fetch_all_pages_swapi('planets')
+
+        dataset = main.get_local_dataset('planets')
+        assert dataset is not None
+        assert dataset.search('alder') == [1]
+
+
+class TestRelationGraph:
+    """Testes para o grafo de relações em memória."""
+
+    @pytest.fixture
+    def graph(self):
+        """Grafo construído a partir de SAMPLE_DATA."""
+        datasets = {resource: ResourceDataset(resource, records) for resource, records in SAMPLE_DATA.items()}
+        return main.RelationGraph(datasets)
+
+    def test_forward_relations_keep_swapi_order(self, graph):
+        """Testa as adjacências diretas na ordem das URLs da SWAPI."""
+        assert graph.neighbors('films', 1, 'characters') == (1, 2, 4)
+        assert graph.neighbors('films', 2, 'planets') == (2,)
+        assert graph.neighbors('people', 4, 'starships') == (13,)
+
+    def test_reverse_relations(self, graph):
+        """Testa as adjacências inversas (filmes de um planeta, pilotos de uma nave...)."""
+        assert graph.neighbors('planets', 2, 'films') == (1, 2)
+        assert graph.neighbors('people', 5, 'films') == (2,)
+        assert graph.neighbors('starships', 12, 'pilots') == (1,)
+        assert graph.neighbors('planets', 99, 'films') == ()
+
+    @patch('main.fetch_resource_by_url')
+    def test_handler_answers_from_memory(self, mock_fetch):
+        """Testa que, com os datasets locais disponíveis, o endpoint não faz buscas por item."""
+        for resource, records in SAMPLE_DATA.items():
+            main.register_local_dataset(resource, records)
+        mock_request = make_request({'filme_id': '2'}, path='/personagens-filme')
+
+        response, status_code, headers = starwars_handler(mock_request)
+
+        data = response.get_json()
+        assert status_code == 200
+        assert [p['name'] for p in data['personagens']] == ['Luke Skywalker', 'Darth Vader', 'Leia Organa']
+        assert data['falhas'] == []
+        mock_fetch.assert_not_called()
+
+    @patch('main.fetch_resource_by_url')
+    def test_handler_unknown_id_returns_404(self, mock_fetch):
+        """Testa 404 para ID inexistente resolvido em memória."""
+        for resource, records in SAMPLE_DATA.items():
+            main.register_local_dataset(resource, records)
+        mock_request = make_request({'personagem_id': '99'}, path='/naves-personagem')
+
+        response, status_code, headers = starwars_handler(mock_request)
+
+        assert status_code == 404
+        mock_fetch.assert_not_called()
+
+
+class TestCompactRecords:
+    """Testes para o armazenamento compacto dos datasets em memória."""
+
+    def test_round_trip_is_exact(self):
+        """Testa que os registros materializados são iguais aos originais, com chaves na mesma ordem."""
+        records = SAMPLE_DATA['people'] + [
+            {'name': 'Sem URL', 'homeworld': None, 'tags': ['a', ['b']], 'url': f'{SWAPI}/people/9/'},
+            {'name': 'ID com zero', 'homeworld': f'{SWAPI}/planets/01/', 'url': f'{SWAPI}/people/10/'},
+        ]
+        compact = CompactRecords.from_dicts(records)
+
+        assert len(compact) == len(records)
+        assert list(compact) == records
+        assert compact[1:3] == records[1:3]
+        assert [list(record) for record in compact] == [list(record) for record in records]
+
+    def test_urls_stored_as_ids_and_strings_interned(self):
+        """Testa que listas de URLs viram arrays de IDs e que strings repetidas são compartilhadas."""
+        compact = CompactRecords.from_dicts(SAMPLE_DATA['people'])
+        row = compact._rows[0]
+        stored = dict(zip(compact._shapes[row[0]], row[1:]))
+
+        assert isinstance(stored['films'], array) and stored['films'].tolist() == [1, 2]
+        assert stored['homeworld'] == 1
+        assert compact[0]['films'] == SAMPLE_DATA['people'][0]['films']
+        assert compact[0]['birth_year'] is compact[3]['birth_year']
+
+    def test_materialized_records_are_independent_copies(self):
+        """Testa que alterar um registro lido não altera o armazenamento."""
+        compact = CompactRecords.from_dicts(SAMPLE_DATA['people'])
+
+        record = compact[0]
+        record['films'].append('x')
+        record['name'] = 'Outro'
+
+        assert compact[0] == SAMPLE_DATA['people'][0]
+
+    def test_column_without_materializing(self):
+        """Testa a leitura de uma coluna, com valor padrão para campos ausentes."""
+        compact = CompactRecords.from_dicts(SAMPLE_DATA['starships'] + [{'name': 'Sem modelo'}])
+
+        assert compact.column('model', '')[-1] == ''
+        assert compact.column('name')[-1] == 'Sem modelo'
+        assert compact.column('inexistente') == [None] * len(compact)
+
+    def test_dataset_behaviour_unchanged(self):
+        """Testa busca, ordenação, IDs e relações sobre o dataset compacto e sobre a lista de dicts."""
+        compact = ResourceDataset('people', SAMPLE_DATA['people'])
+        assert isinstance(compact.records, CompactRecords)
+        with patch('main.COMPACT_RECORDS', False):
+            plain = ResourceDataset('people', SAMPLE_DATA['people'])
+        assert isinstance(plain.records, list)
+
+        for dataset in (compact, plain):
+            assert dataset.search('a') == [0, 2, 3]
+            assert dataset.sort_positions(None, 'height', 'desc') == [2, 0, 1, 3]
+            assert dataset.get_by_id(4) == SAMPLE_DATA['people'][2]
+            assert dataset.view([3, 0])[0:1] == [SAMPLE_DATA['people'][3]]
+
+    def test_smaller_than_plain_dicts(self):
+        """Testa que o formato compacto ocupa menos memória que os dicts decodificados do JSON."""
+        from bench_main import make_records, measure_memory
+        body = json.dumps(make_records('people', 300))
+
+        plain = measure_memory(lambda: json.loads(body))
+        compact = measure_memory(lambda: CompactRecords.from_dicts(json.loads(body)))
+
+        assert compact < plain * 0.6
+
+
+class TestCursorPagination:
+    """Testes para a paginação por cursor (keyset) do /explorar."""
+
+    RECORDS = [
+        {'name': f'Nave {i}', 'model': f'M{i % 3}', 'crew': ['5', '1', 'unknown', '30', '1', '7'][i % 6],
+         'url': f'{SWAPI}/starships/{i}/'}
+        for i in range(1, 24)
+    ]
+
+    def request(self, args):
+        """Executa /explorar e retorna (status, dados)."""
+        response, status_code, headers = starwars_handler(make_request(args))
+        return status_code, response.get_json()
+
+    def walk(self, args):
+        """Percorre todas as páginas seguindo proximo_cursor e retorna os nomes na ordem entregue."""
+        status_code, data = self.request(args)
+        names = [record['name'] for record in data['resultados']]
+        while data['proximo_cursor'] is not None:
+            status_code, data = self.request(args | {'cursor': data['proximo_cursor']})
+            assert status_code == 200
+            names += [record['name'] for record in data['resultados']]
+        return names
+
+    @pytest.mark.parametrize('local', [True, False])
+    @pytest.mark.parametrize('sort_args', [{}, {'ordenar_por': 'crew', 'ordem': 'asc'},
+                                           {'ordenar_por': 'crew', 'ordem': 'desc'}])
+    def test_cursor_walk_matches_offset_pages(self, local, sort_args):
+        """Testa que seguir os cursores entrega a mesma sequência da paginação por página."""
+        args = {'tipo': 'starships', 'limite': '4'} | sort_args
+        if local:
+            main.register_local_dataset('starships', self.RECORDS)
+        with patch('main.fetch_all_pages_swapi', return_value=(list(self.RECORDS), len(self.RECORDS))):
+            expected = []
+            for page in range(1, 7):
+                expected += [record['name'] for record in self.request(args | {'pagina': str(page)})[1]['resultados']]
+            assert self.walk(args) == expected
+        assert len(expected) == len(self.RECORDS)
+
+    def test_cursor_with_search_term(self):
+        """Testa o cursor sobre um subconjunto filtrado pelo termo no dataset local."""
+        main.register_local_dataset('starships', self.RECORDS)
+        args = {'tipo': 'starships', 'termo': 'nave 1', 'ordenar_por': 'crew', 'ordem': 'desc', 'limite': '3'}
+
+        names = self.walk(args)
+
+        expected = sort_results([r for r in self.RECORDS if 'nave 1' in r['name'].lower()], 'crew', 'desc', 'starships')
+        assert names == [record['name'] for record in expected]
+
+    def test_cursor_is_stable_when_records_are_inserted(self):
+        """Testa que a página seguinte não repete nem pula registros se outro entrar antes do cursor."""
+        main.register_local_dataset('starships', self.RECORDS)
+        args = {'tipo': 'starships', 'ordenar_por': 'crew', 'limite': '5'}
+        status_code, first = self.request(args)
+
+        inserted = {'name': 'Nova', 'crew': '1', 'url': f'{SWAPI}/starships/99/'}
+        main.register_local_dataset('starships', [inserted] + self.RECORDS)
+        status_code, second = self.request(args | {'cursor': first['proximo_cursor']})
+
+        full = [record['name'] for record in sort_results(self.RECORDS, 'crew', 'asc', 'starships')]
+        assert [r['name'] for r in first['resultados'] + second['resultados']] == full[:10]
+        assert second['pagina_atual'] == 2
+
+    def test_last_page_has_no_cursor(self):
+        """Testa que a última página não traz proximo_cursor."""
+        main.register_local_dataset('starships', self.RECORDS)
+
+        status_code, data = self.request({'tipo': 'starships', 'pagina': '3', 'limite': '10'})
+
+        assert data['total_na_pagina'] == 3
+        assert data['proximo_cursor'] is None
+
+    @pytest.mark.parametrize('cursor', ['nao-e-um-cursor', '', main.encode_cursor('0' * 16, (None, 3))])
+    def test_invalid_cursor(self, cursor):
+        """Testa a rejeição de tokens malformados ou gerados para outra consulta."""
+        main.register_local_dataset('starships', self.RECORDS)
+
+        status_code, data = self.request({'tipo': 'starships', 'cursor': cursor})
+
+        assert status_code == 400
+        assert 'cursor' in data['erro']
+
+    def test_cursor_bound_to_query(self):
+        """Testa que um cursor não vale para outra ordenação."""
+        main.register_local_dataset('starships', self.RECORDS)
+        status_code, data = self.request({'tipo': 'starships', 'ordenar_por': 'crew', 'limite': '5'})
+
+        status_code, other = self.request({'tipo': 'starships', 'ordenar_por': 'crew', 'ordem': 'desc',
+                                           'cursor': data['proximo_cursor']})
+
+        assert status_code == 400
+
+
+class TestIncrementalRefresh:
+    """Testes para a atualização incremental dos datasets locais em segundo plano."""
+
+    EDITED = '2014-12-20T21:17:56.891000Z'
+
+    def make_records(self, count):
+        """Naves sintéticas com 'edited' e campos de busca e ordenação."""
+        crews = ['5', '1', 'unknown', '30', '1', '7', '']
+        return [
+            {'name': f'Nave {i}', 'model': f'Modelo {i % 4}', 'crew': crews[i % len(crews)], 'length': str(i % 9),
+             'pilots': [f'{SWAPI}/people/{i % 5 + 1}/'], 'edited': self.EDITED, 'url': f'{SWAPI}/starships/{i}/'}
+            for i in range(1, count + 1)
+        ]
+
+    def edit(self, record, **fields):
+        """Cópia do registro com campos alterados e um novo 'edited'."""
+        return {**record, **fields, 'edited': '2024-01-01T00:00:00.000000Z'}
+
+    def assert_equivalent(self, refreshed, records):
+        """Compara o dataset atualizado com um construído do zero a partir de 'records'."""
+        rebuilt = ResourceDataset('starships', records)
+        assert list(refreshed.records) == records
+        for term in ('nave 1', 'modelo 3', 'e', 'x'):
+            assert refreshed.search(term) == rebuilt.search(term)
+        for field in VALID_SORT_FIELDS['starships']:
+            for order in ('asc', 'desc'):
+                assert refreshed.sorted_positions(field, order) == rebuilt.sorted_positions(field, order)
+        assert all(refreshed.get_by_id(i) == rebuilt.get_by_id(i) for i in range(1, 60))
+
+    def test_refreshed_matches_full_rebuild(self):
+        """Testa alterações, inclusões e remoções aplicadas sobre as estruturas já construídas."""
+        original = self.make_records(40)
+        dataset = ResourceDataset('starships', original)
+        dataset.warm()
+        records = [record for record in original if record['name'] not in ('Nave 3', 'Nave 20')]
+        records[0] = self.edit(records[0], name='Xwing', crew='1')
+        records[10] = self.edit(records[10], crew='999')
+        records.insert(5, {**original[0], 'name': 'Nova', 'url': f'{SWAPI}/starships/50/'})
+        records.append({**original[1], 'name': 'Outra', 'url': f'{SWAPI}/starships/51/'})
+
+        with patch.object(SearchIndex, '_values_of', wraps=SearchIndex._values_of) as reindexed:
+            refreshed, changes = dataset.refreshed(records)
+
+        assert changes == {'alterados': [1, 12], 'incluidos': [50, 51], 'removidos': [3, 20]}
+        assert reindexed.call_count == 4  # só alterados e incluídos
+        self.assert_equivalent(refreshed, records)
+        assert list(dataset.records) == original
+
+    def test_out_of_order_listing_falls_back_to_rebuild(self):
+        """Testa a reconstrução completa quando a ordem dos registros não se mantém."""
+        original = self.make_records(12)
+        dataset = ResourceDataset('starships', original)
+        dataset.warm()
+        records = list(reversed(original))
+
+        refreshed, changes = dataset.refreshed(records)
+
+        assert changes == {'alterados': [], 'incluidos': [], 'removidos': []}
+        self.assert_equivalent(refreshed, records)
+
+    def test_unchanged_listing_keeps_dataset(self):
+        """Testa que uma lista sem mudanças mantém a mesma versão do dataset."""
+        dataset = ResourceDataset('starships', self.make_records(10))
+
+        refreshed, changes = dataset.refreshed(self.make_records(10))
+
+        assert refreshed is dataset
+        assert not any(changes.values())
+
+    def test_sort_requested_during_refresh(self):
+        """Testa que ordenações pedidas pela primeira vez durante a atualização não interrompem o laço."""
+        original = self.make_records(12)
+        dataset = ResourceDataset('starships', original)
+        dataset.sorted_positions('name', 'asc')
+        records = [self.edit(original[0], name='Xwing')] + original[1:]
+        parse = main.parse_sort_value
+        arrived = []
+
+        def parse_while_requests_arrive(value):
+            if not arrived:
+                arrived.append(True)
+                dataset.sorted_positions('crew', 'desc')
+            return parse(value)
+
+        with patch('main.parse_sort_value', side_effect=parse_while_requests_arrive):
+            refreshed, changes = dataset.refreshed(records)
+
+        assert changes['alterados'] == [1]
+        assert refreshed.sorted_positions('name', 'asc') == ResourceDataset('starships', records).sorted_positions('name', 'asc')
+
+    def test_relation_graph_with_changes_matches_rebuild(self):
+        """Testa a atualização incremental das adjacências direta e inversa."""
+        datasets = {resource: ResourceDataset(resource, records) for resource, records in SAMPLE_DATA.items()}
+        graph = main.RelationGraph(datasets)
+        films = [self.edit(SAMPLE_DATA['films'][0], characters=[f'{SWAPI}/people/5/', f'{SWAPI}/people/1/'])]
+        films.append({**SAMPLE_DATA['films'][1], 'url': f'{SWAPI}/films/3/'})
+
+        dataset, changes = datasets['films'].refreshed(films)
+        updated = graph.with_changes('films', dataset, changes)
+
+        expected = main.RelationGraph({**datasets, 'films': dataset})
+        assert updated._adjacency == expected._adjacency
+        assert updated.neighbors('people', 5, 'films') == (1, 3)
+        assert graph.neighbors('films', 2, 'characters') != ()
+
+    def test_refresh_against_standin(self):
+        """Testa o ciclo completo: nova lista da SWAPI ignorando o cache e troca do dataset local."""
+        with SwapiStandin(generate_datasets({'people': 25})) as server, patch('main.SWAPI_BASE_URL', server.base_url):
+            fetch_all_pages_swapi('people')
+            previous = main.get_local_dataset('people')
+            previous.warm()
+            luke = server.datasets['people'][0]
+            luke.update(name='Luke Atualizado', edited='2024-01-01T00:00:00.000000Z')
+            requests_before = server.stats['requisicoes']
+
+            applied = main.DatasetRefresher(interval=60).refresh_all()
+
+            current = main.get_local_dataset('people')
+            assert applied == {'people': {'alterados': [1], 'incluidos': [], 'removidos': []}}
+            assert server.stats['requisicoes'] - requests_before == 3
+            assert current is not previous
+            assert [r['name'] for r in current.materialize(current.search('atualizado'))] == ['Luke Atualizado']
+            assert previous.search('atualizado') == []
+            assert main.metrics.counter_value('starwars_refresh_total', recurso='people', resultado='atualizado') == 1
+
+    @patch('main.fetch_all_pages_swapi', return_value=None)
+    def test_failed_refresh_keeps_current_version(self, mock_fetch):
+        """Testa que uma falha na atualização mantém o dataset publicado."""
+        dataset = main.register_local_dataset('starships', self.make_records(5))
+
+        assert main.refresh_dataset('starships') is None
+        assert main.get_local_dataset('starships') is dataset
+        assert main.metrics.counter_value('starwars_refresh_total', recurso='starships', resultado='falha') == 1
+
+    def test_background_thread(self):
+        """Testa o ciclo periódico na thread em segundo plano."""
+        main.register_local_dataset('starships', self.make_records(5))
+        records = self.make_records(6)
+        refresher = main.DatasetRefresher(interval=0.01)
+
+        with patch('main.fetch_all_pages_swapi', return_value=(records, len(records))):
+            refresher.start()
+            deadline = time.monotonic() + 5
+            while not refresher.last_changes and time.monotonic() < deadline:
+                time.sleep(0.01)
+            refresher.stop(timeout=5)
+
+        assert refresher.last_changes == {'starships': {'alterados': [], 'incluidos': [6], 'removidos': []}}
+        assert len(main.get_local_dataset('starships')) == 6
+
+
+class TestConditionalResponses:
+    """Testes para ETag, If-None-Match e Cache-Control nas respostas."""
+
+    @patch('main.fetch_all_pages_swapi')
+    def test_etag_and_cache_control(self, mock_fetch):
+        """Testa que respostas 200 trazem ETag e Cache-Control do endpoint."""
+        mock_fetch.return_value = ([{'name': 'Luke Skywalker'}], 1)
+
+        response, status_code, headers = starwars_handler(make_request({'tipo': 'people'}))
+
+        assert status_code == 200
+        assert headers['ETag'] == main.compute_etag(response.get_data())
+        assert headers['Cache-Control'] == f"public, max-age={main.ENDPOINT_MAX_AGE['/explorar']}"
+        assert headers['Access-Control-Allow-Origin'] == '*'
+
+    @patch('main.fetch_all_pages_swapi')
+    def test_if_none_match_returns_304_without_recomputing(self, mock_fetch):
+        """Testa 304 para ETag conhecido, reaproveitando o corpo em cache."""
+        mock_fetch.return_value = ([{'name': 'Luke Skywalker'}], 1)
+
+        _, _, first_headers = starwars_handler(make_request({'tipo': 'people'}))
+        response, status_code, headers = starwars_handler(make_request(
+            {'tipo': 'people'}, headers={'If-None-Match': f'"outro", W/{first_headers["ETag"]}'}))
+
+        assert status_code == 304
+        assert response.get_data() == b''
+        assert headers['ETag'] == first_headers['ETag']
+        assert mock_fetch.call_count == 1
+
+    @patch('main.fetch_all_pages_swapi')
+    def test_errors_have_no_validators(self, mock_fetch):
+        """Testa que respostas de erro não recebem ETag nem são armazenadas."""
+        mock_fetch.return_value = None
+
+        starwars_handler(make_request({'tipo': 'people'}))
+        _, status_code, headers = starwars_handler(make_request({'tipo': 'people'}))
+
+        assert status_code == 502
+        assert 'ETag' not in headers
+        assert mock_fetch.call_count == 2
+
+    @patch('main.fetch_resource_by_url')
+    def test_partial_relation_is_not_cached(self, mock_fetch):
+        """Testa que uma consulta correlacionada com falhas sai com no-store, sem ETag e fora do cache."""
+        film = {'title': 'A New Hope', 'characters': [f'{SWAPI}/people/1/', f'{SWAPI}/people/2/']}
+        mock_fetch.side_effect = lambda url: film if url.endswith('/films/1/') else (
+            None if url.endswith('/2/') else {'name': 'Luke Skywalker'})
+        request = make_request({'filme_id': '1'}, path='/personagens-filme')
+
+        response, status_code, headers = starwars_handler(request)
+
+        assert status_code == 200
+        assert response.get_json()['parcial'] is True
+        assert headers['Cache-Control'] == 'no-store'
+        assert 'ETag' not in headers
+        assert main.rendered_responses.stats()['entradas'] == 0
+
+    @patch('main.fetch_all_pages_swapi')
+    def test_partial_explorar_is_not_cached(self, mock_fetch):
+        """Testa que /explorar com páginas faltando não é reaproveitado na requisição seguinte."""
+        mock_fetch.return_value = ([{'name': 'Luke Skywalker'}], 2)
+
+        starwars_handler(make_request({'tipo': 'people'}))
+        response, status_code, headers = starwars_handler(make_request({'tipo': 'people'}))
+
+        assert status_code == 200
+        assert response.get_json()['parcial'] is True
+        assert headers['Cache-Control'] == 'no-store'
+        assert mock_fetch.call_count == 2
+
+
+class TestStreamingResponses:
+    """Testes para as respostas JSON em streaming (?stream=1)."""
+
+    @patch('main.fetch_all_pages_swapi')
+    def test_explorar_stream_matches_regular_payload(self, mock_fetch):
+        """Testa que o JSON em streaming é equivalente ao da resposta normal."""
+        mock_fetch.return_value = ([{'name': f'p{i}', 'height': str(i)} for i in range(30)], 30)
+        args = {'tipo': 'people', 'pagina': '2', 'limite': '10', 'ordenar_por': 'height', 'ordem': 'desc'}
+
+        regular, _, _ = starwars_handler(make_request(args))
+        streamed, status_code, headers = starwars_handler(
+            make_request(dict(args, stream='1')))
+
+        assert status_code == 200
+        assert streamed.is_streamed
+        assert 'ETag' not in headers
+        assert json.loads(streamed.get_data()) == regular.get_json()
+
+    @patch('main.fetch_resource_by_url')
+    def test_relation_stream_with_fan_out(self, mock_fetch):
+        """Testa streaming de consulta correlacionada com fan-out, ordem e falhas."""
+        film = {'title': 'A New Hope', 'episode_id': 4, 'release_date': '1977-05-25',
+                'planets': [f'{SWAPI}/planets/{i}/' for i in (1, 2, 3)]}
+
+        def fetch(url):
+            if url.endswith('/films/1/'):
+                return film
+            planet_id = parse_resource_url(url)[1]
+            time.sleep(0.01 * (4 - planet_id))
+            return None if planet_id == 2 else {'name': f'planeta {planet_id}'}
+
+        mock_fetch.side_effect = fetch
+
+        response, status_code, _ = starwars_handler(
+            make_request({'filme_id': '1', 'stream': 'true'}, path='/planetas-filme'))
+        data = json.loads(response.get_data())
+
+        assert status_code == 200
+        assert data['filme']['titulo'] == 'A New Hope'
+        assert [p['name'] for p in data['planetas']] == ['planeta 1', 'planeta 3']
+        assert data['total_planetas'] == 2
+        assert data['falhas'] == [f'{SWAPI}/planets/2/']
+
+
+class TestFieldProjection:
+    """Testes para a projeção de campos (?campos=)."""
+
+    @patch('main.fetch_all_pages_swapi')
+    def test_explorar_projects_fields(self, mock_fetch):
+        """Testa que só os campos pedidos (sem diferenciar maiúsculas) são retornados."""
+        mock_fetch.return_value = ([dict(record) for record in SAMPLE_DATA['starships']], 2)
+
+        response, status_code, _ = starwars_handler(make_request(
+            {'tipo': 'starships', 'campos': 'name, mglt,length', 'ordenar_por': 'length'}))
+
+        data = response.get_json()
+        assert status_code == 200
+        # MGLT não existe nos registros de exemplo: campos ausentes são omitidos
+        assert data['resultados'] == [{'name': 'TIE Advanced x1', 'length': '9.2'},
+                                      {'name': 'X-wing', 'length': '12.5'}]
+
+    def test_invalid_field(self):
+        """Testa erro 400 com a lista de campos disponíveis."""
+        response, status_code, _ = starwars_handler(
+            make_request({'tipo': 'films', 'campos': 'title,name'}))
+
+        data = response.get_json()
+        assert status_code == 400
+        assert data['campos_disponiveis'] == main.VALID_PROJECTION_FIELDS['films']
+
+    def test_relation_projection(self):
+        """Testa a projeção nos registros das consultas correlacionadas."""
+        for resource, records in SAMPLE_DATA.items():
+            main.register_local_dataset(resource, records)
+
+        response, status_code, _ = starwars_handler(
+            make_request({'filme_id': '1', 'campos': 'name,height'}, path='/personagens-filme'))
+
+        data = response.get_json()
+        assert status_code == 200
+        assert data['personagens'][0] == {'name': 'Luke Skywalker', 'height': '172'}
+        # A projeção cria novos dicionários; os registros em memória continuam completos
+        assert SAMPLE_DATA['people'][0]['films']
+
+
+class TestCompression:
+    """Testes para a compressão negociada das respostas."""
+
+    def test_negotiate_encoding(self):
+        """Testa a negociação por Accept-Encoding com q-values."""
+        assert main.negotiate_encoding('gzip, deflate, br') == 'gzip'
+        assert main.negotiate_encoding('deflate;q=1.0, gzip;q=0.5') == 'deflate'
+        assert main.negotiate_encoding('gzip;q=0, deflate;q=0') is None
+        assert main.negotiate_encoding('br, *;q=0.1') == 'gzip'
+        assert main.negotiate_encoding('identity') is None
+        assert main.negotiate_encoding(None) is None
+
+    @patch('main.fetch_all_pages_swapi')
+    def test_large_body_compressed_once(self, mock_fetch):
+        """Testa gzip acima do limite e reaproveitamento do corpo comprimido em cache."""
+        mock_fetch.return_value = ([{'name': f'planeta {i}', 'climate': 'arid'} for i in range(100)], 100)
+        args = {'tipo': 'planets', 'limite': '100'}
+
+        with patch('main.gzip.compress', wraps=gzip.compress) as compress_spy:
+            first, status_code, headers = starwars_handler(make_request(args, headers={'Accept-Encoding': 'gzip'}))
+            second, _, _ = starwars_handler(make_request(args, headers={'Accept-Encoding': 'gzip'}))
+        plain, _, plain_headers = starwars_handler(make_request(args))
+
+        assert status_code == 200
+        assert headers['Content-Encoding'] == 'gzip'
+        assert headers['Vary'] == 'Accept-Encoding'
+        assert headers['ETag'] != plain_headers['ETag']
+        assert gzip.decompress(first.get_data()) == plain.get_data()
+        assert second.get_data() == first.get_data()
+        assert compress_spy.call_count == 1
+        assert 'Content-Encoding' not in plain_headers
+
+    @patch('main.fetch_all_pages_swapi')
+    def test_encoded_variants_count_in_cache_bytes(self, mock_fetch):
+        """Testa que as variantes comprimidas entram no limite de bytes do cache de respostas."""
+        mock_fetch.return_value = ([{'name': f'planeta {i}', 'climate': 'arid'} for i in range(100)], 100)
+        args = {'tipo': 'planets', 'limite': '100'}
+
+        plain = starwars_handler(make_request(args))[0].get_data()
+        gzipped = starwars_handler(make_request(args, headers={'Accept-Encoding': 'gzip'}))[0].get_data()
+        deflated = starwars_handler(make_request(args, headers={'Accept-Encoding': 'deflate'}))[0].get_data()
+
+        assert main.rendered_responses.stats()['bytes'] == len(plain) + len(gzipped) + len(deflated)
+
+        main.rendered_responses.clear()
+        with patch.object(main.rendered_responses, 'max_bytes', len(plain) + len(gzipped) - 1):
+            starwars_handler(make_request(args))
+            response, status_code, _ = starwars_handler(make_request(args, headers={'Accept-Encoding': 'gzip'}))
+
+            assert status_code == 200
+            assert response.get_data() == gzipped
+            stats = main.rendered_responses.stats()
+            assert (stats['entradas'], stats['bytes'], stats['evictions']) == (0, 0, 1)
+
+    @patch('main.fetch_all_pages_swapi')
+    def test_small_body_not_compressed(self, mock_fetch):
+        """Testa que corpos abaixo do limite mínimo não são comprimidos."""
+        mock_fetch.return_value = ([{'name': 'Luke'}], 1)
+
+        _, _, headers = starwars_handler(make_request({'tipo': 'people'}, headers={'Accept-Encoding': 'gzip'}))
+
+        assert 'Content-Encoding' not in headers
+
+    @patch('main.COMPRESSION_MIN_SIZE', 0)
+    @patch('main.fetch_all_pages_swapi')
+    def test_deflate_and_conditional_request(self, mock_fetch):
+        """Testa deflate e 304 com o ETag da representação comprimida."""
+        mock_fetch.return_value = ([{'name': 'Luke'}], 1)
+        request_headers = {'Accept-Encoding': 'deflate'}
+
+        response, _, headers = starwars_handler(make_request({'tipo': 'people'}, headers=request_headers))
+        _, status_code, _ = starwars_handler(make_request(
+            {'tipo': 'people'}, headers=dict(request_headers, **{'If-None-Match': headers['ETag']})))
+
+        assert headers['Content-Encoding'] == 'deflate'
+        assert json.loads(zlib.decompress(response.get_data()))['resultados'] == [{'name': 'Luke'}]
+        assert status_code == 304
+
+
+class TestSwapiStandin:
+    """Testes de ponta a ponta contra o servidor local que emula a SWAPI (sem rede)."""
+
+    @pytest.fixture
+    def standin(self):
+        """Sobe o servidor local em uma porta livre e aponta SWAPI_BASE_URL para ele."""
+        server = SwapiStandin(generate_datasets({'people': 45, 'films': 3})).start()
+        with patch('main.SWAPI_BASE_URL', server.base_url):
+            yield server
+        server.stop()
+
+    def test_fetch_all_pages(self, standin):
+        """Testa a agregação paginada (count/next) contra o servidor local."""
+        results, count = fetch_all_pages_swapi('people')
+
+        assert count == 45
+        assert [r['url'] for r in results] == [f"{standin.base_url}/people/{i}/" for i in range(1, 46)]
+        assert standin.stats['requisicoes'] == 5
+
+    def test_search(self, standin):
+        """Testa que '?search=' filtra por nome sem diferenciar maiúsculas."""
+        results, count = fetch_all_pages_swapi('people', {'search': 'LUKE'})
+
+        assert count == len(results) > 0
+        assert all('luke' in r['name'].lower() for r in results)
+
+    def test_relation_fan_out(self, standin):
+        """Testa /personagens-filme buscando o filme e os personagens no servidor local."""
+        film = standin.datasets['films'][0]
+        request = make_request({'filme_id': '1'}, path='/personagens-filme')
+
+        response, status_code, _ = starwars_handler(request)
+
+        data = response.get_json()
+        assert status_code == 200
+        assert data['total_personagens'] == len(film['characters'])
+        assert [p['url'] for p in data['personagens']] == [
+            url.replace('https://swapi.dev/api', standin.base_url) for url in film['characters']
+        ]
+
+    @patch('main.time.sleep')
+    def test_injected_errors_are_retried(self, mock_sleep, standin):
+        """Testa que erros 500 injetados passam pelo retry até esgotar as tentativas."""
+        standin.error_rate = 1.0
+
+        assert fetch_from_swapi('planets') is None
+        assert standin.stats['erros_injetados'] == main.MAX_RETRIES
+
+    def test_throttling(self):
+        """Testa que requisições acima do limite por segundo recebem 429."""
+        with SwapiStandin(generate_datasets(), max_rps=2) as server:
+            statuses = [requests.get(f"{server.base_url}/films/1/").status_code for _ in range(4)]
+
+        assert statuses[:2] == [200, 200]
+        assert 429 in statuses[2:]
+        assert server.stats['limitadas'] >= 1
+
+
+class TestObservability:
+    """Testes para o header Server-Timing e o endpoint /metricas."""
+
+    @staticmethod
+    def swapi_response(payload):
+        response = Mock(status_code=200)
+        response.json.return_value = payload
+        response.raise_for_status.return_value = None
+        return response
+
+    @patch('main.fetch_all_pages_swapi', side_effect=fake_fetch_all_pages)
+    def test_server_timing_phases(self, mock_fetch):
+        """Testa que o Server-Timing traz as fases do /explorar e o tempo total."""
+        request = make_request({'tipo': 'people', 'ordenar_por': 'altura'})
+
+        _, status_code, headers = starwars_handler(request)
+
+        phases = [part.split(';')[0] for part in headers['Server-Timing'].split(', ')]
+        assert status_code == 200
+        assert phases == ['busca', 'ordenacao', 'paginacao', 'serializacao', 'total']
+        assert headers['Timing-Allow-Origin'] == '*'
+
+    def test_fan_out_threads_record_into_request(self):
+        """Testa que as chamadas feitas nas threads do fan-out entram no Server-Timing da requisição."""
+        characters = [f'{SWAPI}/people/{i}/' for i in range(1, 5)]
+
+        def get(url, params=None, timeout=None):
+            if url.endswith('/films/1/'):
+                return self.swapi_response({'title': 'A New Hope', 'characters': characters})
+            return self.swapi_response({'name': url, 'url': url})
+
+        request = make_request({'filme_id': '1'}, path='/personagens-filme')
+        with patch('main.http_session.get', side_effect=get):
+            _, status_code, headers = starwars_handler(request)
+
+        assert status_code == 200
+        assert 'swapi;' in headers['Server-Timing']
+        assert 'desc="5x"' in headers['Server-Timing']
+        assert main.metrics.counter_value('starwars_upstream_requests_total', resultado='200') == 5
+
+    @patch('main.time.sleep')
+    @patch('main.fetch_all_pages_swapi', side_effect=fake_fetch_all_pages)
+    def test_metricas_endpoint(self, mock_fetch, mock_sleep):
+        """Testa a exposição em formato Prometheus de requisições, retries e consultas ao cache."""
+        with patch('main.http_session.get', side_effect=requests.exceptions.Timeout()):
+            fetch_from_swapi('planets')
+
+        starwars_handler(make_request({'tipo': 'people'}))
+        starwars_handler(make_request({'tipo': 'people'}))
+        response, status_code, headers = starwars_handler(make_request({}, path='/metricas'))
+
+        text = response.get_data(as_text=True)
+        assert status_code == 200
+        assert response.content_type.startswith('text/plain; version=0.0.4')
+        assert 'starwars_requests_total{endpoint="/explorar",status="200"} 2' in text
+        assert f'starwars_upstream_retries_total {MAX_RETRIES - 1}' in text
+        assert 'starwars_upstream_requests_total{resultado="erro"} 3' in text
+        assert 'starwars_cache_lookups_total{cache="renderizadas",resultado="hit"} 1' in text
+        assert 'starwars_request_duration_seconds_count{endpoint="/explorar"} 2' in text
+        assert '# TYPE starwars_phase_duration_seconds histogram' in text
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Testa buckets cumulativos, +Inf, soma e contagem do histograma."""
+        registry = Metrics(buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.7, 3.0):
+            registry.observe('latencia', value, fase='x')
+
+        lines = registry.render().splitlines()
+
+        assert 'latencia_bucket{fase="x",le="0.1"} 1' in lines
+        assert 'latencia_bucket{fase="x",le="1"} 3' in lines
+        assert 'latencia_bucket{fase="x",le="+Inf"} 4' in lines
+        assert 'latencia_sum{fase="x"} 4.250000' in lines
+        assert 'latencia_count{fase="x"} 4' in lines
+
+
+class TestCircuitBreaker:
+    """Testes para o circuit breaker da SWAPI e o orçamento global de retries."""
+
+    def test_opens_after_threshold_and_fails_fast(self):
+        """Testa que o circuito abre após falhas consecutivas e passa a falhar sem chamar a SWAPI."""
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+
+        with patch('main.upstream_breaker', breaker), patch('main.time.sleep'), \
+                patch('main.http_session.get', side_effect=requests.exceptions.ConnectionError()) as mock_get:
+            assert fetch_from_swapi('people') is None
+            assert breaker.state == 'aberto'
+            calls = mock_get.call_count
+            assert fetch_from_swapi('planets') is None
+
+        assert calls == 2
+        assert mock_get.call_count == calls
+        assert 50 <= breaker.retry_after() <= 60
+
+    def test_saturated_pool_fails_fast(self):
+        """Testa que, com todas as vagas de consulta ocupadas, novas consultas falham sem criar threads."""
+        release = threading.Event()
+
+        def blocked_loader():
+            release.wait(2)
+            return {'title': 'A New Hope'}
+
+        with patch('main.upstream_pool', main.UpstreamPool(1)):
+            holder = threading.Thread(target=main.cached_fetch, args=(f'{SWAPI}/films/1/', None, blocked_loader))
+            holder.start()
+            wait_until = time.monotonic() + 1
+            while not main.upstream_flight._calls and time.monotonic() < wait_until:
+                time.sleep(0.005)
+            loader = Mock(return_value={'name': 'Luke'})
+            threads = threading.active_count()
+
+            assert main.cached_fetch(f'{SWAPI}/people/1/', None, loader) is None
+            assert threading.active_count() == threads
+            loader.assert_not_called()
+            assert main.upstream_breaker.state == 'fechado'
+            assert main.upstream_breaker.retry_after() == 1
+            assert main.metrics.counter_value('starwars_upstream_requests_total', resultado='saturado') == 1
+
+            release.set()
+            holder.join()
+
+    def test_half_open_trial(self):
+        """Testa a chamada de teste do estado meio-aberto: sucesso fecha, falha reabre."""
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.01)
+        breaker.record_failure()
+        time.sleep(0.02)
+
+        assert breaker.state == 'meio-aberto'
+        assert breaker.allow_request() is True
+        assert breaker.allow_request() is False  # só uma chamada de teste por vez
+        breaker.record_failure()
+        assert breaker.state == 'aberto'
+
+        time.sleep(0.02)
+        assert breaker.allow_request() is True
+        breaker.record_success()
+        assert breaker.state == 'fechado'
+
+    def test_client_errors_do_not_open_circuit(self):
+        """Testa que respostas 4xx não contam como falha da SWAPI."""
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+        error = requests.exceptions.HTTPError(response=Mock(status_code=404))
+
+        with patch('main.upstream_breaker', breaker), patch('main.http_session.get', side_effect=error):
+            fetch_swapi_url(f'{SWAPI}/people/999/')
+
+        assert breaker.state == 'fechado'
+
+    def test_retry_budget(self):
+        """Testa que o orçamento só libera retries proporcionais ao tráfego."""
+        budget = RetryBudget(ratio=0.5, capacity=1)
+
+        assert budget.try_withdraw() is True
+        assert budget.try_withdraw() is False
+        budget.record_request()
+        assert budget.try_withdraw() is False
+        budget.record_request()
+        assert budget.try_withdraw() is True
+
+    @patch('main.time.sleep')
+    @patch('main.http_session.get', side_effect=requests.exceptions.Timeout())
+    def test_exhausted_budget_skips_retries(self, mock_get, mock_sleep):
+        """Testa que sem orçamento a falha é devolvida sem novas tentativas nem espera."""
+        with patch('main.retry_budget', RetryBudget(ratio=0, capacity=0)):
+            assert fetch_from_swapi('people') is None
+
+        assert mock_get.call_count == 1
+        mock_sleep.assert_not_called()
+
+    @patch('main.fetch_all_pages_swapi', return_value=None)
+    def test_explorar_returns_503_while_open(self, mock_fetch):
+        """Testa a resposta 503 com Retry-After enquanto o circuito está aberto."""
+        for _ in range(main.upstream_breaker.failure_threshold):
+            main.upstream_breaker.record_failure()
+        request = make_request({'tipo': 'people'})
+
+        response, status_code, headers = starwars_handler(request)
+
+        assert status_code == 503
+        assert int(headers['Retry-After']) >= 1
+        assert response.get_json()['tentar_novamente_em'] == int(headers['Retry-After'])
+
+
+class TestRequestDeadline:
+    """Testes para o prazo fim a fim da requisição."""
+
+    @pytest.fixture
+    def deadline(self):
+        """Ativa um prazo de 0,5s no contexto atual."""
+        deadline = Deadline(0.5)
+        token = main._request_deadline.set(deadline)
+        yield deadline
+        main._request_deadline.reset(token)
+
+    def test_parse_deadline(self):
+        """Testa o prazo padrão e o pedido pelo header, limitado ao máximo configurado."""
+        header = main.DEADLINE_HEADER
+        assert parse_deadline(make_request({})) == main.REQUEST_DEADLINE
+        assert parse_deadline(make_request({}, headers={header: '1500'})) == 1.5
+        assert parse_deadline(make_request({}, headers={header: '999999999'})) == main.REQUEST_DEADLINE
+        assert parse_deadline(make_request({}, headers={header: 'abc'})) == main.REQUEST_DEADLINE
+
+    @patch('main.http_session.get')
+    def test_timeout_shrinks_to_remaining_time(self, mock_get, deadline):
+        """Testa que o timeout da chamada é o tempo restante do prazo."""
+        mock_get.return_value = Mock(json=Mock(return_value={'results': []}), raise_for_status=Mock())
+
+        main.request_swapi_json(f'{SWAPI}/people/')
+
+        assert 0 < mock_get.call_args[1]['timeout'] <= 0.5
+
+    @patch('main.time.sleep')
+    @patch('main.http_session.get', side_effect=requests.exceptions.Timeout())
+    def test_deadline_timeout_stops_without_retry(self, mock_get, mock_sleep, deadline):
+        """Testa que um timeout encurtado pelo prazo não é retentado nem conta como falha da SWAPI."""
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+
+        with patch('main.upstream_breaker', breaker):
+            assert main.request_swapi_json(f'{SWAPI}/people/') is None
+
+        assert mock_get.call_count == 1
+        mock_sleep.assert_not_called()
+        assert breaker.state == 'fechado'
+        assert deadline.exceeded is True
+
+    @patch('main.http_session.get')
+    def test_expired_deadline_skips_upstream(self, mock_get):
+        """Testa que nenhuma chamada é feita com o prazo já esgotado."""
+        token = main._request_deadline.set(Deadline(0))
+        try:
+            assert fetch_swapi_url(f'{SWAPI}/people/1/') is None
+        finally:
+            main._request_deadline.reset(token)
+
+        mock_get.assert_not_called()
+
+    def test_relation_returns_partial_results(self):
+        """Testa que, ao esgotar o prazo, a consulta correlacionada devolve o que obteve, marcada como parcial."""
+        characters = [f'{SWAPI}/people/{i}/' for i in range(1, 5)]
+
+        def get(url, params=None, timeout=None):
+            if url.endswith('/films/1/'):
+                data = {'title': 'A New Hope', 'characters': characters}
+            else:
+                if url.endswith('/4/'):
+                    time.sleep(0.3)
+                data = {'name': url}
+            return Mock(status_code=200, json=Mock(return_value=data), raise_for_status=Mock())
+
+        request = make_request({'filme_id': '1'}, path='/personagens-filme', headers={main.DEADLINE_HEADER: '100'})
+        with patch('main.http_session.get', side_effect=get):
+            response, status_code, _ = starwars_handler(request)
+            wait_for_shared_fetches()
+
+        data = response.get_json()
+        assert status_code == 200
+        assert data['parcial'] is True
+        assert data['total_personagens'] == 3
+        assert data['falhas'] == [f'{SWAPI}/people/4/']
+        assert main.rendered_responses.stats()['entradas'] == 0
+
+    def test_explorar_returns_504_when_deadline_exhausted(self):
+        """Testa 504 quando o prazo acaba antes da primeira página da SWAPI."""
+        def get(url, params=None, timeout=None):
+            time.sleep(0.15)
+            data = {'count': 0, 'next': None, 'results': []}
+            return Mock(status_code=200, json=Mock(return_value=data), raise_for_status=Mock())
+
+        request = make_request({'tipo': 'people'}, headers={main.DEADLINE_HEADER: '50'})
+        with patch('main.http_session.get', side_effect=get):
+            response, status_code, _ = starwars_handler(request)
+            wait_for_shared_fetches()
+
+        assert status_code == 504
+        assert response.get_json()['parcial'] is True
+
+        text = starwars_handler(make_request({}, path='/metricas'))[0].get_data(as_text=True)
+        assert '# HELP starwars_deadline_exceeded_total Etapas interrompidas pelo prazo da requisição' in text
+        assert '# TYPE starwars_deadline_exceeded_total counter' in text
+        assert 'starwars_deadline_exceeded_total 1' in text
+
+    def test_short_deadline_does_not_fail_concurrent_callers(self):
+        """Testa que o prazo curto de quem iniciou a consulta compartilhada não derruba os demais."""
+        def slow_loader():
+            time.sleep(0.2)
+            return {'title': 'A New Hope'}
+
+        loader = Mock(side_effect=slow_loader)
+        outcomes = {}
+
+        def call(name, seconds):
+            token = main._request_deadline.set(Deadline(seconds))
+            try:
+                outcomes[name] = (main.cached_fetch(f'{SWAPI}/films/1/', None, loader), main.deadline_exceeded())
+            finally:
+                main._request_deadline.reset(token)
+
+        leader = threading.Thread(target=call, args=('curto', 0.05))
+        leader.start()
+        time.sleep(0.01)
+        follower = threading.Thread(target=call, args=('longo', 25))
+        follower.start()
+        leader.join()
+        follower.join()
+
+        assert outcomes['curto'] == (None, True)
+        assert outcomes['longo'] == ({'title': 'A New Hope'}, False)
+        assert loader.call_count == 1
+
+    def test_shared_fetch_follows_latest_waiting_deadline(self):
+        """Testa que a consulta compartilhada usa o prazo de quem ainda aguarda, e não o de quem a iniciou."""
+        timeouts = []
+
+        def get(url, params=None, timeout=None):
+            timeouts.append(timeout)
+            if timeout < 0.5:
+                time.sleep(timeout)
+                raise requests.exceptions.Timeout()
+            time.sleep(0.2)
+            return Mock(status_code=200, json=Mock(return_value={'name': 'Luke'}), raise_for_status=Mock())
+
+        outcomes = {}
+
+        def call(name, seconds):
+            token = main._request_deadline.set(Deadline(seconds))
+            try:
+                outcomes[name] = fetch_swapi_url(f'{SWAPI}/people/1/')
+            finally:
+                main._request_deadline.reset(token)
+
+        with patch('main.http_session.get', side_effect=get):
+            leader = threading.Thread(target=call, args=('curto', 0.1))
+            leader.start()
+            time.sleep(0.02)
+            call('longo', 5)
+            leader.join()
+            wait_for_shared_fetches()
+
+        assert outcomes == {'curto': None, 'longo': {'name': 'Luke'}}
+        assert len(timeouts) == 2 and timeouts[0] <= 0.1 and timeouts[1] > 0.5
+
+    def test_abandoned_shared_fetch_stops(self):
+        """Testa que, quando todos os chamadores desistem, a consulta compartilhada não segue retentando."""
+        def get(url, params=None, timeout=None):
+            time.sleep(timeout)
+            raise requests.exceptions.Timeout()
+
+        request = make_request({'tipo': 'people'}, headers={main.DEADLINE_HEADER: '100'})
+        with patch('main.http_session.get', side_effect=get) as mock_get:
+            _, status_code, _ = starwars_handler(request)
+            wait_for_shared_fetches()
+
+        assert status_code == 504
+        assert mock_get.call_count == 1
+        assert main.upstream_breaker.state == 'fechado'
+
+
+class TestBatchEndpoint:
+    """Testes para o endpoint POST /lote."""
+
+    def run_batch(self, body, method='POST'):
+        request = make_request(path='/lote', method=method)
+        request.get_json.return_value = body
+        response, status_code, headers = starwars_handler(request)
+        return json.loads(response.get_data()), status_code
+
+    def test_errors_reported_apart_from_timeouts(self):
+        """Testa que exceções nas consultas viram 500/502 com a causa, e não 504 de prazo."""
+        def broken(request):
+            raise KeyError('campo')
+
+        def upstream_error(request):
+            raise requests.exceptions.HTTPError('503 Server Error')
+
+        with patch.dict(main.BATCH_ENDPOINTS, {'/explorar': broken, '/planetas-filme': upstream_error}):
+            data, status_code = self.run_batch({'consultas': [
+                {'endpoint': '/explorar', 'parametros': {'tipo': 'people'}},
+                {'endpoint': '/planetas-filme', 'parametros': {'filme_id': 1}},
+            ]})
+
+        assert status_code == 200
+        first, second = data['resultados']
+        assert first['status'] == 500 and 'KeyError' in first['corpo']['erro']
+        assert second['status'] == 502 and '503 Server Error' in second['corpo']['erro']
+
+    def test_response_is_compressed_and_not_stored(self):
+        """Testa compressão negociada e 'no-store' na resposta do lote."""
+        for resource, records in SAMPLE_DATA.items():
+            main.register_local_dataset(resource, records)
+        request = make_request(path='/lote', method='POST', headers={'Accept-Encoding': 'gzip'})
+        request.get_json.return_value = {'consultas': [{'endpoint': '/explorar', 'parametros': {'tipo': tipo}}
+                                                       for tipo in ('people', 'planets', 'starships', 'films')]}
+
+        with patch('main.COMPRESSION_MIN_SIZE', 100):
+            response, status_code, headers = starwars_handler(request)
+
+        assert status_code == 200
+        assert headers['Content-Encoding'] == 'gzip'
+        assert headers['Cache-Control'] == 'no-store'
+        assert 'ETag' not in headers
+        assert json.loads(gzip.decompress(response.get_data()))['total_consultas'] == 4
+
+    def test_runs_queries_in_order(self):
+        """Testa a execução de consultas de endpoints diferentes, com resultados na ordem do pedido."""
+        for resource, records in SAMPLE_DATA.items():
+            main.register_local_dataset(resource, records)
+
+        data, status_code = self.run_batch({'consultas': [
+            {'endpoint': '/explorar', 'parametros': {'tipo': 'people', 'ordenar_por': 'height', 'limite': 2}},
+            {'endpoint': '/planetas-filme', 'parametros': {'filme_id': 1}},
+            {'endpoint': '/explorar', 'parametros': {'tipo': 'droids'}},
+        ]})
+
+        assert status_code == 200
+        assert data['total_consultas'] == 3
+        first, second, third = data['resultados']
+        assert first['endpoint'] == '/explorar' and first['status'] == 200
+        assert [r['name'] for r in first['corpo']['resultados']] == ['Leia Organa', 'C-3PO']
+        assert second['status'] == 200
+        assert [p['name'] for p in second['corpo']['planetas']] == ['Tatooine', 'Alderaan']
+        assert third['status'] == 400
+
+    def test_shared_urls_fetched_once(self):
+        """Testa que URLs da SWAPI comuns a várias consultas são buscadas uma única vez."""
+        characters = [f'{SWAPI}/people/{i}/' for i in range(1, 4)]
+        calls = []
+        lock = threading.Lock()
+
+        def get(url, params=None, timeout=None):
+            with lock:
+                calls.append(url)
+            time.sleep(0.02)
+            if url.endswith('/films/1/'):
+                data = {'title': 'A New Hope', 'characters': characters, 'planets': []}
+            else:
+                data = {'name': url, 'url': url}
+            return Mock(status_code=200, json=Mock(return_value=data), raise_for_status=Mock())
+
+        query = {'endpoint': '/personagens-filme', 'parametros': {'filme_id': '1'}}
+        projected = {'endpoint': '/personagens-filme', 'parametros': {'filme_id': '1', 'campos': 'name'}}
+        with patch('main.http_session.get', side_effect=get):
+            data, status_code = self.run_batch({'consultas': [query, projected, query]})
+
+        assert status_code == 200
+        assert [item['status'] for item in data['resultados']] == [200, 200, 200]
+        assert data['resultados'][0]['corpo'] == data['resultados'][2]['corpo']
+        assert sorted(calls) == sorted(set(calls))
+        assert len(calls) == 4
+
+    def test_invalid_batches(self):
+        """Testa método, corpo e tamanho do lote inválidos."""
+        _, status_code = self.run_batch({'consultas': []}, method='GET')
+        assert status_code == 405
+        assert self.run_batch(None)[1] == 400
+        assert self.run_batch({'consultas': 'x'})[1] == 400
+        too_many = [{'endpoint': '/explorar', 'parametros': {}}] * (main.BATCH_MAX_QUERIES + 1)
+        assert self.run_batch({'consultas': too_many})[1] == 400
+
+    def test_invalid_query_reported_per_item(self):
+        """Testa que consultas malformadas viram itens 400 sem derrubar o lote."""
+        data, status_code = self.run_batch({'consultas': [
+            {'endpoint': '/metricas'},
+            'texto',
+            {'endpoint': '/explorar', 'parametros': {'tipo': {'aninhado': True}}},
+        ]})
+
+        assert status_code == 200
+        assert [item['status'] for item in data['resultados']] == [400, 400, 400]
+        assert 'Endpoint inválido' in data['resultados'][0]['corpo']['erro']
+
+
+class TestRelationExpansion:
+    """Testes para o parâmetro 'expandir' do /explorar."""
+
+    def explorar(self, args):
+        response, status_code, _ = starwars_handler(make_request(args))
+        return response.get_json(), status_code
+
+    def test_expands_from_local_datasets_without_mutating(self):
+        """Testa a expansão pelos datasets locais, sem alterar os registros originais."""
+        for resource, records in SAMPLE_DATA.items():
+            main.register_local_dataset(resource, records)
+
+        data, status_code = self.explorar({'tipo': 'people', 'termo': 'Luke', 'expandir': 'homeworld,films'})
+
+        assert status_code == 200
+        luke = data['resultados'][0]
+        assert luke['homeworld']['name'] == 'Tatooine'
+        assert [film['title'] for film in luke['films']] == ['A New Hope', 'The Empire Strikes Back']
+        assert data['falhas_expansao'] == []
+        assert SAMPLE_DATA['people'][0]['homeworld'] == f'{SWAPI}/planets/1/'
+
+    @patch('main.fetch_resource_by_url')
+    @patch('main.fetch_all_pages_swapi', side_effect=fake_fetch_all_pages)
+    def test_each_distinct_url_fetched_once(self, mock_fetch_all, mock_fetch):
+        """Testa que URLs repetidas entre os itens da página são buscadas uma única vez."""
+        mock_fetch.side_effect = lambda url: {'url': url}
+
+        data, status_code = self.explorar({'tipo': 'people', 'expandir': 'homeworld,films'})
+
+        fetched = [call[0][0] for call in mock_fetch.call_args_list]
+        assert status_code == 200
+        assert sorted(fetched) == sorted([f'{SWAPI}/planets/1/', f'{SWAPI}/planets/2/',
+                                          f'{SWAPI}/films/1/', f'{SWAPI}/films/2/'])
+        assert all(isinstance(r['homeworld'], dict) for r in data['resultados'])
+
+    @patch('main.fetch_resource_by_url')
+    @patch('main.fetch_all_pages_swapi')
+    def test_failed_urls_are_kept_and_reported(self, mock_fetch_all, mock_fetch):
+        """Testa que URLs que falharem continuam como URL e são listadas em 'falhas_expansao'."""
+        mock_fetch_all.return_value = ([dict(SAMPLE_DATA['people'][3])], 1)
+        mock_fetch.side_effect = lambda url: None if url.endswith('/planets/2/') else {'url': url}
+
+        data, _ = self.explorar({'tipo': 'people', 'termo': 'Leia', 'expandir': 'homeworld',
+                                 'campos': 'name,homeworld'})
+
+        assert data['resultados'] == [{'name': 'Leia Organa', 'homeworld': f'{SWAPI}/planets/2/'}]
+        assert data['falhas_expansao'] == [f'{SWAPI}/planets/2/']
+        assert data['parcial'] is True
+
+    @pytest.mark.parametrize('args', [
+        {'tipo': 'people', 'expandir': 'name'},
+        {'tipo': 'people', 'expandir': ' , '},
+        {'tipo': 'people', 'expandir': 'films', 'campos': 'name'},
+    ])
+    def test_invalid_expansion(self, args):
+        """Testa validação do parâmetro 'expandir'."""
+        data, status_code = self.explorar(args)
+
+        assert status_code == 400
+        assert 'expandir' in data['erro']
+
+    def test_snapshot_rejects_resources_outside_snapshot(self, snapshot_path):
+        """Testa 400 no modo snapshot para campos cujo recurso não está no snapshot (sem ir à rede)."""
+        with patch('main.http_session.get') as mock_get:
+            data, status_code = self.explorar({'tipo': 'people', 'expandir': 'homeworld,species'})
+
+        mock_get.assert_not_called()
+        assert status_code == 400
+        assert 'species' in data['erro']
+        assert data['campos_expansiveis'] == ['homeworld', 'films', 'starships']
+
+        data, status_code = self.explorar({'tipo': 'people', 'termo': 'Luke', 'expandir': 'homeworld'})
+        assert status_code == 200
+        assert data['resultados'][0]['homeworld']['name'] == 'Tatooine'
+
+
+class TestStartup:
+    """Testes para o aquecimento opcional e os tempos de inicialização."""
+
+    def test_warm_up_snapshot_builds_indexes(self, snapshot_path):
+        """Testa que o aquecimento do snapshot constrói índice de busca e permutações de ordenação."""
+        main.warm_up(['snapshot', 'desconhecido'])
+
+        dataset = main.get_snapshot().datasets['people']
+        assert dataset._search_index is not None
+        assert set(dataset._sorted_positions) == {(field, order) for field in VALID_SORT_FIELDS['people']
+                                                  for order in ('asc', 'desc')}
+
+    @patch('main.fetch_all_pages_swapi', side_effect=requests.exceptions.ConnectionError())
+    def test_warm_up_failure_is_ignored(self, mock_fetch):
+        """Testa que falhas no aquecimento não interrompem a inicialização."""
+        main.warm_up(['people'])
+
+        assert main.get_local_dataset('people') is None
+
+    def test_startup_timings_in_metrics(self):
+        """Testa a exposição dos tempos de import e da primeira requisição em /metricas."""
+        request = make_request(path='/metricas')
+
+        with patch.dict(main.STARTUP_TIMINGS, {'primeira_requisicao': 0.25}):
+            response, _, _ = starwars_handler(request)
+
+        text = response.get_data(as_text=True)
+        assert main.STARTUP_TIMINGS['importacao'] > 0
+        assert 'starwars_startup_import_seconds ' in text
+        assert 'starwars_startup_first_request_seconds 0.25' in text